@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of response compression, CPU time vs bytes saved.
+
+Usage:
+    $ python benchmarks/bench_compression.py
+"""
+
+import json
+import timeit
+
+from flask_api_connector.compression import CODECS
+
+
+LEVELS = {
+    'gzip': (1, 6, 9),
+    'zstd': (1, 3, 9, 19),
+    'br': (1, 4, 9, 11),
+}
+
+
+def make_payload(n=5000):
+    return json.dumps({'data': [
+        {'id': i, 'name': f'item{i}', 'price': f'{i * 1.25:.2f}',
+         'tags': ['a', 'b', 'c'], 'active': i % 2 == 0}
+        for i in range(n)
+    ]}).encode()
+
+
+def main():
+    data = make_payload()
+    print(f'payload: {len(data)} bytes')
+    print(f'{"encoding":<10}{"level":>6}{"bytes":>12}{"ratio":>8}'
+          f'{"time (ms)":>12}{"MB/s":>10}')
+
+    for name, codec in CODECS.items():
+        for level in LEVELS[name]:
+            elapsed = min(timeit.repeat(
+                lambda: codec.compress(data, level), number=1, repeat=5))
+            size = len(codec.compress(data, level))
+            print(f'{name:<10}{level:>6}{size:>12}'
+                  f'{size / len(data):>8.3f}{elapsed * 1000:>12.2f}'
+                  f'{len(data) / elapsed / 1e6:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for field formatting.
+
+Usage:
+    $ python benchmarks/bench_fields.py
+"""
+
+import random
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_EVEN
+
+from flask_api_connector import fields
+
+
+N = 100000
+
+
+def reference_fixed(values, precision=Decimal('0.00001')):
+    out = []
+    for v in values:
+        d = Decimal(v)
+        if not d.is_normal() and d != 0:
+            raise ValueError(v)
+        out.append(str(d.quantize(precision, rounding=ROUND_HALF_EVEN)))
+    return out
+
+
+def reference_arbitrary(values):
+    return [str(Decimal(v)) for v in values]
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed * 1000:>9.2f} ms')
+
+
+def bench_decimals(rng):
+    inputs = {
+        'int': [rng.randint(-10**6, 10**6) for _ in range(N)],
+        'float': [rng.uniform(-1e4, 1e4) for _ in range(N)],
+        'decimal': [Decimal(rng.randint(0, 10**8)) / 100 for _ in range(N)],
+    }
+
+    fixed = fields.Fixed(5)
+    arbitrary = fields.Arbitrary()
+
+    for name, values in inputs.items():
+        print(f'--- {name} ({N} values)')
+        run('Fixed (reference)', lambda: reference_fixed(values))
+        run('Fixed.format', lambda: [fixed.format(v) for v in values])
+        run('Fixed.format_many', lambda: fixed.format_many(values))
+        run('Arbitrary (reference)', lambda: reference_arbitrary(values))
+        run('Arbitrary.format',
+            lambda: [arbitrary.format(v) for v in values])
+        run('Arbitrary.format_many', lambda: arbitrary.format_many(values))
+
+
+def bench_datetimes(rng):
+    start = datetime(2020, 1, 1)
+    inputs = {
+        'unique': [start + timedelta(seconds=i) for i in range(N)],
+        # bucketed series repeats a small number of timestamps
+        'bucketed': [start + timedelta(minutes=rng.randrange(60))
+                     for _ in range(N)],
+    }
+
+    for name, values in inputs.items():
+        print(f'--- datetime {name} ({N} values)')
+        run('isoformat (reference)', lambda: [v.isoformat() for v in values])
+        for dt_format in ('iso8601', 'rfc822', 'epoch_ms'):
+            for cache_size in (0, 128):
+                field = fields.DateTime(dt_format=dt_format,
+                                        cache_size=cache_size)
+                run(f'{dt_format} cache={cache_size} format_many',
+                    lambda: field.format_many(values))
+
+
+def main():
+    rng = random.Random(0)
+    bench_decimals(rng)
+    bench_datetimes(rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for marshal.
+
+Usage:
+    $ python benchmarks/bench_marshal.py
+"""
+
+import json
+import random
+import time
+import timeit
+import tracemalloc
+
+from flask_api_connector import fields, marshal
+from flask_api_connector.cache import MarshalCache
+from flask_api_connector.encoder import marshal_to_json
+from flask_api_connector.marshal import marshal_normalized, marshal_rows
+
+
+N = 10000
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed * 1000:>9.2f} ms')
+
+
+def product_fields(cache=None):
+    return {
+        'id': fields.Integer,
+        'quantity': fields.Integer,
+        'product': fields.Nested({
+            'id': fields.Integer,
+            'name': fields.String,
+            'price': fields.Fixed(2),
+            'tags': fields.List(fields.String),
+            'updated': fields.DateTime,
+        }, cache=cache),
+    }
+
+
+def bench_cache(rng):
+    from datetime import datetime
+
+    # 80% of nested objects are one of a few popular products
+    popular = [
+        {'id': i, 'name': f'product{i}', 'price': i * 1.5,
+         'tags': ['a', 'b', 'c'], 'updated': datetime(2020, 1, 1)}
+        for i in range(20)
+    ]
+    data = []
+    for i in range(N):
+        if rng.random() < 0.8:
+            product = rng.choice(popular)
+        else:
+            product = dict(popular[0], id=1000 + i)
+        data.append({'id': i, 'quantity': i % 7, 'product': product})
+
+    print(f'--- nested cache ({N} records, 80% repeated)')
+    plain = product_fields()
+    run('marshal', lambda: marshal(data, plain))
+
+    cache = MarshalCache(key=lambda obj: obj['id'], maxsize=1024)
+    cached = product_fields(cache)
+    run('marshal with MarshalCache', lambda: marshal(data, cached))
+    print(f'hit rate: {cache.hit_rate:.2%}')
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_fused_json(rng, n=100000):
+    row_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'price': fields.Fixed(2),
+        'rate': fields.Float,
+        'active': fields.Boolean,
+        'owner': fields.Nested({'id': fields.Integer,
+                                'name': fields.String}),
+    }
+    rows = [
+        {'id': i, 'name': f'row{i}', 'price': rng.random() * 100,
+         'rate': rng.random(), 'active': i % 2 == 0,
+         'owner': {'id': i % 100, 'name': f'owner{i % 100}'}}
+        for i in range(n)
+    ]
+
+    def two_pass():
+        return json.dumps(marshal(rows, row_fields),
+                          separators=(',', ':')).encode()
+
+    def fused():
+        return marshal_to_json(rows, row_fields)
+
+    assert two_pass() == fused()
+
+    print(f'--- fused marshal and encode ({n} rows)')
+    for label, func in (('marshal + json.dumps', two_pass),
+                        ('marshal_to_json', fused)):
+        run(label, func, number=3)
+        print(f'{"  peak memory":<40} '
+              f'{peak_memory(func) / 1024 / 1024:>9.2f} MiB')
+
+
+def bench_batch_loader(n=500):
+    authors = {i: {'id': i, 'name': f'author{i}'} for i in range(50)}
+    calls = []
+
+    def load_authors(keys):
+        # simulated backend, 1ms per call
+        calls.append(keys)
+        time.sleep(0.001)
+        return {k: authors[k] for k in keys if k in authors}
+
+    class Post(object):
+        def __init__(self, i):
+            self.id = i
+            self.author_id = i % 50
+
+        @property
+        def author(self):
+            # lazy loaded relationship
+            return load_authors([self.author_id])[self.author_id]
+
+    posts = [Post(i) for i in range(n)]
+    author_fields = {'id': fields.Integer, 'name': fields.String}
+
+    lazy = {'id': fields.Integer, 'author': fields.Nested(author_fields)}
+    batched = {
+        'id': fields.Integer,
+        'author': fields.Nested(author_fields, loader=load_authors,
+                                loader_key='author_id'),
+    }
+
+    print(f'--- batch loader ({n} parents, 1ms per backend call)')
+    for label, mfields in (('lazy relationship (N+1)', lazy),
+                           ('batch loader', batched)):
+        calls.clear()
+        run(label, lambda: marshal(posts, mfields), number=1)
+        print(f'{"  backend calls":<40} {len(calls):>9}')
+
+
+def bench_rows(rng, n=100000):
+    import sqlite3
+    from collections import namedtuple
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE items (id, name, price, rate, active)')
+    conn.executemany('INSERT INTO items VALUES (?, ?, ?, ?, ?)', [
+        (i, f'item{i}', rng.random() * 100, rng.random(), i % 2)
+        for i in range(n)
+    ])
+    cursor = conn.execute('SELECT id, name, price, rate, active FROM items')
+    description = cursor.description
+    rows = cursor.fetchall()
+
+    Row = namedtuple('Row', [c[0] for c in description])
+    named_rows = [Row(*row) for row in rows]
+
+    row_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'price': fields.Fixed(2),
+        'rate': fields.Float,
+        'active': fields.Boolean,
+    }
+    names = [c[0] for c in description]
+
+    print(f'--- positional rows ({n} rows)')
+    run('rows to dicts + marshal',
+        lambda: marshal([dict(zip(names, row)) for row in rows],
+                        row_fields), number=3)
+    run('marshal (namedtuple)',
+        lambda: marshal(named_rows, row_fields), number=3)
+    run('marshal_rows (cursor.description)',
+        lambda: marshal_rows(rows, row_fields, columns=description),
+        number=3)
+    run('marshal_rows (namedtuple)',
+        lambda: marshal_rows(named_rows, row_fields), number=3)
+
+
+def bench_dataclasses(rng, n=100000):
+    import dataclasses
+    from flask_api_connector.marshal import _marshal_generic
+
+    @dataclasses.dataclass
+    class Item:
+        id: int
+        name: str
+        price: float
+        rate: float
+        active: bool
+
+    items = [Item(i, f'item{i}', rng.random() * 100, rng.random(), i % 2)
+             for i in range(n)]
+    item_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'price': fields.Fixed(2),
+        'rate': fields.Float,
+        'active': fields.Boolean,
+    }
+
+    print(f'--- dataclass objects ({n} records)')
+    run('get_value (subscription then getattr)',
+        lambda: [_marshal_generic(item, item_fields) for item in items],
+        number=3)
+    run('marshal (attribute getters)',
+        lambda: marshal(items, item_fields), number=3)
+
+
+def bench_normalized(rng, n=20000, products=50):
+    catalog = [{
+        'id': i,
+        'name': f'product{i}',
+        'description': 'lorem ipsum ' * 20,
+        'price': rng.random() * 100,
+        'tags': ['a', 'b', 'c'],
+    } for i in range(products)]
+    orders = [{'id': i, 'quantity': i % 5, 'product': rng.choice(catalog)}
+              for i in range(n)]
+
+    product_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'description': fields.String,
+        'price': fields.Fixed(2),
+        'tags': fields.List(fields.String),
+    }
+    nested = {'id': fields.Integer, 'quantity': fields.Integer,
+              'product': fields.Nested(product_fields)}
+    normalized = {'id': fields.Integer, 'quantity': fields.Integer,
+                  'product': fields.Nested(product_fields,
+                                           entity='product')}
+
+    print(f'--- {n} orders of {products} products')
+    for label, func in [
+        ('marshal (nested)', lambda: marshal(orders, nested, key='data')),
+        ('marshal_normalized', lambda: marshal_normalized(orders,
+                                                         normalized)),
+    ]:
+        size = len(json.dumps(func()))
+        run(f'{label} {size / 1024:.0f} KiB', func, number=3)
+
+
+def main():
+    rng = random.Random(0)
+    bench_cache(rng)
+    bench_fused_json(rng)
+    bench_batch_loader()
+    bench_rows(rng)
+    bench_dataclasses(rng)
+    bench_normalized(rng)
+
+
+if __name__ == '__main__':
+    main()
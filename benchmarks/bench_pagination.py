@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of keyset pagination against OFFSET on SQLite.
+
+Usage:
+    $ python benchmarks/bench_pagination.py
+"""
+
+import sqlite3
+import timeit
+
+from flask import Flask
+
+from flask_api_connector import fields
+from flask_api_connector.pagination import Page, encode_cursor
+
+
+ROWS = 1000000
+LIMIT = 50
+
+user_fields = {'id': fields.Integer, 'name': fields.String}
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed * 1000:>9.3f} ms')
+
+
+def main():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO users VALUES (?, ?)',
+                     ((i, f'user{i}') for i in range(1, ROWS + 1)))
+
+    def keyset(after, limit):
+        return conn.execute('SELECT id, name FROM users WHERE id > ? '
+                            'ORDER BY id LIMIT ?', (after or 0, limit))
+
+    def offset(position):
+        return conn.execute('SELECT id, name FROM users ORDER BY id '
+                            'LIMIT ? OFFSET ?', (LIMIT, position)).fetchall()
+
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+
+    with app.app_context():
+        for position in (0, 10000, 500000, ROWS - LIMIT):
+            cursor = encode_cursor(position) if position else None
+            page = Page(keyset, limit=LIMIT, cursor=cursor,
+                        columns=['id', 'name'])
+            run(f'keyset page at {position}',
+                lambda: page.marshal(user_fields))
+            run(f'offset page at {position}', lambda: offset(position))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the overhead of the sampling profiler on request handling.
+
+Usage:
+    $ python benchmarks/bench_profiler.py
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from flask_api_connector import fields
+from flask_api_connector.profiler import SamplingProfiler
+from flask_api_connector.views import BaseView
+
+
+N = 500
+THREADS = 4
+
+
+class Items:
+    def get(self):
+        return [{'id': i, 'name': f'item{i}', 'price': i * 1.5}
+                for i in range(100)]
+
+
+class ItemsView(BaseView, Items):
+    marshal_fields = {
+        'id': fields.Integer,
+        'name': fields.String,
+        'price': fields.Fixed(2),
+    }
+
+
+def work(app, view):
+    with app.test_request_context('/items'):
+        for _ in range(N):
+            view()
+
+
+def run_requests(app, view):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as executor:
+        for f in [executor.submit(work, app, view) for _ in range(THREADS)]:
+            f.result()
+    return time.perf_counter() - start
+
+
+def main():
+    app = Flask(__name__)
+    view = ItemsView.as_view('items')
+
+    base = min(run_requests(app, view) for _ in range(3))
+    print(f'{"without profiler":<30} {base:>8.3f} s')
+
+    for hz in (100, 1000):
+        profiler = SamplingProfiler(hz=hz)
+        elapsed = []
+        for _ in range(3):
+            result = {}
+            # sample during the whole run
+            thread = threading.Thread(
+                target=lambda: result.update(stacks=profiler.run(base * 2)))
+            thread.start()
+            elapsed.append(run_requests(app, view))
+            thread.join()
+
+        best = min(elapsed)
+        samples = sum(result['stacks'].values())
+        print(f'{f"profiler at {hz} Hz":<30} {best:>8.3f} s '
+              f'({(best / base - 1) * 100:+.1f}%, {samples} samples)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of response formats, size and encode/decode speed.
+
+Usage:
+    $ python benchmarks/bench_serializers.py
+"""
+
+import json
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask_api_connector import fields, marshal
+from flask_api_connector.serializers import SERIALIZERS
+
+
+N = 10000
+
+item_fields = {
+    'id': fields.Integer,
+    'name': fields.String,
+    'price': fields.Fixed(2),
+    'rate': fields.Float,
+    'active': fields.Boolean,
+    'created': fields.DateTime,
+}
+
+
+def run(func, number=5):
+    return min(timeit.repeat(func, number=1, repeat=number)) * 1000
+
+
+def main():
+    start = datetime(2020, 1, 1)
+    data = [
+        {'id': i, 'name': f'item{i}', 'price': Decimal(i) / 4,
+         'rate': i / 7, 'active': i % 2 == 0,
+         'created': start + timedelta(seconds=i)}
+        for i in range(N)
+    ]
+
+    text = marshal(data, item_fields)
+    native = marshal(data, item_fields, native=True)
+
+    print(f'--- {N} records')
+    print(f'{"format":<24}{"bytes":>10}{"encode (ms)":>14}'
+          f'{"decode (ms)":>14}')
+
+    encoded = json.dumps(text).encode()
+    print(f'{"application/json":<24}{len(encoded):>10}'
+          f'{run(lambda: json.dumps(text).encode()):>14.2f}'
+          f'{run(lambda: json.loads(encoded)):>14.2f}')
+
+    seen = set()
+    for mimetype, serializer in SERIALIZERS.items():
+        if serializer.dumps in seen:
+            continue
+        seen.add(serializer.dumps)
+
+        encoded = serializer.dumps(native)
+        print(f'{mimetype:<24}{len(encoded):>10}'
+              f'{run(lambda: serializer.dumps(native)):>14.2f}'
+              f'{run(lambda: serializer.loads(encoded)):>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the shared-memory response cache.
+
+Hit latency is compared with an in-process dict, and memory usage with
+private caches duplicated in each worker process.
+
+Usage:
+    $ python benchmarks/bench_shared_cache.py
+"""
+
+import timeit
+import tracemalloc
+
+from flask_api_connector.shared_cache import SharedCache
+
+
+N = 10000
+WORKERS = 16
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed / N * 1e6:>9.2f} us/get')
+
+
+def make_entries(size):
+    return [(b"('index', ('GET', '/items/<int:id>', (('id', %d),)))" % i,
+             b'x' * size) for i in range(N)]
+
+
+def main():
+    for size, slot_size in ((200, 512), (2000, 4096), (8000, 16384)):
+        print(f'value size: {size} bytes')
+
+        tracemalloc.start()
+        entries = make_entries(size)
+        private = dict(entries)
+        private_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        keys = list(private)
+
+        # twice of the entries to reduce evictions by probing
+        shared = SharedCache(size=64 + N * 2 * slot_size, slot_size=slot_size)
+        for key, value in entries:
+            shared.set(key, value)
+
+        run('  dict', lambda: [private.get(k) for k in keys])
+        run('  SharedCache', lambda: [shared.get(k) for k in keys])
+
+        stored = len(shared)
+        print(f'  stored {stored}/{N}, evictions: {shared.evictions}')
+        mib = 1024 * 1024
+        print(f'  memory: {WORKERS} private dicts '
+              f'{private_bytes * WORKERS / mib:.1f} MiB, '
+              f'shared file {shared.slots * shared.slot_size / mib:.1f} MiB')
+        shared.close()
+
+
+if __name__ == '__main__':
+    main()
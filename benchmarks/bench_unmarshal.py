@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for parsing request body with unmarshal.
+
+Usage:
+    $ python benchmarks/bench_unmarshal.py
+"""
+
+import json
+import timeit
+
+from flask_api_connector import fields
+from flask_api_connector.unmarshal import JSON_DECODERS, unmarshal
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed * 1000:>9.2f} ms')
+
+
+order_fields = {
+    'id': fields.Integer(required=True),
+    'customer': fields.String,
+    'total': fields.Fixed(2),
+    'paid': fields.Boolean,
+    'created': fields.DateTime,
+    'items': fields.List(fields.Nested({
+        'sku': fields.String,
+        'qty': fields.Integer,
+        'price': fields.Float,
+    })),
+}
+
+
+def make_body(size=1024 * 1024):
+    orders = []
+    body = b''
+    i = 0
+    while len(body) < size:
+        orders.extend({
+            'id': i + j,
+            'customer': f'customer{i + j}',
+            'total': '123.45',
+            'paid': True,
+            'created': '2020-01-01T00:00:00+00:00',
+            'items': [{'sku': f'sku{k}', 'qty': k, 'price': 1.5}
+                      for k in range(3)],
+        } for j in range(100))
+        i += 100
+        body = json.dumps(orders).encode()
+    return body
+
+
+def main():
+    body = make_body()
+    print(f'--- body size: {len(body) / 1024:.0f} KiB')
+
+    for name, loads in JSON_DECODERS.items():
+        run(f'decode ({name})', lambda: loads(body))
+
+    data = json.loads(body)
+    run('unmarshal', lambda: unmarshal(data, order_fields))
+
+    for name, loads in JSON_DECODERS.items():
+        run(f'decode ({name}) + unmarshal',
+            lambda: unmarshal(loads(body), order_fields))
+
+
+if __name__ == '__main__':
+    main()
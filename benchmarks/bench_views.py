@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of per-request overhead of the view options.
+
+Usage:
+    $ python benchmarks/bench_views.py
+"""
+
+import timeit
+
+from flask import Flask
+
+from flask_api_connector.views import BaseView
+
+
+N = 10000
+
+
+def run(label, func, number=5):
+    elapsed = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<40} {elapsed / N * 1e6:>9.2f} us/request')
+
+
+def make_view(**options):
+    class Index:
+        def get(self):
+            return {'ok': True}
+
+    View = type('View', (BaseView, Index), options)
+    return View.as_view('index')
+
+
+def main():
+    app = Flask(__name__)
+
+    cases = [
+        ('unlimited', {}),
+        ('concurrency_limit', {'concurrency_limit': 8}),
+        ('concurrency_limit adaptive',
+         {'concurrency_limit': 8, 'concurrency_adaptive': True}),
+        ('coalesce', {'coalesce': True}),
+        ('constant', {'constant': True}),
+        ('server_timing', {'server_timing': True}),
+        ('slow_requests', {'slow_requests': 10}),
+    ]
+
+    with app.test_request_context('/'):
+        for label, options in cases:
+            view = make_view(**options)
+            run(label, lambda: [view() for _ in range(N)])
+
+
+if __name__ == '__main__':
+    main()
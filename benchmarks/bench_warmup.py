@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the first request and memory of forked workers
+with and without `ApiConnector.warmup`.
+
+Memory is `Private_Dirty` of /proc/self/smaps_rollup (Linux only),
+the pages copied by the worker instead of shared with the master.
+
+Usage:
+    $ python benchmarks/bench_warmup.py
+"""
+
+import gc
+import json
+import os
+import time
+
+from flask import Flask
+
+from flask_api_connector import fields
+from flask_api_connector.core import ApiConnector, Paths
+
+
+ROUTES = 50
+WORKERS = 4
+
+
+def private_dirty():
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Private_Dirty:'):
+                return int(line.split()[1])
+    return 0
+
+
+def make_app():
+    paths = []
+    for i in range(ROUTES):
+        item_fields = {
+            'id': fields.Integer,
+            'name': fields.String,
+            'price': fields.Fixed(2),
+            'owner': fields.Nested({'id': fields.Integer,
+                                    'name': fields.String}),
+        }
+
+        class Items:
+            def get(self):
+                return [{'id': i, 'name': f'item{i}', 'price': i * 1.5,
+                         'owner': {'id': i, 'name': 'owner'}}
+                        for i in range(100)]
+
+        Items.__name__ = f'Items{i}'
+        paths.append((f'/items{i}', Items, {
+            'marshal_fields': item_fields, 'fused_json': True,
+            'body_fields': {'name': fields.String}}))
+
+    app = Flask('bench')
+    connector = ApiConnector(Paths(paths))
+    connector.init_app(app)
+    return app, connector
+
+
+def worker(app, write):
+    client = app.test_client()
+    before = private_dirty()
+    start = time.perf_counter()
+    client.get('/api/items0')
+    first = time.perf_counter() - start
+    for i in range(ROUTES):
+        client.get(f'/api/items{i}')
+    gc.collect()
+    os.write(write, json.dumps({
+        'first': first,
+        'dirty': private_dirty() - before,
+    }).encode())
+
+
+def fork_workers(app):
+    results = []
+    for _ in range(WORKERS):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            worker(app, write)
+            os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        with os.fdopen(read) as f:
+            results.append(json.loads(f.read()))
+    return results
+
+
+def run(label, warmup=False, freeze=False):
+    app, connector = make_app()
+    if warmup:
+        connector.warmup(app, freeze=freeze)
+    results = fork_workers(app)
+    if freeze:
+        gc.unfreeze()
+
+    first = sum(r['first'] for r in results) / len(results)
+    dirty = sum(r['dirty'] for r in results) / len(results)
+    print(f'{label:<20} first request {first * 1000:7.2f}ms  '
+          f'private dirty {dirty:8.0f}kB per worker')
+
+
+if __name__ == '__main__':
+    run('lazy')
+    run('warmup', warmup=True)
+    run('warmup + freeze', warmup=True, freeze=True)
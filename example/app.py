@@ -3,9 +3,12 @@
 from flask import Flask
 
 from flask_api_connector import ApiConnector, Paths
+from flask_api_connector.views import constant
 
 
 class Index:
+    # the response is encoded only once
+    @constant
     def get(self):
         return {
             'type': 'index',
@@ -14,6 +17,7 @@ class Index:
 
 
 class About:
+    @constant
     def get(self):
         return {
             'type': 'about',
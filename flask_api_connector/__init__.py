@@ -11,7 +11,8 @@ Simplify to register app views to Flask app API.
 
 from .core import ApiConnector, Paths
 from .marshal import marshal
+from .unmarshal import unmarshal
 
-__all__ = ['ApiConnector', 'Paths', 'marshal']
+__all__ = ['ApiConnector', 'Paths', 'marshal', 'unmarshal']
 
 __version__ = '0.0.1dev0a'
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.batch
+=========================
+
+Batch endpoint to execute many API calls in one HTTP request.
+"""
+
+import base64
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, current_app, jsonify, request
+from werkzeug.exceptions import InternalServerError
+from werkzeug.test import EnvironBuilder
+
+# headers of the batch request not passed to sub-requests,
+# bodies of sub-requests are embedded in the JSON without compression
+_EXCLUDED_HEADERS = frozenset([
+    'content-length', 'content-type', 'content-encoding',
+    'transfer-encoding', 'host', 'accept-encoding',
+])
+
+
+def _build_environ(sub, root_url, batch_rule):
+    if not isinstance(sub, dict):
+        abort(400, description='Sub-request must be an object.')
+
+    path = sub.get('path')
+    method = sub.get('method', 'GET')
+    if not isinstance(path, str) or not isinstance(method, str):
+        abort(400, description='Sub-request requires path and method.')
+
+    if not (path + '/').startswith(root_url.rstrip('/') + '/'):
+        abort(400, description=f'Path is not under {root_url}: {path}')
+    if path.split('?')[0].rstrip('/') == batch_rule:
+        abort(400, description='Batch request cannot be nested.')
+
+    headers = [(k, v) for k, v in request.headers.items()
+               if k.lower() not in _EXCLUDED_HEADERS]
+    headers.extend((sub.get('headers') or {}).items())
+
+    kwargs = {}
+    if sub.get('body') is not None:
+        kwargs['json'] = sub['body']
+
+    builder = EnvironBuilder(path=path, method=method.upper(),
+                             base_url=request.host_url,
+                             headers=headers,
+                             environ_base={'REMOTE_ADDR': request.remote_addr},
+                             **kwargs)
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def _encode_body(resp) -> dict:
+    """Return the body of the response to embed in JSON.
+
+    JSON is embedded as is, text as a string,
+    and other bodies such as binary or compressed data in base64
+    with `"encoding": "base64"`.
+    """
+    data = resp.get_data()
+    if 'Content-Encoding' not in resp.headers:
+        if resp.is_json:
+            body = resp.get_json(silent=True)
+            if body is not None or data.strip() == b'null':
+                return {'body': body}
+        try:
+            return {'body': data.decode('utf-8')}
+        except UnicodeDecodeError:
+            pass
+    return {'body': base64.b64encode(data).decode('ascii'),
+            'encoding': 'base64'}
+
+
+def _dispatch(app, environ):
+    start = time.perf_counter()
+    with app.request_context(environ):
+        try:
+            resp = app.full_dispatch_request()
+        except Exception as e:
+            try:
+                resp = app.make_response(app.handle_exception(e))
+            except Exception:
+                # re-raised in debug and testing mode,
+                # only this sub-request fails
+                app.log_exception(sys.exc_info())
+                resp = InternalServerError().get_response()
+
+        entry = {
+            'status': resp.status_code,
+            'headers': dict(resp.headers),
+            'time': round((time.perf_counter() - start) * 1000, 3),
+        }
+        entry.update(_encode_body(resp))
+        return entry
+
+
+class BatchView(object):
+    """View function to dispatch sub-requests through the registered views.
+
+    The request body is a list of sub-requests, which have `path`,
+    `method` (default: GET), `body` and `headers` (optional).
+    Headers of the batch request, e.g. `Authorization` and `Cookie`,
+    are passed to the sub-requests as well.
+
+    Sub-requests must be independent to each other,
+    since they are run concurrently on a thread pool.
+
+    Example:
+        POST /api/_batch
+        [
+            {"method": "GET", "path": "/api/users/1"},
+            {"method": "POST", "path": "/api/items", "body": {"name": "x"}}
+        ]
+
+        returns
+
+        {"responses": [
+            {"status": 200, "headers": {...}, "body": {...}, "time": 1.2},
+            ...
+        ]}
+
+        where time is milliseconds taken by each sub-request.
+        Body which is not JSON nor text is encoded in base64
+        with `"encoding": "base64"`.
+    """
+
+    def __init__(self, root_url, max_size=30, workers=4):
+        self.root_url = root_url
+        self.max_size = max_size
+        self.workers = workers
+        self.rule = root_url.rstrip('/') + '/_batch'
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # created lazily, threads do not survive fork of workers
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='api-batch')
+        return self._executor
+
+    def __call__(self):
+        subs = request.get_json(silent=True)
+        if not isinstance(subs, list):
+            abort(400, description='Batch request must be a list.')
+        if len(subs) > self.max_size:
+            abort(413, description=f'Batch size exceeds {self.max_size}.')
+
+        environs = [_build_environ(sub, self.root_url, self.rule)
+                    for sub in subs]
+        app = current_app._get_current_object()
+
+        if len(environs) <= 1 or self.workers <= 1:
+            responses = [_dispatch(app, environ) for environ in environs]
+        else:
+            responses = list(self.executor.map(
+                lambda environ: _dispatch(app, environ), environs))
+
+        return jsonify(responses=responses)
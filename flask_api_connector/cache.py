@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.cache
+=========================
+
+Cache of marshalled results for immutable objects.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class MarshalCache(object):
+    """Bounded LRU cache with TTL to store marshalled objects.
+
+    The cached results are shared between responses,
+    so that they must not be modified after marshalling.
+
+    Args:
+        key: callable
+            function to take an object and return hashable identity,
+            e.g. `lambda obj: (obj.id, obj.version)`.
+            If it returns None, the object will not be cached.
+        maxsize: int (default: 1024)
+            max number of cached items
+        ttl: float (default: None)
+            time to live in seconds, never expired if None
+
+    Example:
+        >>> from flask_api_connector import fields, marshal
+        >>> from flask_api_connector.cache import MarshalCache
+        >>>
+        >>> cache = MarshalCache(key=lambda obj: obj['id'])
+        >>> mfields = {
+        ...     'author': fields.Nested({'id': fields.Integer},
+        ...                             cache=cache),
+        ... }
+    """
+
+    def __init__(self, key, maxsize=1024, ttl=None):
+        self.key = key
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def info(self) -> dict:
+        """Return cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def get_or_set(self, obj, fields, factory, variant=None):
+        """Return cached result of the object marshalled with the fields.
+
+        If not found or expired, the result of `factory()` is stored
+        and returned.
+
+        Args:
+            obj: object to marshal
+            fields: dict of fields used in marshal
+            factory: callable to create the result
+            variant: hashable (default: None)
+                to distinguish the results with the same fields,
+                e.g. native output for binary serializers
+        """
+        ident = self.key(obj)
+        if ident is None:
+            return factory()
+
+        # same cache can be shared by multiple schemas
+        cache_key = (id(fields), variant, ident)
+
+        with self._lock:
+            item = self._data.get(cache_key)
+            if item is not None:
+                value, expires, owner = item
+                alive = expires is None or expires > time.monotonic()
+                # id of fields can be reused after garbage collected
+                if alive and owner is fields:
+                    self._data.move_to_end(cache_key)
+                    self.hits += 1
+                    return value
+                del self._data[cache_key]
+            self.misses += 1
+
+        # marshal out of the lock, concurrent misses may compute twice
+        # but the result is the same
+        value = factory()
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._data[cache_key] = (value, expires, fields)
+            self._data.move_to_end(cache_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+        return value
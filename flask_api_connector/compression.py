@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.compression
+===============================
+
+Negotiated response compression used by the view classes.
+gzip is always available, zstd and br are enabled
+if `zstandard` and `brotli` are installed respectively.
+"""
+
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+class _Codec(object):
+    """Base class of compression codec."""
+
+    name = None
+    default_level = None
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        raise NotImplementedError
+
+    def compressobj(self, level: int):
+        """Return an object which has `compress(data)` and `flush()`."""
+        raise NotImplementedError
+
+
+class _GzipCodec(_Codec):
+    name = 'gzip'
+    default_level = 6
+
+    def compress(self, data, level):
+        obj = self.compressobj(level)
+        return obj.compress(data) + obj.flush()
+
+    def compressobj(self, level):
+        # wbits=31 to write gzip header and trailer
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+class _ZstdCodec(_Codec):
+    name = 'zstd'
+    default_level = 3
+
+    def compress(self, data, level):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def compressobj(self, level):
+        return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+class _BrotliStream(object):
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _BrotliCodec(_Codec):
+    name = 'br'
+    default_level = 4
+
+    def compress(self, data, level):
+        return brotli.compress(data, quality=level)
+
+    def compressobj(self, level):
+        return _BrotliStream(level)
+
+
+# available codecs in the order of server preference
+CODECS = OrderedDict()
+
+if zstandard is not None:
+    CODECS['zstd'] = _ZstdCodec()
+if brotli is not None:
+    CODECS['br'] = _BrotliCodec()
+CODECS['gzip'] = _GzipCodec()
+
+
+def select_encoding(accept_encodings, encodings=None):
+    """Choose content encoding from `Accept-Encoding` header.
+
+    Args:
+        accept_encodings: werkzeug.datastructures.Accept
+            parsed header such as `request.accept_encodings`
+        encodings: list of str (default: None)
+            candidate encodings in preferred order,
+            all available codecs are used if None
+
+    Returns:
+        name of the encoding, None if no encoding is acceptable
+    """
+    best = None
+    best_quality = 0
+    for name in encodings or CODECS:
+        if name not in CODECS:
+            continue
+        quality = accept_encodings[name]
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class Compressor(object):
+    """Compress responses with negotiated encoding.
+
+    Args:
+        level: int or dict (default: None)
+            compression level, or dict of encoding name and level,
+            the default level of each codec is used if not specified
+        min_size: int (default: 500)
+            responses smaller than this size in bytes are not compressed
+        encodings: list of str (default: None)
+            encodings to use in preferred order, all available if None
+        cache_size: int (default: 0)
+            max number of compressed bodies kept in memory,
+            so that the same response body is compressed only once.
+            Bodies are identified by strong ETag of the response
+            or the digest of the body.
+    """
+
+    def __init__(self, level=None, min_size=500, encodings=None,
+                 cache_size=0):
+        self.level = level
+        self.min_size = min_size
+        self.encodings = encodings
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_level(self, name):
+        if isinstance(self.level, dict):
+            level = self.level.get(name)
+        else:
+            level = self.level
+        return CODECS[name].default_level if level is None else level
+
+    def compress(self, data: bytes, name: str, etag=None) -> bytes:
+        """Compress bytes, the result is cached if cache is enabled.
+
+        Args:
+            data: bytes
+            name: str
+                name of the encoding
+            etag: str (default: None)
+                strong ETag of the data used as the cache key
+        """
+        if not self.cache_size:
+            return CODECS[name].compress(data, self.get_level(name))
+
+        # body is not kept as the key
+        if etag is None:
+            key = (name, hashlib.blake2b(data, digest_size=16).digest())
+        else:
+            key = (name, etag)
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+                return compressed
+
+        compressed = CODECS[name].compress(data, self.get_level(name))
+
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def _compress_stream(self, iterable, name):
+        obj = CODECS[name].compressobj(self.get_level(name))
+        try:
+            for chunk in iterable:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = obj.compress(chunk)
+                if data:
+                    yield data
+            yield obj.flush()
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    def __call__(self, response, accept_encodings):
+        """Compress the response in place if acceptable.
+
+        Args:
+            response: flask.Response
+            accept_encodings: werkzeug.datastructures.Accept
+
+        Returns:
+            the response
+        """
+        response.vary.add('Accept-Encoding')
+
+        status = response.status_code
+        if status < 200 or status in (204, 304):
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        if response.direct_passthrough:
+            return response
+
+        if not response.is_streamed:
+            length = response.calculate_content_length()
+            if length is None or length < self.min_size:
+                return response
+
+        name = select_encoding(accept_encodings, self.encodings)
+        if name is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response,
+                                                      name)
+            response.headers.pop('Content-Length', None)
+        else:
+            etag, weak = response.get_etag()
+            response.set_data(self.compress(response.get_data(), name,
+                                            None if weak else etag))
+
+        response.headers['Content-Encoding'] = name
+        return response
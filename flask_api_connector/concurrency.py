@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.concurrency
+===============================
+
+Concurrency control used by the view classes.
+"""
+
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Execute only one function call at a time for the same key.
+
+    Callers with the same key while the first call is in flight
+    wait for it and share the result (or the raised exception).
+
+    Example:
+        >>> flight = SingleFlight()
+        >>> flight.do(('users', 1), lambda: load_user(1))
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        # number of executed calls and calls which shared the result
+        self.executed = 0
+        self.shared = 0
+
+    @property
+    def waiting(self) -> int:
+        """Number of callers waiting for in-flight calls."""
+        with self._lock:
+            return sum(call.waiters for call in self._calls.values())
+
+    def do(self, key, func):
+        """Call the function, or wait for in-flight call with the key.
+
+        Args:
+            key: hashable
+            func: callable without arguments
+
+        Returns:
+            the result of the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.waiters += 1
+                leader = False
+
+        if not leader:
+            call.event.wait()
+            with self._lock:
+                self.shared += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.executed += 1
+            call.event.set()
+
+        return call.result
+
+
+class ConcurrencyLimiter(object):
+    """Limit number of concurrent calls with a bounded wait queue.
+
+    If `adaptive` is True, the limit is adjusted by AIMD on the observed
+    latency: it grows by one per `limit` fast calls, and is multiplied
+    by `backoff` when a call takes longer than `tolerance` times
+    the lowest latency seen.
+
+    Example:
+        >>> limiter = ConcurrencyLimiter(8, queue_size=16, timeout=1)
+        >>> if limiter.acquire():
+        ...     start = time.monotonic()
+        ...     try:
+        ...         work()
+        ...     finally:
+        ...         limiter.release(time.monotonic() - start)
+    """
+
+    def __init__(self, limit, queue_size=0, timeout=None, adaptive=False,
+                 min_limit=1, max_limit=None, tolerance=2.0, backoff=0.9):
+        if limit < 1:
+            raise ValueError('limit must be positive')
+
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit if max_limit is not None else limit * 10
+        self.tolerance = tolerance
+        self.backoff = backoff
+
+        self._limit = float(limit)
+        self._min_latency = None
+        self._cond = threading.Condition(threading.Lock())
+
+        self.active = 0
+        self.waiting = 0
+
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), 1)
+
+    def acquire(self) -> bool:
+        """Acquire a slot, waiting in the queue if it is not full.
+
+        Returns:
+            False if the call should be shed
+        """
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return True
+
+            if self.waiting >= self.queue_size:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            self.queued += 1
+            try:
+                ok = self._cond.wait_for(
+                    lambda: self.active < self.limit, self.timeout)
+            finally:
+                self.waiting -= 1
+
+            if not ok:
+                self.shed += 1
+                return False
+
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self, latency=None) -> None:
+        """Release the slot.
+
+        Args:
+            latency: float
+                seconds taken by the call, used to adjust the limit
+        """
+        with self._cond:
+            self.active -= 1
+            if self.adaptive and latency is not None:
+                self._adjust(latency)
+            self._cond.notify()
+
+    def _adjust(self, latency):
+        if self._min_latency is None or latency < self._min_latency:
+            self._min_latency = latency
+
+        if latency <= self._min_latency * self.tolerance:
+            limit = self.limit
+            self._limit = min(self._limit + 1 / self._limit, self.max_limit)
+            # wake waiters when the limit grows
+            if self.limit > limit:
+                self._cond.notify_all()
+        else:
+            self._limit = max(self._limit * self.backoff, self.min_limit)
+            # let the baseline follow when latency stays high
+            self._min_latency *= 1.01
+
+    def info(self) -> dict:
+        """Return limiter statistics."""
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'queued': self.queued,
+            'shed': self.shed,
+        }
@@ -11,10 +11,24 @@ to register the view methods.
 """
 
 
+import gc
 import os
 from typing import List
 
-from .views import BaseView
+from .batch import BatchView
+from .debug import (
+    make_memory_view, make_profile_result_view, make_profile_view,
+    make_slow_requests_view, make_tasks_view, protect
+)
+from .encoder import compile_fields
+from .marshal import prepare as prepare_marshal
+from .profiler import SamplingProfiler
+from .providers import Providers
+from .tasks import TaskRunner, make_status_view
+from .unmarshal import prepare as prepare_unmarshal
+from .views import (
+    DEFAULT_OPTIONS, TASK_ENDPOINT, BaseView, background_methods, view_options
+)
 
 
 class _Path(object):
@@ -32,7 +46,8 @@ class Paths(object):
     The argument must be an iterable of tuple or list.
 
     Args:
-        paths: list of tuple (path, View class, endpoint(optional))
+        paths: list of tuple
+            (path, View class, endpoint(optional), options(optional))
         base_url: str (default: None)
             if this is set, add the url to all given paths
 
@@ -40,6 +55,7 @@ class Paths(object):
         Paths([
             ('/first', First, 'firstitem'),
             ('/second', Second),
+            ('/third', Third, {'marshal_fields': third_fields}),
         ])
 
         where the first argument in the inner-most tuple is url rule,
@@ -50,6 +66,12 @@ class Paths(object):
         If endpoint is not explicitly provided,
         the lower-cased class name is used,
         so that the endpoint in the second tuple will be 'second'.
+
+        the last one, which is optional, is a dict of options
+        of the view class, such as `marshal_fields`.
+        Attributes of the class take precedence over them.
+        See `BaseView` for the available options.
+        ValueError is raised for unknown options.
     """
     def __init__(self, paths: List[tuple], base_url: str = None):
         self.paths = iter(paths)
@@ -76,8 +98,16 @@ class Paths(object):
 
         url, view_cls, *args = path_
 
+        options = args.pop() if args and isinstance(args[-1], dict) else {}
+
+        for attr in options:
+            # typo of option is not ignored silently
+            if attr not in DEFAULT_OPTIONS:
+                raise ValueError(
+                    f'Unknown option {attr!r} for {view_cls.__name__}')
+
         class View(BaseView, view_cls):
-            pass
+            _api_options = dict(options)
 
         name = args[0] if args else view_cls.__name__.lower()
 
@@ -122,19 +152,175 @@ class ApiConnector(object):
         >>> app.run()
     """
 
-    def __init__(self, paths: Paths, root_url='/api'):
+    def __init__(self, paths: Paths, root_url='/api', batch=False,
+                 batch_max_size=30, batch_workers=4, providers=None,
+                 debug_routes=False, debug_auth=None, profiler_hz=100,
+                 task_runner=None):
         """Api connector.
 
         Args:
             paths: Paths
             root_url: str (default: '/api')
                 root url of the views
+            batch: bool (default: False)
+                if True, mount `POST {root_url}/_batch` to execute
+                many API calls in one request. See `BatchView`.
+            batch_max_size: int (default: 30)
+                max number of sub-requests in a batch request
+            batch_workers: int (default: 4)
+                number of threads to run sub-requests concurrently
+            providers: Providers (default: None)
+                registry of resources injected to view methods,
+                which is available as `connector.providers`
+            debug_routes: bool (default: False)
+                if True, mount debug routes:
+                `GET {root_url}/_debug/slow` to list the slowest requests
+                of views with `slow_requests`,
+                `GET {root_url}/_debug/memory` to show memory usage
+                of views with `memory_tracking`,
+                `GET {root_url}/_debug/tasks` to show queue depth and
+                execution time of background tasks, and
+                `GET {root_url}/_debug/profile?seconds=5` to start the
+                sampling profiler, and `GET {root_url}/_debug/profile/result`
+                to poll the collapsed stacks
+            debug_auth: callable (default: None)
+                function without arguments which returns True
+                if `flask.request` is allowed to the debug routes.
+                If not given, they are available only in debug
+                and testing mode.
+            profiler_hz: float (default: 100)
+                default samples per second of the profiler
+            task_runner: TaskRunner (default: None)
+                runner of background methods of the views.
+                If any view has them, `GET {root_url}/_tasks/<task_id>`
+                is mounted to poll the results.
         """
         self.paths = paths
         self.root_url = root_url or '/'
+        self.batch = batch
+        self.batch_max_size = batch_max_size
+        self.batch_workers = batch_workers
+        self.providers = providers if providers is not None else Providers()
+        self.debug_routes = debug_routes
+        self.debug_auth = debug_auth
+        self.profiler = SamplingProfiler(hz=profiler_hz)
+        self.task_runner = (task_runner if task_runner is not None
+                            else TaskRunner())
+        # endpoint to view function registered by init_app
+        self.views = {}
+
+    def provider(self, name, scope='process', close=None):
+        """Register a provider by decorator.
+
+        Example:
+            >>> @connector.provider('db', scope='request',
+            ...                     close=lambda conn: conn.close())
+            ... def db():
+            ...     return pool.connection()
+        """
+        return self.providers.provider(name, scope=scope, close=close)
+
+    def init_app(self, app, eager=False, freeze=False) -> None:
+        """Register the views to the app.
+
+        Args:
+            app: Flask
+            eager: bool (default: False)
+                if True, `warmup` is called after the registration
+            freeze: bool (default: False)
+                passed to `warmup`
+        """
+        app.teardown_request(self.providers.teardown)
+        root = os.path.normpath(self.root_url).rstrip('/')
+        has_tasks = False
 
-    def init_app(self, app) -> None:
         for path in self.paths:
             rule = os.path.normpath(self.root_url + '/' + path.rule)
 
-            app.add_url_rule(rule, view_func=path.view_cls.as_view(path.name))
+            options = view_options(path.view_cls)
+            if options['providers'] is None:
+                path.view_cls._api_options['providers'] = self.providers
+            if background_methods(path.view_cls):
+                has_tasks = True
+                if options['task_runner'] is None:
+                    path.view_cls._api_options['task_runner'] = \
+                        self.task_runner
+            view = path.view_cls.as_view(path.name)
+            self.views[path.name] = view
+            app.add_url_rule(rule, view_func=view)
+
+        if self.batch:
+            view = BatchView(os.path.normpath(self.root_url),
+                             max_size=self.batch_max_size,
+                             workers=self.batch_workers)
+            app.add_url_rule(view.rule, endpoint='_batch', view_func=view,
+                             methods=['POST'])
+
+        if has_tasks:
+            app.add_url_rule(f'{root}/_tasks/<task_id>',
+                             endpoint=TASK_ENDPOINT,
+                             view_func=make_status_view(self.task_runner))
+
+        if self.debug_routes:
+            app.add_url_rule(
+                f'{root}/_debug/slow', endpoint='_debug_slow',
+                view_func=protect(make_slow_requests_view(self.views),
+                                  self.debug_auth))
+            app.add_url_rule(
+                f'{root}/_debug/memory', endpoint='_debug_memory',
+                view_func=protect(make_memory_view(self.views),
+                                  self.debug_auth))
+            app.add_url_rule(
+                f'{root}/_debug/tasks', endpoint='_debug_tasks',
+                view_func=protect(make_tasks_view(self.task_runner),
+                                  self.debug_auth))
+            app.add_url_rule(
+                f'{root}/_debug/profile', endpoint='_debug_profile',
+                view_func=protect(make_profile_view(self.profiler),
+                                  self.debug_auth))
+            app.add_url_rule(
+                f'{root}/_debug/profile/result',
+                endpoint='_debug_profile_result',
+                view_func=protect(make_profile_result_view(self.profiler),
+                                  self.debug_auth))
+
+        if eager:
+            self.warmup(app, freeze=freeze)
+
+    def warmup(self, app=None, freeze=False) -> None:
+        """Build everything lazily built by the first requests.
+
+        Call this in the master process before forking workers,
+        e.g. by `init_app(app, eager=True)` in the app factory
+        with gunicorn `--preload`, so that the workers share them
+        and the first request of each worker is not slower.
+
+        Plans of classes, columns and projections are built by the
+        first requests since they depend on the data, unless they are
+        built by `marshal.prepare` with the classes, columns and
+        projections. The caches of plans are bounded to 256 fields
+        each, so plans of more fields are evicted and rebuilt.
+
+        Args:
+            app: Flask (default: None)
+                if provided, the URL map of the app is compiled
+            freeze: bool (default: False)
+                if True, `gc.freeze` is called to move all objects
+                to the permanent generation, so that the garbage
+                collector of workers does not touch the shared pages
+        """
+        for view in self.views.values():
+            options = view.options
+            if options['marshal_fields'] is not None:
+                prepare_marshal(options['marshal_fields'])
+                if options['fused_json']:
+                    compile_fields(options['marshal_fields'])
+            if options['body_fields'] is not None:
+                prepare_unmarshal(options['body_fields'])
+
+        if app is not None:
+            app.url_map.update()
+
+        if freeze:
+            gc.collect()
+            gc.freeze()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.debug
+=========================
+
+Debug routes registered by `ApiConnector(debug_routes=True)`.
+
+They expose internals of the app, so that they are allowed only if
+`debug_auth` returns True, or in debug and testing mode without it.
+"""
+
+from functools import wraps
+
+from flask import Response, abort, current_app, jsonify, request, url_for
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_HZ = 1000
+
+
+def protect(view_func, auth=None):
+    """Wrapper to return 403 unless the request is allowed.
+
+    Args:
+        auth: callable (default: None)
+            function without arguments to check `flask.request`
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        if auth is not None:
+            allowed = auth()
+        else:
+            allowed = current_app.debug or current_app.testing
+        if not allowed:
+            abort(403)
+        return view_func(*args, **kwargs)
+    return wrapper
+
+
+def make_slow_requests_view(views):
+    """Return view function to list the slowest requests of the views.
+
+    Args:
+        views: dict
+            endpoint to view function registered by `ApiConnector`
+    """
+    def slow_requests():
+        return jsonify({
+            name: view.slow_requests.entries()
+            for name, view in views.items()
+            if getattr(view, 'slow_requests', None) is not None
+        })
+    return slow_requests
+
+
+def make_memory_view(views):
+    """Return view function to show memory usage of the views
+    with `memory_tracking`.
+    """
+    def memory():
+        return jsonify({
+            name: view.memory.info()
+            for name, view in views.items()
+            if getattr(view, 'memory', None) is not None
+        })
+    return memory
+
+
+def make_tasks_view(runner):
+    """Return view function to show statistics of background tasks."""
+    def tasks():
+        return jsonify(runner.info())
+    return tasks
+
+
+def make_profile_view(profiler):
+    """Return view function to start the sampling profiler.
+
+    Query parameters are `seconds` (default: 5) and `hz`.
+    The profiler runs in a background thread and 202 is returned
+    with `result_url` to poll the collapsed stacks.
+    """
+    def profile():
+        seconds = request.args.get('seconds', 5.0, type=float)
+        hz = request.args.get('hz', None, type=float)
+        if not 0 < seconds <= MAX_PROFILE_SECONDS:
+            abort(400, description='seconds must be in '
+                                   f'(0, {MAX_PROFILE_SECONDS}].')
+        if hz is not None and not 0 < hz <= MAX_PROFILE_HZ:
+            abort(400, description=f'hz must be in (0, {MAX_PROFILE_HZ}].')
+
+        try:
+            profiler.start(seconds, hz=hz)
+        except RuntimeError as e:
+            abort(409, description=str(e))
+
+        url = url_for('_debug_profile_result')
+        resp = jsonify(status='running', seconds=seconds, result_url=url)
+        resp.status_code = 202
+        resp.headers['Location'] = url
+        return resp
+    return profile
+
+
+def make_profile_result_view(profiler):
+    """Return view function to get the result of the profiler.
+
+    It returns 202 while the profiler is running,
+    and collapsed stacks as text when it is finished.
+    """
+    def profile_result():
+        if profiler.running:
+            resp = jsonify(status='running')
+            resp.status_code = 202
+            resp.headers['Retry-After'] = '1'
+            return resp
+        if profiler.stacks is None:
+            abort(404)
+        return Response(profiler.collapse(profiler.stacks),
+                        mimetype='text/plain')
+    return profile_result
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.encoder
+===========================
+
+Marshal objects directly into JSON bytes without building
+intermediate dicts.
+"""
+
+import json
+from json.encoder import encode_basestring_ascii
+
+from flask import current_app, has_app_context
+
+from . import fields as mfields
+from .exceptions import InvalidFieldDataException
+from .marshal import FieldsCache, batch_loading, is_collection, make
+
+
+def _default(value):
+    # types such as datetime and Decimal are encoded as jsonify does
+    if has_app_context():
+        default = getattr(current_app.json, 'default', None)
+        if default is not None:
+            return default(value)
+    raise TypeError(
+        f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_dumps = json.JSONEncoder(separators=(',', ':'), default=_default).encode
+
+
+def _quote(value: str) -> str:
+    return encode_basestring_ascii(value)
+
+
+def _float(value: float) -> str:
+    # same as json module
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == float('-inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _generic_writer(key, field):
+    def write(obj):
+        return _dumps(field.output(key, obj))
+    return write
+
+
+def _integer_writer(key, field):
+    default = 'null' if field.default is None else _dumps(field.default)
+    get_value = mfields.get_value
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            return default
+        try:
+            return int.__repr__(int(value))
+        except ValueError as e:
+            raise InvalidFieldDataException(e)
+    return write
+
+
+def _float_writer(key, field):
+    default = 'null' if field.default is None else _dumps(field.default)
+    get_value = mfields.get_value
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            return default
+        try:
+            return _float(float(value))
+        except ValueError as e:
+            raise InvalidFieldDataException(e)
+    return write
+
+
+def _string_writer(key, field):
+    default = 'null' if field.default is None else _dumps(field.default)
+    get_value = mfields.get_value
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            return default
+        return _quote(value if type(value) is str else str(value))
+    return write
+
+
+def _boolean_writer(key, field):
+    default = 'null' if field.default is None else _dumps(field.default)
+    get_value = mfields.get_value
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            return default
+        return 'true' if value else 'false'
+    return write
+
+
+def _fixed_writer(key, field):
+    default = 'null' if field.default is None else _dumps(field.default)
+    get_value = mfields.get_value
+    format = field.format
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            return default
+        # formatted decimal does not need to be escaped
+        return '"' + format(value) + '"'
+    return write
+
+
+def _nested_writer(key, field):
+    allow_null = field.allow_null
+    default = field.default
+    nested = compile_fields(field.nested)
+    get_value = mfields.get_value
+
+    def write(obj):
+        value = get_value(key, obj)
+        if value is None:
+            if allow_null:
+                return 'null'
+            elif default is not None:
+                return _dumps(default)
+        if is_collection(value):
+            return '[' + ','.join([nested(v) for v in value]) + ']'
+        return nested(value)
+    return write
+
+
+_WRITERS = {
+    mfields.Integer: _integer_writer,
+    mfields.Float: _float_writer,
+    mfields.String: _string_writer,
+    mfields.Boolean: _boolean_writer,
+    mfields.Fixed: _fixed_writer,
+    mfields.Nested: _nested_writer,
+}
+
+
+# bounded, projected fields are created per selection of clients
+_plans = FieldsCache(maxsize=256)
+
+
+def compile_fields(fields):
+    """Build a function to write a JSON object from an object.
+
+    Each field is converted into pre-encoded key fragment
+    and a writer specialized for the field type.
+    The compiled function is cached per fields.
+    """
+    return _plans.get_or_set(fields, lambda: _compile(fields))
+
+
+def _compile(fields):
+    writers = []
+    for i, (name, field) in enumerate(fields.items()):
+        fragment = ('{' if i == 0 else ',') + _quote(str(name)) + ':'
+
+        if isinstance(field, dict):
+            writers.append((fragment, compile_fields(field)))
+            continue
+
+        field = make(field)
+        factory = _WRITERS.get(type(field), _generic_writer)
+        # cached results are stored as marshalled objects
+        # and loaded objects are taken from batch loading context
+        if getattr(field, 'cache', None) is not None \
+                or getattr(field, 'loader', None) is not None:
+            factory = _generic_writer
+        writers.append((fragment, factory(name, field)))
+
+    writers = tuple(writers)
+
+    if not writers:
+        def write(obj):
+            return '{}'
+    else:
+        def write(obj):
+            parts = []
+            append = parts.append
+            for fragment, writer in writers:
+                append(fragment)
+                append(writer(obj))
+            append('}')
+            return ''.join(parts)
+    return write
+
+
+def marshal_to_json(data, fields, key=None) -> bytes:
+    """Marshal data and encode into JSON bytes in one pass.
+
+    The output is equivalent to
+    `json.dumps(marshal(data, fields, key), separators=(',', ':'))`
+    but without creating intermediate OrderedDict objects.
+
+    Args:
+        data: object
+            input raw data
+        fields: dict
+            fields used in marshal
+        key: object (default: None)
+            if provided, key will be used at the top of the output data
+    """
+    write = compile_fields(fields)
+
+    with batch_loading(data, fields):
+        if is_collection(data):
+            out = '[' + ','.join([write(d) for d in data]) + ']'
+        else:
+            out = write(data)
+
+    if key:
+        out = '{' + _quote(str(key)) + ':' + out + '}'
+
+    return out.encode('ascii')
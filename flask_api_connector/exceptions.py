@@ -6,3 +6,25 @@ class InvalidFieldDataException(Exception):
 
 class MarshallException(Exception):
     """Exception when applying marshall."""
+
+
+class ValidationException(Exception):
+    """Exception when input data is invalid.
+
+    Args:
+        errors: dict
+            error messages keyed by dot-separated field name
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(ValidationException, self).__init__(
+            'Invalid input data: ' + ', '.join(errors))
+
+
+class InvalidCursorException(Exception):
+    """Exception when pagination cursor is malformed or not signed."""
+
+
+class QueueFullException(Exception):
+    """Exception when the task queue is full."""
@@ -7,14 +7,17 @@
 # flake8: noqa
 
 from calendar import timegm
-from datetime import datetime
-from decimal import Decimal, ROUND_HALF_EVEN
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_EVEN, getcontext
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
 
 from urllib.parse import urlparse, urlunparse
 from flask import url_for, request
 
-from .exceptions import InvalidFieldDataException
-from .marshal import marshal
+from .exceptions import InvalidFieldDataException, ValidationException
+from .marshal import load, marshal, reference
+from .unmarshal import failing_fast, unmarshal
 
 __all__ = ("Raw", "String", "DateTime", "Float", "Integer",
            "Arbitrary", "Nested", "List", "Boolean", "Fixed")
@@ -50,16 +53,47 @@ class Raw(object):
         default: any (default: None)
             default value to set if specified
             this will set the value when no value is passed from data
+        required: bool (default: False)
+            used in unmarshal, raise error if the value is not provided
     """
 
-    def __init__(self, default=None):
+    def __init__(self, default=None, required=False):
         self.default = default
+        self.required = required
 
     def format(self, value):
         """Formatting the given data.
         No operation will be applied by default in base field."""
         return value
 
+    def format_many(self, values):
+        """Formatting a sequence of values at once.
+
+        This behaves as `output` applied to each item,
+        that is, `None` is replaced with the default value.
+        Subclasses can override this to provide faster batched formatting.
+        """
+        default = self.default
+        format = self.format
+        return [default if v is None else format(v) for v in values]
+
+    def format_native(self, value):
+        """Formatting the given data for binary serializers.
+
+        Fields converting value into string for JSON can override this
+        to return native type such as Decimal and datetime.
+        """
+        return self.format(value)
+
+    def parse(self, value):
+        """Parsing the given input data, used in unmarshal.
+        No operation will be applied by default in base field.
+
+        Raises:
+            InvalidFieldDataException: if the value is invalid
+        """
+        return value
+
     def output(self, key, obj):
         """Pulls the value for the given key from the object, applies the
         field's formatting and returns the result. If the key is not found
@@ -78,6 +112,15 @@ class Raw(object):
 
         return self.format(value)
 
+    def output_native(self, key, obj):
+        """Same as `output` but uses `format_native` to format the value."""
+        value = get_value(key, obj)
+
+        if value is None:
+            return self.default
+
+        return self.format_native(value)
+
 
 class Nested(Raw):
     """Allows you to nest one set of fields inside another.
@@ -91,23 +134,66 @@ class Nested(Raw):
         default: (optional)
             if this value is specified, this value will be used as default
             when the output is None
+        cache: MarshalCache (default: None)
+            cache to reuse marshalled results of immutable objects
+        loader: callable (default: None)
+            batch loader which takes a list of keys and returns
+            a dict of key and loaded object.
+            marshal collects keys across all objects first,
+            and the loader is called once per nesting level.
+        loader_key: str (default: None)
+            name of attribute which has the key to load,
+            such as foreign key, the field name is used if not set
+        entity: str (default: None)
+            name of entity in `marshal_normalized`,
+            in which the nested object is output once in `included`
+            and referred by the id
+        entity_key: str (default: 'id')
+            name of attribute of the nested object which has the id
     """
 
-    def __init__(self, nested, allow_null=False, **kwargs):
+    def __init__(self, nested, allow_null=False, cache=None, loader=None,
+                 loader_key=None, entity=None, entity_key='id', **kwargs):
         self.nested = nested
         self.allow_null = allow_null
+        self.cache = cache
+        self.loader = loader
+        self.loader_key = loader_key
+        self.entity = entity
+        self.entity_key = entity_key
         super(Nested, self).__init__(**kwargs)
 
-    def output(self, key, obj):
-        value = get_value(key, obj)
+    def _output(self, key, obj, native):
+        if self.loader is not None:
+            value = load(self, get_value(self.loader_key or key, obj))
+        else:
+            value = get_value(key, obj)
 
         if value is None:
             if self.allow_null:
                 return None
             elif self.default is not None:
                 return self.default
+        elif self.entity is not None:
+            ident = get_value(self.entity_key, value)
+            if ident is not None:
+                ref = reference(self.entity, ident, value, self.nested,
+                                native=native)
+                if ref is not None:
+                    return ref
+
+        return marshal(value, self.nested, cache=self.cache, native=native)
+
+    def output(self, key, obj):
+        return self._output(key, obj, False)
+
+    def output_native(self, key, obj):
+        return self._output(key, obj, True)
 
-        return marshal(value, self.nested)
+    def parse(self, value):
+        if not isinstance(value, dict):
+            raise InvalidFieldDataException('Must be an object.')
+        return unmarshal(value, self.nested, fail_fast=failing_fast())
 
 
 class List(Raw):
@@ -116,10 +202,18 @@ class List(Raw):
     Args:
         field: subclass of Raw class or instance
             The field type the list will contain.
+        loader: callable (default: None)
+            batch loader which takes a list of keys and returns
+            a dict of key and loaded object, see `Nested`
+        loader_key: str (default: None)
+            name of attribute which has the list of keys to load,
+            the field name is used if not set
     """
 
-    def __init__(self, field, **kwargs):
+    def __init__(self, field, loader=None, loader_key=None, **kwargs):
         super(List, self).__init__(**kwargs)
+        self.loader = loader
+        self.loader_key = loader_key
         error_msg = ("The type of the list elements must be a subclass of "
                      "flask_api_connector.fields.Raw")
         if isinstance(field, type):
@@ -131,13 +225,13 @@ class List(Raw):
                 raise InvalidFieldDataException(error_msg)
             self.container = field
 
-    def format(self, value):
+    def _format(self, value, output):
         # Convert all instances in typed list to container type
         if isinstance(value, set):
             value = list(value)
 
         return [
-            self.container.output(idx,
+            output(idx,
                 val if isinstance(val, dict)
                         and not isinstance(self.container, Nested)
                         and not type(self.container) is Raw
@@ -145,16 +239,64 @@ class List(Raw):
             for idx, val in enumerate(value)
         ]
 
-    def output(self, key, data):
-        value = get_value(key, data)
+    def format(self, value):
+        container = self.container
+        # items are formatted at once by fields using `Raw.output`,
+        # dict items are looked up by the index in `_format`
+        if type(container).output is Raw.output:
+            if isinstance(value, set):
+                value = list(value)
+            if type(container) is Raw or not any(
+                    issubclass(cls, dict) for cls in set(map(type, value))):
+                return container.format_many(value)
+        return self._format(value, container.output)
+
+    def format_native(self, value):
+        return self._format(value, self.container.output_native)
+
+    def _output(self, key, data, native):
+        if self.loader is not None:
+            keys = get_value(self.loader_key or key, data)
+            value = None if keys is None else [load(self, k) for k in keys]
+        else:
+            value = get_value(key, data)
         if value is None:
             return self.default
 
         # we cannot really test for external dict behavior
         if hasattr(value, '__iter__') and not isinstance(value, (str, dict)):
-            return self.format(value)
+            return self.format_native(value) if native else self.format(value)
 
-        return [marshal(value, self.container.nested)]
+        return [marshal(value, self.container.nested,
+                        cache=self.container.cache, native=native)]
+
+    def output(self, key, data):
+        return self._output(key, data, False)
+
+    def output_native(self, key, data):
+        return self._output(key, data, True)
+
+    def parse(self, value):
+        if not isinstance(value, list):
+            raise InvalidFieldDataException('Must be a list.')
+
+        out = []
+        errors = {}
+        parse = self.container.parse
+        for i, v in enumerate(value):
+            try:
+                out.append(parse(v))
+            except InvalidFieldDataException as e:
+                errors[str(i)] = str(e)
+            except ValidationException as e:
+                for key, message in e.errors.items():
+                    errors[f'{i}.{key}'] = message
+            if errors and failing_fast():
+                break
+
+        if errors:
+            raise ValidationException(errors)
+        return out
 
 
 class String(Raw):
@@ -163,6 +305,11 @@ class String(Raw):
         # won't handle TypeError here
         return str(value)
 
+    def parse(self, value):
+        if not isinstance(value, str):
+            raise InvalidFieldDataException('Must be a string.')
+        return value
+
 
 class Integer(Raw):
     """Integer value field."""
@@ -175,12 +322,24 @@ class Integer(Raw):
         except ValueError as e:
             raise InvalidFieldDataException(e)
 
+    def parse(self, value):
+        if type(value) is int:
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        raise InvalidFieldDataException('Must be an integer.')
+
 
 class Boolean(Raw):
     """Boolean value field."""
     def format(self, value):
         return bool(value)
 
+    def parse(self, value):
+        if not isinstance(value, bool):
+            raise InvalidFieldDataException('Must be a boolean.')
+        return value
+
 
 class Float(Raw):
     """
@@ -195,6 +354,29 @@ class Float(Raw):
         except ValueError as ve:
             raise InvalidFieldDataException(ve)
 
+    def parse(self, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        raise InvalidFieldDataException('Must be a number.')
+
+
+_DECIMAL_INPUTS = (int, float, str, Decimal)
+
+
+def _parse_decimal(value) -> Decimal:
+    # Decimal is decoded from binary formats such as CBOR
+    if isinstance(value, bool) or not isinstance(value, _DECIMAL_INPUTS):
+        raise InvalidFieldDataException('Must be a number.')
+    try:
+        # float is converted via str to avoid binary expansion
+        dvalue = (Decimal(str(value)) if isinstance(value, float)
+                  else Decimal(value))
+    except ArithmeticError:
+        raise InvalidFieldDataException('Must be a number.')
+    if not dvalue.is_finite():
+        raise InvalidFieldDataException('Must be a finite number.')
+    return dvalue
+
 
 class Arbitrary(Raw):
     """
@@ -203,32 +385,280 @@ class Arbitrary(Raw):
     """
 
     def format(self, value):
+        cls = type(value)
+        # int and Decimal are already exact, so that the string
+        # representation is the same as converted one
+        if cls is int or cls is Decimal:
+            return str(value)
         return str(Decimal(value))
 
+    def format_many(self, values):
+        default = self.default
+        out = []
+        append = out.append
+        for v in values:
+            cls = type(v)
+            if cls is int or cls is Decimal:
+                append(str(v))
+            elif v is None:
+                append(default)
+            else:
+                append(str(Decimal(v)))
+        return out
+
+    def format_native(self, value):
+        return value if type(value) is Decimal else Decimal(value)
+
+    def parse(self, value):
+        return _parse_decimal(value)
+
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _to_datetime(value):
+    """Convert supported input into datetime (or date).
+
+    Numeric value is treated as seconds since epoch in UTC,
+    and string is parsed as ISO 8601 format.
+    """
+    if isinstance(value, date):
+        return value
+
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value, timezone.utc)
+        if isinstance(value, str):
+            if value.endswith(('Z', 'z')):
+                value = value[:-1] + '+00:00'
+            return datetime.fromisoformat(value)
+    except (ValueError, OverflowError, OSError) as e:
+        raise InvalidFieldDataException(e)
+
+    raise InvalidFieldDataException(
+        f'Invalid datetime value: {value!r}')
+
+
+def _iso8601(value):
+    return value.isoformat()
+
+
+def _rfc822(value):
+    if type(value) is date:
+        value = datetime(value.year, value.month, value.day)
+    else:
+        # naive datetime is treated as UTC
+        offset = value.utcoffset()
+        if offset:
+            value = value - offset
+
+    return '%s, %02d %s %04d %02d:%02d:%02d -0000' % (
+        _WEEKDAYS[value.weekday()], value.day, _MONTHS[value.month],
+        value.year, value.hour, value.minute, value.second)
+
+
+def _epoch_ms(value):
+    if type(value) is date:
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        return (timegm(value.utctimetuple()) * 1000
+                + value.microsecond // 1000)
+
+    # naive datetime is treated as UTC
+    return (value - _EPOCH) // _MILLISECOND
+
 
 class DateTime(Raw):
-    """Return datetime in UTC with formatted by datetime.isoformat()."""
-    def __init__(self, **kwargs):
+    """Return formatted datetime.
+
+    Input value can be datetime, date, numeric epoch in seconds
+    or ISO 8601 formatted string.
+
+    Args:
+        dt_format: str (default: 'iso8601')
+            output format, one of:
+                'iso8601': formatted by datetime.isoformat()
+                'rfc822': in UTC, e.g. 'Sat, 01 Jan 2011 00:00:00 -0000'
+                'epoch_ms': milliseconds since epoch as integer
+            naive datetime is treated as UTC
+        cache_size: int (default: 0)
+            max size of LRU cache for repeated datetime values,
+            useful for bucketed series which has many same values,
+            cache is disabled if set to 0
+    """
+
+    formatters = {
+        'iso8601': _iso8601,
+        'rfc822': _rfc822,
+        'epoch_ms': _epoch_ms,
+    }
+
+    def __init__(self, dt_format='iso8601', cache_size=0, **kwargs):
         super(DateTime, self).__init__(**kwargs)
 
-    def format(self, value: datetime):
         try:
-            return value.isoformat()
-        except AttributeError as e:
-            raise InvalidFieldDataException(e)
+            self._formatter = self.formatters[dt_format]
+        except KeyError:
+            raise InvalidFieldDataException(
+                f'Invalid datetime format: {dt_format}')
+
+        self.dt_format = dt_format
+
+        if cache_size:
+            formatter = self._formatter
+
+            # datetimes in different timezones are equal if they point
+            # the same time, hence tzinfo and fold are part of the key
+            @lru_cache(maxsize=cache_size)
+            def cached(value, tzinfo, fold):
+                return formatter(value)
+
+            self._cached = cached
+        else:
+            self._cached = None
+
+    def format_native(self, value):
+        # epoch is already a number
+        if self.dt_format == 'epoch_ms':
+            return self.format(value)
+        return _to_datetime(value)
+
+    def parse(self, value):
+        # decoded from binary formats such as MessagePack and CBOR
+        if isinstance(value, date):
+            return value
+
+        if isinstance(value, str) and self.dt_format == 'rfc822':
+            try:
+                return parsedate_to_datetime(value)
+            except (TypeError, ValueError) as e:
+                raise InvalidFieldDataException(e)
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if self.dt_format == 'epoch_ms':
+                value = value / 1000
+            return _to_datetime(value)
+
+        if not isinstance(value, str):
+            raise InvalidFieldDataException('Must be a datetime string.')
+        return _to_datetime(value)
+
+    def cache_info(self):
+        """Return statistics of the cache, None if cache is disabled."""
+        return self._cached.cache_info() if self._cached else None
+
+    def format(self, value):
+        if type(value) is datetime:
+            if self._cached is not None:
+                return self._cached(value, value.tzinfo, value.fold)
+            return self._formatter(value)
+        return self._formatter(_to_datetime(value))
+
+    def format_many(self, values):
+        default = self.default
+        formatter = self._formatter
+        cached = self._cached
+
+        out = []
+        append = out.append
+        for v in values:
+            if type(v) is datetime:
+                if cached is not None:
+                    append(cached(v, v.tzinfo, v.fold))
+                else:
+                    append(formatter(v))
+            elif v is None:
+                append(default)
+            else:
+                append(formatter(_to_datetime(v)))
+        return out
 
 
 ZERO = Decimal()
 
 
 class Fixed(Raw):
-    """A decimal number with a fixed precision."""
+    """A decimal number with a fixed precision.
+
+    Values of type `int` and `float` are formatted without constructing
+    `Decimal` when the result is guaranteed to be the same string
+    as the quantized `Decimal`.
+    """
     def __init__(self, decimals=5, **kwargs):
         super(Fixed, self).__init__(**kwargs)
         self.precision = Decimal('0.' + '0' * (decimals - 1) + '1')
 
-    def format(self, value):
-        dvalue = Decimal(value)
+        # number of digits after the decimal point
+        places = -self.precision.as_tuple().exponent
+        self._places = places
+        self._suffix = '.' + '0' * places
+
+        # quantize fails when coefficient exceeds the context precision,
+        # those values are handled by Decimal to raise the same error
+        self._limit = 10 ** (getcontext().prec - places)
+
+        # Decimal uses scientific notation for small values
+        # when exponent is less than -6, e.g. '0E-7'
+        self._plain = places <= 6
+
+    def _quantize(self, dvalue):
         if not dvalue.is_normal() and dvalue != ZERO:
             raise InvalidFieldDataException('Invalid Fixed precision number.')
-        return str(dvalue.quantize(self.precision, rounding=ROUND_HALF_EVEN))
+        return dvalue.quantize(self.precision, rounding=ROUND_HALF_EVEN)
+
+    def _format_decimal(self, dvalue):
+        return str(self._quantize(dvalue))
+
+    def format_native(self, value):
+        return self._quantize(value if type(value) is Decimal
+                              else Decimal(value))
+
+    def format(self, value):
+        cls = type(value)
+        if cls is int:
+            if -self._limit < value < self._limit and (value or self._plain):
+                return str(value) + self._suffix
+        elif cls is float:
+            # printf-style formatting rounds the exact binary value
+            # with round-half-even as Decimal does
+            if self._plain and -self._limit < value < self._limit:
+                return '%.*f' % (self._places, value)
+        elif cls is Decimal:
+            return self._format_decimal(value)
+        return self._format_decimal(Decimal(value))
+
+    def format_many(self, values):
+        default = self.default
+        limit = self._limit
+        plain = self._plain
+        places = self._places
+        suffix = self._suffix
+        format_decimal = self._format_decimal
+
+        out = []
+        append = out.append
+        for v in values:
+            cls = type(v)
+            if cls is int and -limit < v < limit and (v or plain):
+                append(str(v) + suffix)
+            elif cls is float and plain and -limit < v < limit:
+                append('%.*f' % (places, v))
+            elif cls is Decimal:
+                append(format_decimal(v))
+            elif v is None:
+                append(default)
+            else:
+                append(format_decimal(Decimal(v)))
+        return out
+
+    def parse(self, value):
+        try:
+            return _parse_decimal(value).quantize(self.precision,
+                                                  rounding=ROUND_HALF_EVEN)
+        except ArithmeticError as e:
+            raise InvalidFieldDataException(e)
@@ -4,7 +4,17 @@
 # Modified Copyright (c) 2020, Rio Matsuoka
 # All rights reserved.
 
+import copy
+import dataclasses
+import threading
+import time
 from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
+from .exceptions import MarshallException
 
 
 def make(cls):
@@ -13,7 +23,16 @@ def make(cls):
     return cls
 
 
-def marshal(data, fields, key=None) -> OrderedDict:
+def is_collection(data) -> bool:
+    """Return True if the data is marshalled as a list of items.
+
+    namedtuple is a record rather than a collection.
+    """
+    return isinstance(data, (list, tuple)) and not hasattr(data, '_fields')
+
+
+def marshal(data, fields, key=None, cache=None, only=None,
+            native=False) -> OrderedDict:
     """Convert raw data into specified format.
 
     Args:
@@ -26,6 +45,17 @@ def marshal(data, fields, key=None) -> OrderedDict:
             convert the raw data accordingly.
         key: object (default: None)
             if provided, key will be used at the top of the output data
+        cache: MarshalCache (default: None)
+            if provided, marshalled results are stored to the cache
+            and reused for the same objects
+        only: list of str (default: None)
+            if provided, only the given fields are marshalled.
+            Nested fields can be selected by dot-separated name,
+            such as 'owner.name'. Other attributes are not accessed.
+        native: bool (default: False)
+            if True, `output_native` of fields is used
+            so that values are formatted into native types
+            such as Decimal and datetime for binary serializers
 
     Example:
         >>> from flask_api_connector import fields, marshal
@@ -38,14 +68,737 @@ def marshal(data, fields, key=None) -> OrderedDict:
         >>>
         >>> marshal(data, mfields, key='data')
         OrderedDict([('data', OrderedDict([('a', 100)]))])
+        >>>
+        >>> marshal(data, {'a': fields.Raw, 'b': fields.Raw}, only=['b'])
+        OrderedDict([('b', 'foo')])
+    """
+
+    if only is not None:
+        fields = project(fields, only)
+
+    # loaders are checked once for the whole data, not per item
+    if _loaded.get() is None and _loader_plan(fields):
+        with batch_loading(data, fields):
+            out = _marshal_data(data, fields, cache, native)
+    else:
+        out = _marshal_data(data, fields, cache, native)
+
+    return OrderedDict([(key, out)]) if key else out
+
+
+def _marshal_data(data, fields, cache=None, native=False):
+    if is_collection(data):
+        return [_marshal_data(d, fields, cache, native) for d in data]
+
+    # cached results do not register entities while normalizing
+    if cache is not None and data is not None and _entities.get() is None:
+        return cache.get_or_set(data, fields,
+                                lambda: _marshal_item(data, fields, native),
+                                variant=native)
+    return _marshal_item(data, fields, native)
+
+
+def _marshal_item(data, fields, native=False) -> OrderedDict:
+    cls = type(data)
+    if cls is not dict and cls is not OrderedDict and data is not None \
+            and _declares_attributes(cls):
+        marshal_object = _type_plan(cls, fields, native)
+        if marshal_object is not None:
+            return marshal_object(data)
+    return _marshal_generic(data, fields, native)
+
+
+def _marshal_generic(data, fields, native=False) -> OrderedDict:
+    # loaders of nested dicts are in the loader plan of the parent
+    if native:
+        return OrderedDict(
+            (k, _marshal_item(data, v, True) if isinstance(v, dict)
+             else make(v).output_native(k, data))
+            for k, v in fields.items())
+
+    return OrderedDict(
+        (k, _marshal_item(data, v) if isinstance(v, dict)
+         else make(v).output(k, data))
+        for k, v in fields.items())
+
+
+_PROJECTION_CACHE_SIZE = 256
+
+_projections = OrderedDict()
+_projections_lock = threading.Lock()
+
+
+def _parse_projection(only) -> dict:
+    tree = {}
+    for name in only:
+        node = tree
+        for part in name.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _project_fields(fields, tree, prefix=''):
+    projected = OrderedDict()
+    for name, sub in tree.items():
+        if name not in fields:
+            raise MarshallException(f'Unknown field: {prefix}{name}')
+        projected[name] = _project_field(fields[name], sub,
+                                         f'{prefix}{name}.')
+
+    # keep the order defined in the fields
+    return OrderedDict((k, projected[k]) for k in fields if k in projected)
+
+
+def _project_field(field, tree, prefix):
+    if not tree:
+        # select whole field
+        return field
+
+    if isinstance(field, dict):
+        return _project_fields(field, tree, prefix)
+
+    field = make(field)
+    if hasattr(field, 'nested'):
+        field = copy.copy(field)
+        field.nested = _project_fields(field.nested, tree, prefix)
+        return field
+    if hasattr(field, 'container'):
+        field = copy.copy(field)
+        field.container = _project_field(field.container, tree, prefix)
+        return field
+
+    raise MarshallException(f'Field does not have children: {prefix[:-1]}')
+
+
+def project(fields, only) -> OrderedDict:
+    """Select a subset of fields.
+
+    The projected fields are cached per fields and selection,
+    so that projection is computed once for the same request.
+
+    Args:
+        fields: dict
+            fields used in marshal
+        only: list of str
+            names of fields to keep, nested field can be specified by
+            dot-separated name, e.g. 'owner.name'
+
+    Raises:
+        MarshallException: if unknown field is specified
+    """
+    cache_key = (id(fields), frozenset(only))
+
+    with _projections_lock:
+        item = _projections.get(cache_key)
+        # holding fields reference to avoid reusing the same id
+        if item is not None and item[0] is fields:
+            _projections.move_to_end(cache_key)
+            return item[1]
+
+    projected = _project_fields(fields, _parse_projection(only))
+
+    with _projections_lock:
+        _projections[cache_key] = (fields, projected)
+        while len(_projections) > _PROJECTION_CACHE_SIZE:
+            _projections.popitem(last=False)
+
+    return projected
+
+
+class _ProfiledField(object):
+    """Field wrapper to record the calls and the time of the field."""
+
+    def __init__(self, field, name, stats):
+        self.field = make(field)
+        self.name = name
+        self.stats = stats
+
+    def _call(self, output, key, obj):
+        start = time.perf_counter()
+        try:
+            return output(key, obj)
+        finally:
+            stats = self.stats() if callable(self.stats) else self.stats
+            entry = stats.get(self.name)
+            if entry is None:
+                entry = stats[self.name] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+
+    def output(self, key, obj):
+        return self._call(self.field.output, key, obj)
+
+    def output_native(self, key, obj):
+        return self._call(self.field.output_native, key, obj)
+
+
+def profile_fields(fields, stats, prefix='') -> OrderedDict:
+    """Return fields which record the calls and the time of each field.
+
+    Fields in nested dicts are profiled by dot-separated name.
+
+    Args:
+        fields: dict
+        stats: dict or callable
+            updated with field name to list of [calls, seconds].
+            If callable, it is called to get the dict on each record,
+            so that the profiled fields can be reused, e.g. per request.
+
+    Example:
+        >>> stats = {}
+        >>> marshal(data, profile_fields(mfields, stats))
+        >>> stats
+        {'id': [1, 1.2e-06], 'owner': [1, 2.5e-05]}
+    """
+    profiled = OrderedDict()
+    for name, field in fields.items():
+        if isinstance(field, dict):
+            field = profile_fields(field, stats, f'{prefix}{name}.')
+        else:
+            field = _ProfiledField(field, prefix + name, stats)
+        profiled[name] = field
+    return profiled
+
+
+class FieldsCache(object):
+    """Store values computed once per fields, such as compiled plans.
+
+    Values are keyed by id of the fields and the fields object is held
+    together, so that the id is not reused by other object while cached.
+    If `maxsize` is set, the least recently used item is evicted.
+
+    Args:
+        maxsize: int (default: None)
+            max number of items, unlimited if None
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_set(self, fields, factory, key=None):
+        cache_key = (id(fields), key)
+
+        item = self._data.get(cache_key)
+        if item is not None and item[0] is fields:
+            if self.maxsize is not None:
+                # move_to_end is atomic, no lock is taken on hits
+                try:
+                    self._data.move_to_end(cache_key)
+                except KeyError:
+                    # evicted by other thread
+                    pass
+            return item[1]
+
+        value = factory()
+
+        with self._lock:
+            self._data[cache_key] = (fields, value)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return value
+
+
+# loaded objects in current marshal, keyed by id of field
+_loaded = ContextVar('loaded', default=None)
+
+# bounded, fields can be created per call of marshal
+_loader_plans = FieldsCache(maxsize=256)
+
+
+def _build_loader_plan(fields) -> tuple:
+    plan = []
+    for name, field in fields.items():
+        if isinstance(field, dict):
+            sub = _loader_plan(field)
+            if sub:
+                plan.append((name, None, sub, False))
+            continue
+
+        if isinstance(field, type):
+            continue
+
+        container = getattr(field, 'container', None)
+        is_list = container is not None
+        target = container if is_list else field
+
+        nested = getattr(target, 'nested', None)
+        sub = _loader_plan(nested) if nested is not None else ()
+
+        if getattr(field, 'loader', None) is not None or sub:
+            plan.append((name, field, sub, is_list))
+    return tuple(plan)
+
+
+def _loader_plan(fields) -> tuple:
+    """Return fields which have batch loaders in the nested fields.
+
+    The plan is a tuple of (name, field, nested plan, is list).
+    """
+    return _loader_plans.get_or_set(fields,
+                                    lambda: _build_loader_plan(fields))
+
+
+def prepare(fields, types=(), columns=(), projections=()) -> None:
+    """Build the plans of the fields before the first marshal.
+
+    Plans are shared by forked workers if they are built in the master.
+    Plans of classes, columns and projections depend on the data or
+    the request, so only the given ones are built.
+
+    Args:
+        fields: dict
+        types: iterable of class (default: ())
+            dataclass, attrs or slots classes of the objects to marshal
+        columns: iterable of sequence (default: ())
+            columns of positional rows, see `bind_rows`
+        projections: iterable of list of str (default: ())
+            selections of fields, see `project`
+    """
+    _loader_plan(fields)
+    for native in (False, True):
+        for cls in types:
+            if _declares_attributes(cls):
+                _type_plan(cls, fields, native)
+        for names in columns:
+            bind_rows(fields, names, native=native)
+    for only in projections:
+        _loader_plan(project(fields, only))
+
+
+def _flatten(values, is_list):
+    out = []
+    for value in values:
+        if value is None:
+            continue
+        if is_list or is_collection(value):
+            out.extend(v for v in value if v is not None)
+        else:
+            out.append(value)
+    return out
+
+
+def _update(mapping, result, keys):
+    mapping.update(result)
+    # remember keys not found not to load again
+    for k in keys:
+        mapping.setdefault(k, None)
+
+
+def _prefetch(objects, plan, loaded):
+    # avoid circular import
+    from .fields import get_value
+
+    for name, field, sub, is_list in plan:
+        if field is None:
+            # nested dict reads from the same objects
+            _prefetch(objects, sub, loaded)
+            continue
+
+        loader = getattr(field, 'loader', None)
+        if loader is None:
+            children = _flatten([get_value(name, obj) for obj in objects],
+                                is_list)
+        else:
+            loader_key = field.loader_key or name
+            keys = _flatten([get_value(loader_key, obj)
+                             for obj in objects], is_list)
+
+            mapping = loaded.setdefault(id(field), {})
+            missing = list(OrderedDict.fromkeys(
+                k for k in keys if k not in mapping))
+            if missing:
+                _update(mapping, loader(missing), missing)
+            children = [mapping[k] for k in keys
+                        if mapping[k] is not None]
+
+        if sub and children:
+            _prefetch(children, sub, loaded)
+
+
+@contextmanager
+def batch_loading(data, fields):
+    """Load nested objects by batch loaders before marshalling.
+
+    Keys are collected across all objects and each loader is called
+    once per nesting level, then the loaded objects are used
+    by fields in this context.
     """
+    plan = _loader_plan(fields)
+    if _loaded.get() is not None or not plan:
+        yield
+        return
+
+    loaded = {}
+    objects = list(data) if is_collection(data) else [data]
+    _prefetch(objects, plan, loaded)
+
+    token = _loaded.set(loaded)
+    try:
+        yield
+    finally:
+        _loaded.reset(token)
+
+
+def load(field, key):
+    """Return the object loaded by the loader of the field.
+
+    If it is not loaded yet, e.g. out of `batch_loading`,
+    the loader is called with the key.
+    """
+    if key is None:
+        return None
+
+    loaded = _loaded.get()
+    if loaded is None:
+        mapping = {}
+    else:
+        mapping = loaded.setdefault(id(field), {})
+
+    if key not in mapping:
+        _update(mapping, field.loader([key]), [key])
+    return mapping[key]
+
+
+_entities = ContextVar('entities', default=None)
+
+
+@contextmanager
+def normalizing(entities=None):
+    """Context to marshal `Nested` fields with `entity` as references.
+
+    Each distinct nested object is marshalled once into the yielded dict
+    of entity name to dict of id and marshalled object,
+    and the fields output the id instead.
+
+    Args:
+        entities: OrderedDict (default: None)
+            entities of the previous context to continue with
+    """
+    if entities is None:
+        entities = OrderedDict()
+    token = _entities.set(entities)
+    try:
+        yield entities
+    finally:
+        _entities.reset(token)
+
+
+def reference(entity, ident, value, fields, native=False):
+    """Register the entity while normalizing and return the reference.
+
+    Entities are keyed by the id as str, which is the key in JSON
+    for any serializer.
+
+    Returns:
+        the id, or None if not normalizing
+    """
+    entities = _entities.get()
+    if entities is None:
+        return None
+
+    table = entities.get(entity)
+    if table is None:
+        table = entities[entity] = OrderedDict()
+    name = str(ident)
+    if name not in table:
+        # placeholder for cyclic references
+        table[name] = None
+        table[name] = marshal(value, fields, native=native)
+    return ident
+
+
+def marshal_normalized(data, fields, key='data', only=None,
+                       native=False) -> OrderedDict:
+    """Marshal with repeated nested objects deduplicated.
+
+    `Nested` fields with `entity` output the id of the nested object,
+    and each distinct object is marshalled once into `included`.
+
+    Example:
+        >>> mfields = {
+        ...     'id': fields.Integer,
+        ...     'author': fields.Nested(author_fields, entity='author'),
+        ... }
+        >>> marshal_normalized(posts, mfields)
+        OrderedDict([('data', [{'id': 1, 'author': 10}, ...]),
+                     ('included', {'author': {'10': {'name': 'foo'}}})])
+    """
+    with normalizing() as entities:
+        out = marshal(data, fields, only=only, native=native)
+    return OrderedDict([(key or 'data', out), ('included', entities)])
+
+
+_row_plans = FieldsCache(maxsize=256)
+
+
+def _column_names(columns) -> tuple:
+    if hasattr(columns, '_fields'):
+        # namedtuple class or instance
+        return tuple(columns._fields)
+    # DB-API cursor.description has name at the first item
+    return tuple(c if isinstance(c, str) else c[0] for c in columns)
+
+
+def _key_output(output, key):
+    def output_key(obj):
+        # get_value takes integer key as index
+        return output(key, obj)
+    return output_key
+
+
+def _build_plan(fields, locate, getter, native, fallback=None):
+    """Compile fields into a function to marshal a record.
+
+    Args:
+        fields: dict
+        locate: callable
+            take a field name and return the accessor key,
+            such as index for a row and attribute name for an object
+        getter: callable
+            `operator.itemgetter` or `operator.attrgetter`
+        native: bool
+        fallback: callable (default: None)
+            function to take the record and the fields and marshal it
+            if an attribute is not found
+    """
+    # avoid circular import
+    from .fields import Raw
+
+    keys = []
+    scalars = []
+    others = []
+    for pos, (name, field) in enumerate(fields.items()):
+        keys.append(name)
+
+        if isinstance(field, dict):
+            others.append((pos, _build_plan(field, locate, getter, native,
+                                            fallback)))
+            continue
+
+        field = make(field)
+        key = locate(name)
+        output = field.output_native if native else field.output
+
+        if type(field).output is Raw.output:
+            format = field.format_native if native else field.format
+            # skip calling format of Raw which does nothing
+            if type(field) is Raw:
+                format = None
+            scalars.append((pos, key, format, field.default))
+        else:
+            others.append((pos, _key_output(output, key)))
+
+    keys = tuple(keys)
+    size = len(keys)
+
+    if not scalars:
+        get_scalars = None
+    elif len(scalars) == 1:
+        get_scalar = getter(scalars[0][1])
+
+        def get_scalars(obj):
+            return (get_scalar(obj),)
+    else:
+        get_scalars = getter(*(key for _, key, _, _ in scalars))
+
+    formats = tuple((pos, format, default)
+                    for pos, _, format, default in scalars)
+
+    def marshal_record(obj):
+        values = [None] * size
+        if get_scalars is not None:
+            # only the attribute access falls back
+            # and errors in fields are raised
+            try:
+                scalar_values = get_scalars(obj)
+            except AttributeError:
+                if fallback is None:
+                    raise
+                return fallback(obj, fields)
+            for (pos, format, default), value in zip(formats,
+                                                     scalar_values):
+                if value is None:
+                    values[pos] = default
+                elif format is None:
+                    values[pos] = value
+                else:
+                    values[pos] = format(value)
+        for pos, output in others:
+            values[pos] = output(obj)
+        return OrderedDict(zip(keys, values))
+
+    return marshal_record
+
+
+def _build_row_plan(fields, names, native):
+    index = {name: i for i, name in enumerate(names)}
+
+    def locate(name):
+        try:
+            return index[name]
+        except KeyError:
+            raise MarshallException(f'Unknown column: {name}')
+
+    return _build_plan(fields, locate, itemgetter, native)
+
+
+def bind_rows(fields, columns, native=False):
+    """Compile fields into a function to marshal a positional row.
+
+    Fields are bound to the column positions once, so that
+    each row is accessed by index without looking up names.
+    The compiled function is cached per fields and columns.
+
+    Args:
+        fields: dict
+            fields used in marshal, the names must be column names
+        columns: sequence
+            DB-API `cursor.description`, namedtuple class
+            or list of column names
+        native: bool (default: False)
+            same as `marshal`
+
+    Raises:
+        MarshallException: if a field is not found in the columns
+
+    Example:
+        >>> cursor.execute('SELECT id, name FROM users')
+        >>> marshal_row = bind_rows(user_fields, cursor.description)
+        >>> [marshal_row(row) for row in cursor]
+    """
+    names = _column_names(columns)
+    return _row_plans.get_or_set(
+        fields, lambda: _build_row_plan(fields, names, native),
+        key=(names, native))
+
+
+def marshal_rows(rows, fields, columns=None, key=None, native=False):
+    """Marshal positional rows such as DB-API tuples and namedtuples.
+
+    Args:
+        rows: iterable of tuple
+        fields: dict
+        columns: sequence (default: None)
+            see `bind_rows`, if not provided,
+            `_fields` of the first namedtuple row is used
+        key: object (default: None)
+            if provided, key will be used at the top of the output data
+        native: bool (default: False)
+            same as `marshal`
+    """
+    rows = rows if isinstance(rows, (list, tuple)) else list(rows)
+
+    if columns is None:
+        if rows and hasattr(rows[0], '_fields'):
+            columns = rows[0]._fields
+        else:
+            if rows:
+                raise MarshallException(
+                    'columns must be provided for non-namedtuple rows')
+            columns = ()
+
+    if rows:
+        marshal_row = bind_rows(fields, columns, native=native)
+        out = [marshal_row(row) for row in rows]
+    else:
+        out = []
+
+    return OrderedDict([(key, out)]) if key else out
+
+
+_type_plans = FieldsCache(maxsize=256)
+
+
+def _attribute_names(cls):
+    """Return declared attribute names of dataclass, attrs class
+    or class with `__slots__`, None for other classes.
+    """
+    if hasattr(cls, '__getitem__'):
+        # get_value tries subscription first
+        return None
+
+    names = set()
+    if dataclasses.is_dataclass(cls):
+        names.update(f.name for f in dataclasses.fields(cls))
+
+    attrs = getattr(cls, '__attrs_attrs__', None)
+    if attrs is not None:
+        names.update(a.name for a in attrs)
+
+    for klass in cls.__mro__:
+        slots = klass.__dict__.get('__slots__')
+        if slots is not None:
+            names.update([slots] if isinstance(slots, str) else slots)
+
+    return names or None
+
+
+@lru_cache(maxsize=1024)
+def _declares_attributes(cls) -> bool:
+    # other classes do not use the type plans
+    return _attribute_names(cls) is not None
+
+
+def _build_type_plan(fields, cls, names, native):
+    def locate(name):
+        attr = name.split('.', 1)[0]
+        if attr not in names and not hasattr(cls, attr):
+            raise MarshallException(
+                f'Unknown attribute of {cls.__name__}: {name}')
+        return name
+
+    def fallback(obj, fields):
+        # unset slot or nested value which is not an object,
+        # handled as same as marshal
+        return _marshal_generic(obj, fields, native)
+
+    return _build_plan(fields, locate, attrgetter, native, fallback)
+
+
+def bind_type(fields, cls, native=False):
+    """Compile fields into a function to marshal instances of the class.
+
+    This is used by marshal automatically for dataclass, attrs class
+    and class with `__slots__`, so that each field is read by
+    attribute access rather than trying subscription first.
+    The compiled function is cached per fields and class.
+
+    Args:
+        fields: dict
+        cls: type
+            dataclass, attrs class or class with `__slots__`
+        native: bool (default: False)
+            same as `marshal`
+
+    Raises:
+        MarshallException: if the class is not supported
+            or field is not an attribute of the class
+    """
+    names = _attribute_names(cls)
+    if names is None:
+        raise MarshallException(
+            f'{cls.__name__} is not a dataclass, attrs or slots class')
+
+    return _type_plans.get_or_set(
+        fields, lambda: _build_type_plan(fields, cls, names, native),
+        key=(cls, native))
+
+
+def _build_auto_type_plan(fields, cls, native):
+    names = _attribute_names(cls)
+    if names is None:
+        return None
+    try:
+        return _build_type_plan(fields, cls, names, native)
+    except MarshallException:
+        # fields which are not attributes are handled by get_value
+        return None
 
-    if isinstance(data, (list, tuple)):
-        return (OrderedDict([(key, [marshal(d, fields) for d in data])])
-                if key else [marshal(d, fields) for d in data])
 
-    items = ((k, marshal(data, v) if isinstance(v, dict)
-              else make(v).output(k, data))
-             for k, v in fields.items())
-    return OrderedDict([(key, OrderedDict(items))]) \
-        if key else OrderedDict(items)
+def _type_plan(cls, fields, native):
+    return _type_plans.get_or_set(
+        fields, lambda: _build_auto_type_plan(fields, cls, native),
+        key=('auto', cls, native))
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.memory
+==========================
+
+Memory accounting of requests per route.
+"""
+
+import logging
+import random
+import sys
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('log', 'stream')
+
+# tracemalloc is shared by the trackers of all routes,
+# then it is started by the first tracer and stopped by the last
+_trace_lock = threading.Lock()
+_tracers = 0
+_started = False
+
+# Python < 3.9 does not have reset_peak
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+def _start_tracing() -> bool:
+    """Start tracing for a tracer.
+
+    Returns:
+        True if the traced peak is since this call
+    """
+    global _tracers, _started
+    with _trace_lock:
+        _tracers += 1
+        if _tracers > 1:
+            return False
+        _started = not tracemalloc.is_tracing()
+        if _started:
+            tracemalloc.start()
+            return True
+        if _reset_peak is not None:
+            _reset_peak()
+            return True
+        return False
+
+
+def _stop_tracing() -> None:
+    global _tracers, _started
+    with _trace_lock:
+        _tracers -= 1
+        # do not stop tracing started by others
+        if _tracers == 0 and _started:
+            tracemalloc.stop()
+            _started = False
+
+
+def deep_sizeof(obj) -> int:
+    """Return approximate size of marshalled output in bytes."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v) for v in obj)
+    return size
+
+
+class MemoryTracker(object):
+    """Aggregate memory usage of the requests of a route.
+
+    Peak allocation is traced by tracemalloc for a fraction of requests.
+    Since tracemalloc traces the whole process, one request at a time
+    is sampled per route and the peak includes allocations of other
+    threads. While a request of another route is traced, or without
+    `tracemalloc.reset_peak`, the traced memory at the end is recorded
+    instead of the peak.
+
+    Args:
+        name: str
+            endpoint name used in logs
+        sample_rate: float (default: 0.01)
+            fraction of requests to trace
+        soft_limit: int (default: None)
+            size of response body in bytes to take the action
+        action: str (default: 'log')
+            'log': log a warning when a response exceeds the soft limit
+            'stream': also stream the responses estimated to exceed it
+            from the record count and the average size of a record
+    """
+
+    def __init__(self, name, sample_rate=0.01, soft_limit=None,
+                 action='log'):
+        if action not in ACTIONS:
+            raise ValueError(f'Unknown action: {action}')
+
+        self.name = name
+        self.sample_rate = sample_rate
+        self.soft_limit = soft_limit
+        self.action = action
+
+        self._lock = threading.Lock()
+        self._tracing = threading.Lock()
+
+        self.requests = 0
+        self.sampled = 0
+        self.peak_max = 0
+        self.peak_total = 0
+        self.output_max = 0
+        self.records_total = 0
+        self.records_max = 0
+        # records and bytes of responses with known record count
+        self._sized_records = 0
+        self._sized_bytes = 0
+        self.sized = 0
+        self.bytes_total = 0
+        self.bytes_max = 0
+        self.over_limit = 0
+        self.streamed = 0
+
+    def begin(self) -> bool:
+        """Start tracing if the request is sampled.
+
+        Returns:
+            True if tracing is started, then `end` must be called
+        """
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return False
+        if not self._tracing.acquire(blocking=False):
+            return False
+
+        try:
+            self._peak = _start_tracing()
+        except Exception:
+            self._tracing.release()
+            raise
+        self._base = tracemalloc.get_traced_memory()[0]
+        return True
+
+    def end(self) -> int:
+        """Stop tracing and return the peak allocation in bytes."""
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            if not self._peak:
+                peak = current
+            _stop_tracing()
+        finally:
+            self._tracing.release()
+        return max(peak - self._base, 0)
+
+    @property
+    def bytes_per_record(self) -> float:
+        if not self._sized_records:
+            return 0.0
+        return self._sized_bytes / self._sized_records
+
+    def should_stream(self, records) -> bool:
+        """Return True if the response of the records is estimated
+        to exceed the soft limit.
+        """
+        if self.action != 'stream' or self.soft_limit is None:
+            return False
+        return records * self.bytes_per_record > self.soft_limit
+
+    def record(self, records=None, size=None, peak=None, output=None,
+               streamed=False) -> None:
+        """Record the request.
+
+        Args:
+            records: int
+                number of marshalled records
+            size: int
+                size of the response body in bytes, None if streamed
+            peak: int
+                peak allocation traced in bytes
+            output: int
+                approximate size of marshalled output in bytes
+            streamed: bool
+                True if it is streamed by the soft limit
+        """
+        with self._lock:
+            self.requests += 1
+            if peak is not None:
+                self.sampled += 1
+                self.peak_total += peak
+                self.peak_max = max(self.peak_max, peak)
+            if output is not None:
+                self.output_max = max(self.output_max, output)
+            if records is not None:
+                self.records_total += records
+                self.records_max = max(self.records_max, records)
+            if size is not None:
+                self.sized += 1
+                self.bytes_total += size
+                self.bytes_max = max(self.bytes_max, size)
+                if records:
+                    self._sized_records += records
+                    self._sized_bytes += size
+            if streamed:
+                self.streamed += 1
+
+        limited = self.soft_limit is not None and size is not None
+        if limited and size > self.soft_limit:
+            with self._lock:
+                self.over_limit += 1
+            logger.warning('Response of %s exceeds soft limit: %d bytes '
+                           '(%s records)', self.name, size, records)
+
+    def info(self) -> dict:
+        """Return statistics of the route."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'sampled': self.sampled,
+                'peak_max': self.peak_max,
+                'peak_avg': (self.peak_total / self.sampled
+                             if self.sampled else 0.0),
+                'output_max': self.output_max,
+                'records_max': self.records_max,
+                'records_avg': (self.records_total / self.requests
+                                if self.requests else 0.0),
+                'bytes_max': self.bytes_max,
+                'bytes_avg': (self.bytes_total / self.sized
+                              if self.sized else 0.0),
+                'over_limit': self.over_limit,
+                'streamed': self.streamed,
+            }
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.pagination
+==============================
+
+Keyset (cursor) pagination returned from list views.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from uuid import UUID
+
+from flask import current_app, has_request_context, request
+
+from .exceptions import InvalidCursorException, MarshallException
+from .fields import get_value
+from .marshal import _column_names, marshal, marshal_rows, project
+
+_SIGNATURE_SIZE = 16
+
+
+def _secret(secret):
+    if secret is None:
+        secret = current_app.secret_key
+    if not secret:
+        raise RuntimeError('secret_key is required to sign cursors')
+    return secret.encode() if isinstance(secret, str) else secret
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _tag(value):
+    """Convert the key value into JSON with tagged values
+    of the types not in JSON.
+    """
+    if isinstance(value, tuple):
+        return {'$tuple': [_tag(v) for v in value]}
+    if isinstance(value, list):
+        return [_tag(v) for v in value]
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$decimal': str(value)}
+    if isinstance(value, UUID):
+        return {'$uuid': str(value)}
+    return value
+
+
+_UNTAG = {
+    '$tuple': tuple,
+    '$datetime': datetime.fromisoformat,
+    '$date': date.fromisoformat,
+    '$decimal': Decimal,
+    '$uuid': UUID,
+}
+
+
+def _untag(obj):
+    if len(obj) == 1:
+        (tag, value), = obj.items()
+        untag = _UNTAG.get(tag)
+        if untag is not None:
+            return untag(value)
+    return obj
+
+
+def encode_cursor(value, secret=None) -> str:
+    """Encode the key value into an opaque signed cursor.
+
+    Tuple, datetime, date, Decimal and UUID values are tagged
+    to be decoded into the same types.
+    """
+    payload = json.dumps(_tag(value), separators=(',', ':')).encode()
+    signature = hmac.new(_secret(secret), payload,
+                         hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+    return _b64encode(payload) + '.' + _b64encode(signature)
+
+
+def decode_cursor(cursor, secret=None):
+    """Decode the cursor into the key value.
+
+    Raises:
+        InvalidCursorException: if the cursor is malformed or not signed
+    """
+    try:
+        payload, signature = cursor.split('.')
+        payload = _b64decode(payload)
+        signature = _b64decode(signature)
+    except (ValueError, TypeError):
+        raise InvalidCursorException('Malformed cursor')
+
+    expected = hmac.new(_secret(secret), payload,
+                        hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+    if not hmac.compare_digest(signature, expected):
+        raise InvalidCursorException('Invalid cursor signature')
+    try:
+        return json.loads(payload, object_hook=_untag)
+    except (ValueError, TypeError, ArithmeticError):
+        raise InvalidCursorException('Malformed cursor')
+
+
+class Page(object):
+    """Page of keyset pagination.
+
+    Rows are fetched after the key of the cursor, ordered by the key.
+    `limit + 1` rows are fetched to know whether the next page exists,
+    and only the page is marshalled.
+
+    Args:
+        query: callable or iterable
+            function which takes the last key (None for the first page)
+            and the number of rows, and returns the rows ordered by the key,
+            e.g. `SELECT ... WHERE id > ? ORDER BY id LIMIT ?`.
+            An iterable ordered by the key is scanned from the beginning.
+        key: str (default: 'id')
+            name of the field in `fields` to order the rows
+        limit: int (default: 20)
+            page size
+        cursor: str (default: None)
+            cursor returned as `next` of the previous page
+        columns: sequence (default: None)
+            columns of positional rows, see `marshal_rows`
+        secret: str or bytes (default: None)
+            key to sign cursors, `app.secret_key` is used if None
+        data_key: str (default: 'data')
+            key of the marshalled rows in the envelope
+
+    Example:
+        >>> class Users:
+        ...     def get(self):
+        ...         return paginate(
+        ...             lambda after, limit: db.execute(
+        ...                 'SELECT id, name FROM users WHERE id > ? '
+        ...                 'ORDER BY id LIMIT ?', (after or 0, limit)),
+        ...             columns=['id', 'name'])
+        ...
+        >>> paths = Paths([('/users', Users, {'marshal_fields': fields})])
+
+        returns
+
+        {"data": [{"id": 1, "name": "foo"}, ...], "next": "WzIwXQ.x3..."}
+    """
+
+    def __init__(self, query, key='id', limit=20, cursor=None, columns=None,
+                 secret=None, data_key='data'):
+        self.query = query
+        self.key = key
+        self.limit = limit
+        self.cursor = cursor
+        self.columns = columns
+        self.secret = secret
+        self.data_key = data_key
+
+    def _key_getter(self):
+        if self.columns is None:
+            return lambda row: get_value(self.key, row)
+        try:
+            index = _column_names(self.columns).index(self.key)
+        except ValueError:
+            raise MarshallException(f'Key is not in columns: {self.key}')
+        return lambda row: row[index]
+
+    def fetch(self) -> tuple:
+        """Fetch rows of the page.
+
+        Returns:
+            tuple of rows and the cursor of the next page or None
+        """
+        after = (decode_cursor(self.cursor, self.secret)
+                 if self.cursor else None)
+        get_key = self._key_getter()
+
+        if callable(self.query):
+            rows = list(self.query(after, self.limit + 1))
+        else:
+            rows = self.query
+            if after is not None:
+                rows = (row for row in rows if get_key(row) > after)
+            rows = list(islice(rows, self.limit + 1))
+
+        if len(rows) <= self.limit:
+            return rows, None
+
+        rows = rows[:self.limit]
+        return rows, encode_cursor(get_key(rows[-1]), self.secret)
+
+    def marshal(self, fields, only=None, native=False,
+                data_key=None) -> OrderedDict:
+        """Marshal the page into the envelope with `next` cursor.
+
+        Args:
+            fields: dict
+                fields to marshal a row, which must have the key field
+            only: list of str (default: None)
+                field names to marshal, see `marshal`
+            native: bool (default: False)
+            data_key: str (default: None)
+                key of the rows instead of the default of the page
+        """
+        if self.key not in fields:
+            raise MarshallException(f'Key is not in fields: {self.key}')
+        if only is not None:
+            fields = project(fields, only)
+
+        rows, next_cursor = self.fetch()
+        if self.columns is not None:
+            data = marshal_rows(rows, fields, self.columns, native=native)
+        else:
+            data = marshal(rows, fields, native=native)
+
+        return OrderedDict([(data_key or self.data_key, data),
+                            ('next', next_cursor)])
+
+
+def paginate(query, key='id', limit=20, max_limit=100, columns=None,
+             secret=None, cursor_param='cursor', limit_param='limit'):
+    """Return `Page` with cursor and limit from query parameters.
+
+    Args:
+        limit: int (default: 20)
+            page size if `limit` parameter is not given
+        max_limit: int (default: 100)
+            max page size requested by `limit` parameter
+
+    See `Page` for the other arguments.
+    """
+    cursor = None
+    if has_request_context():
+        cursor = request.args.get(cursor_param) or None
+        requested = request.args.get(limit_param, type=int)
+        if requested is not None:
+            limit = max(1, min(requested, max_limit))
+
+    return Page(query, key=key, limit=limit, cursor=cursor, columns=columns,
+                secret=secret)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.profiler
+============================
+
+Sampling profiler attributing samples to the endpoints of `BaseView`.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# endpoint and root frame of the request handled by each thread,
+# keyed by thread id
+_endpoints = {}
+
+
+def enter(name):
+    """Tag the current thread with the endpoint until `leave`.
+
+    This is called by the views of `BaseView`, and the frame of
+    the caller is the root of the sampled stacks.
+
+    Returns:
+        previous tag to pass to `leave`
+    """
+    ident = threading.get_ident()
+    previous = _endpoints.get(ident)
+    _endpoints[ident] = (name, sys._getframe(1))
+    return previous
+
+
+def leave(previous):
+    """Restore the tag of the current thread."""
+    ident = threading.get_ident()
+    if previous is None:
+        _endpoints.pop(ident, None)
+    else:
+        _endpoints[ident] = previous
+
+
+def _label(code):
+    return (f'{code.co_name} ({os.path.basename(code.co_filename)}'
+            f':{code.co_firstlineno})')
+
+
+class SamplingProfiler(object):
+    """Sample stacks of threads handling requests of the views.
+
+    No hook is installed, so that there is no overhead
+    while it is not running except tagging threads by `enter`.
+
+    Args:
+        hz: float (default: 100)
+            samples per second
+        max_depth: int (default: 64)
+            max number of frames kept from the endpoint
+
+    Example:
+        >>> profiler = SamplingProfiler(hz=100)
+        >>> stacks = profiler.run(5)
+        >>> print(profiler.collapse(stacks))
+        index;get (app.py:10);marshal (marshal.py:25) 12
+    """
+
+    def __init__(self, hz=100, max_depth=64):
+        self.hz = hz
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        # result of the last `start`
+        self.stacks = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, ignore=()) -> list:
+        """Return stacks of the threads in the views.
+
+        Returns:
+            list of tuple of endpoint and frame labels from the root
+        """
+        stacks = []
+        endpoints = dict(_endpoints)
+        for ident, frame in sys._current_frames().items():
+            tag = endpoints.get(ident)
+            if tag is None or ident in ignore:
+                continue
+
+            endpoint, root = tag
+            labels = []
+            while frame is not None and frame is not root:
+                labels.append(frame.f_code)
+                frame = frame.f_back
+
+            # the request is finished if the root is not in the stack
+            if frame is root:
+                labels = labels[-self.max_depth:]
+                stacks.append((endpoint,) + tuple(
+                    _label(code) for code in reversed(labels)))
+        return stacks
+
+    def run(self, duration, hz=None) -> Counter:
+        """Sample for the duration in seconds in the current thread.
+
+        Args:
+            duration: float
+            hz: float (default: None)
+                samples per second instead of the default
+
+        Returns:
+            Counter of stacks
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError('Profiler is already running')
+
+        try:
+            return self._run(duration, hz)
+        finally:
+            self._lock.release()
+
+    def _run(self, duration, hz):
+        stacks = Counter()
+        interval = 1.0 / (hz or self.hz)
+        ignore = {threading.get_ident()}
+        end = time.monotonic() + duration
+        next_time = time.monotonic()
+
+        while next_time < end:
+            stacks.update(self.sample(ignore))
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return stacks
+
+    def start(self, duration, hz=None) -> None:
+        """Sample for the duration in a background thread.
+
+        The result is set to `stacks` when it is finished.
+
+        Raises:
+            RuntimeError: if the profiler is already running
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError('Profiler is already running')
+        self.stacks = None
+
+        def run():
+            try:
+                self.stacks = self._run(duration, hz)
+            finally:
+                self._lock.release()
+
+        try:
+            threading.Thread(target=run, name='api-profiler',
+                             daemon=True).start()
+        except Exception:
+            self._lock.release()
+            raise
+
+    @staticmethod
+    def collapse(stacks) -> str:
+        """Format stacks in collapsed format for flamegraph tools."""
+        return ''.join(f'{";".join(stack)} {count}\n'
+                       for stack, count in stacks.most_common())
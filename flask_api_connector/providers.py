@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.providers
+=============================
+
+Registry of resources injected into view methods by parameter name.
+"""
+
+import os
+import threading
+import weakref
+
+from flask import g
+
+SCOPES = ('process', 'thread', 'request')
+
+# names injected by BaseView itself
+RESERVED = frozenset(['self', 'request', 'session', 'g', 'body'])
+
+
+class Provider(object):
+    """Create and hold a resource in the scope.
+
+    Args:
+        name: str
+        factory: callable without arguments
+        scope: str (default: 'process')
+            'process': one per process, created again after fork
+            'thread': one per thread, closed after the thread exits
+            when a resource is created for another thread
+            'request': one per request, closed when the request ends
+        close: callable (default: None)
+            called with the resource when it is discarded
+    """
+
+    def __init__(self, name, factory, scope='process', close=None):
+        if scope not in SCOPES:
+            raise ValueError(f'Unknown scope: {scope}')
+
+        self.name = name
+        self.factory = factory
+        self.scope = scope
+        self.close = close
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._pid = None
+        self._local = threading.local()
+        # resources of thread scope keyed by id of the local value,
+        # with weak reference to the thread to close them after exit
+        self._threads = {}
+
+        self.created = 0
+        self.reused = 0
+        self.closed = 0
+
+    def get(self):
+        """Return the resource of the current scope."""
+        if self.scope == 'request':
+            return self._get_request()
+        if self.scope == 'thread':
+            return self._get_thread()
+        return self._get_process()
+
+    def _create(self):
+        value = self.factory()
+        self.created += 1
+        return value
+
+    def _get_process(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            self.reused += 1
+            return self._value
+
+        with self._lock:
+            if self._pid != pid:
+                self._value = self._create()
+                self._pid = pid
+            else:
+                self.reused += 1
+        return self._value
+
+    def _get_thread(self):
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid():
+            self.reused += 1
+            return local.value
+
+        value = local.value = self._create()
+        local.pid = os.getpid()
+        with self._lock:
+            self._threads[id(value)] = (
+                weakref.ref(threading.current_thread()), value)
+            # thread-per-request servers start new threads constantly
+            exited = [key for key, (ref, _) in self._threads.items()
+                      if ref() is None or not ref().is_alive()]
+            values = [self._threads.pop(key)[1] for key in exited]
+
+        for value in values:
+            self._discard(value)
+        return local.value
+
+    def _get_request(self):
+        values = g.setdefault('_api_providers', {})
+        if self.name in values:
+            self.reused += 1
+            return values[self.name]
+
+        value = values[self.name] = self._create()
+        return value
+
+    def _discard(self, value):
+        if self.close is not None:
+            self.close(value)
+        self.closed += 1
+
+    def after_fork(self):
+        """Forget resources inherited from the parent process.
+
+        They are not closed, since the parent process still uses them.
+        """
+        self._lock = threading.Lock()
+        self._value = None
+        self._pid = None
+        self._local = threading.local()
+        self._threads = {}
+
+    def teardown(self):
+        """Close the resource of the current request."""
+        values = g.get('_api_providers')
+        if values and self.name in values:
+            self._discard(values.pop(self.name))
+
+    def shutdown(self):
+        """Close the resources of process and thread scope."""
+        with self._lock:
+            values = [value for _, value in self._threads.values()]
+            self._threads = {}
+            if self._pid == os.getpid():
+                values.append(self._value)
+            self._value = None
+            self._pid = None
+            self._local = threading.local()
+
+        for value in values:
+            self._discard(value)
+
+    def info(self) -> dict:
+        """Return provider statistics."""
+        return {
+            'scope': self.scope,
+            'created': self.created,
+            'reused': self.reused,
+            'closed': self.closed,
+        }
+
+
+class Providers(object):
+    """Registry of providers.
+
+    Parameters of view methods with the registered names receive
+    the resources. The names are resolved when the view is registered.
+
+    Example:
+        >>> providers = Providers()
+        >>> providers.register('db', lambda: pool.connection(),
+        ...                    scope='request', close=lambda c: c.close())
+        >>> providers.register('http', requests.Session, scope='thread')
+        >>>
+        >>> class Users:
+        ...     def get(self, db, http):
+        ...         ...
+    """
+
+    def __init__(self):
+        self._providers = {}
+        _instances.add(self)
+
+    def register(self, name, factory, scope='process', close=None):
+        """Register a provider.
+
+        Args:
+            name: str
+                name of the parameter to inject
+            factory: callable without arguments
+            scope: str (default: 'process')
+                'process', 'thread' or 'request'. See `Provider`.
+            close: callable (default: None)
+                called with the resource when it is discarded
+
+        Returns:
+            Provider
+        """
+        if name in RESERVED:
+            raise ValueError(f'Reserved name: {name}')
+        provider = self._providers[name] = Provider(name, factory,
+                                                    scope=scope, close=close)
+        return provider
+
+    def provider(self, name, scope='process', close=None):
+        """Decorator version of `register`."""
+        def decorator(factory):
+            self.register(name, factory, scope=scope, close=close)
+            return factory
+        return decorator
+
+    def __contains__(self, name):
+        return name in self._providers
+
+    def __getitem__(self, name):
+        return self._providers[name]
+
+    def resolve(self, names) -> dict:
+        """Return providers for the names which are registered."""
+        return {name: self._providers[name]
+                for name in names if name in self._providers}
+
+    def after_fork(self):
+        for provider in self._providers.values():
+            provider.after_fork()
+
+    def teardown(self, exc=None):
+        """Close the resources of request scope.
+
+        This is registered by `ApiConnector.init_app` to `teardown_request`.
+        """
+        for provider in self._providers.values():
+            if provider.scope == 'request':
+                provider.teardown()
+
+    def shutdown(self):
+        """Close all resources of process and thread scope."""
+        for provider in self._providers.values():
+            provider.shutdown()
+
+    def info(self) -> dict:
+        """Return statistics of the providers by name."""
+        return {name: provider.info()
+                for name, provider in self._providers.items()}
+
+
+_instances = weakref.WeakSet()
+
+
+def _after_fork():
+    for providers in list(_instances):
+        providers.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.serializers
+===============================
+
+Registry of serializers for content negotiation.
+MessagePack and CBOR are registered
+if `msgpack` and `cbor2` are installed respectively.
+"""
+
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+
+JSON_MIMETYPE = 'application/json'
+
+
+class Serializer(object):
+    """Serializer of marshalled data.
+
+    Args:
+        mimetype: str
+            content type of the serialized data
+        dumps: callable
+            function to convert object into bytes
+        loads: callable (default: None)
+            function to convert bytes into object,
+            used to parse request body
+        native: bool (default: False)
+            if True, marshal fields such as `Fixed`, `Arbitrary` and
+            `DateTime` output Decimal and datetime instead of string
+    """
+
+    def __init__(self, mimetype, dumps, loads=None, native=False):
+        self.mimetype = mimetype
+        self.dumps = dumps
+        self.loads = loads
+        self.native = native
+
+
+SERIALIZERS = {}
+
+
+def register_serializer(serializer: Serializer) -> None:
+    """Register serializer to be used by content negotiation."""
+    SERIALIZERS[serializer.mimetype] = serializer
+
+
+def get_serializer(mimetype: str) -> Serializer:
+    """Return registered serializer, None if not available."""
+    return SERIALIZERS.get(mimetype)
+
+
+def _utc(value):
+    # naive datetime is treated as UTC as fields.DateTime does
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None \
+        else value
+
+
+if msgpack is not None:
+    def _msgpack_default(obj):
+        if isinstance(obj, datetime):
+            return msgpack.Timestamp.from_datetime(_utc(obj))
+        if isinstance(obj, date):
+            return obj.isoformat()
+        if isinstance(obj, Decimal):
+            # MessagePack does not have decimal type
+            return str(obj)
+        raise TypeError(f'Object of type {type(obj).__name__} '
+                        'is not MessagePack serializable')
+
+    def _msgpack_dumps(obj):
+        return msgpack.packb(obj, default=_msgpack_default)
+
+    def _msgpack_loads(data):
+        return msgpack.unpackb(data, timestamp=3)
+
+    register_serializer(Serializer('application/msgpack', _msgpack_dumps,
+                                   _msgpack_loads, native=True))
+    register_serializer(Serializer('application/x-msgpack', _msgpack_dumps,
+                                   _msgpack_loads, native=True))
+
+
+if cbor2 is not None:
+    def _cbor_dumps(obj):
+        return cbor2.dumps(obj, timezone=timezone.utc, date_as_datetime=True)
+
+    register_serializer(Serializer('application/cbor', _cbor_dumps,
+                                   cbor2.loads, native=True))
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.shared_cache
+================================
+
+Response cache in a memory-mapped file shared by worker processes.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from hashlib import blake2b
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_MAGIC = b'FAC1'
+# magic, number of slots, slot size
+_HEADER = struct.Struct('<4sII')
+_HEADER_SIZE = 64
+# seq, key hash, expires, last used, key length, value length
+_SLOT = struct.Struct('<QQddII')
+_SEQ = struct.Struct('<Q')
+_USED = struct.Struct('<d')
+_USED_OFFSET = 24
+
+
+def _hash(key):
+    # stable across processes, unlike hash(); 0 is for empty slots
+    return int.from_bytes(blake2b(key, digest_size=8).digest(),
+                          'little') or 1
+
+
+class SharedCache(object):
+    """Cache of bytes in a memory-mapped file shared by processes.
+
+    The file is divided into fixed-size slots, which work as a hash table
+    with bounded linear probing. When all slots in the probing window are
+    used, expired or least recently used one is evicted.
+    Values larger than a slot are not cached.
+
+    Reads take no lock and are validated by the sequence number of
+    the slot (seqlock). Writes are serialized by a file lock.
+
+    Create the cache before forking workers, e.g. in gunicorn config,
+    or give the same path to all of the workers.
+
+    Args:
+        path: str (default: None)
+            file to map, a temporary file is used if None.
+            If the file exists, its layout is used.
+        size: int (default: 64MiB)
+            size of the file in bytes
+        slot_size: int (default: 16KiB)
+            max size of an entry including the key
+        ttl: float (default: None)
+            time to live in seconds, never expired if None
+        probe: int (default: 8)
+            number of slots to look up for a key
+
+    Example:
+        >>> cache = SharedCache('/dev/shm/api-cache', size=256 * 1024 ** 2)
+        >>> cache.set(b'key', b'value')
+        >>> cache.get(b'key')
+        b'value'
+    """
+
+    def __init__(self, path=None, size=64 * 1024 * 1024, slot_size=16 * 1024,
+                 ttl=None, probe=8):
+        if slot_size <= _SLOT.size:
+            raise ValueError('slot_size is too small')
+
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='api-cache-')
+            os.close(fd)
+            # removed by the process which created it
+            self._temporary = os.getpid()
+        else:
+            self._temporary = None
+
+        self.path = path
+        self.ttl = ttl
+        self.probe = probe
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+
+        with self._locked():
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                self._mm = mmap.mmap(self._fd, size)
+                _HEADER.pack_into(self._mm, 0, _MAGIC,
+                                  (size - _HEADER_SIZE) // slot_size,
+                                  slot_size)
+            else:
+                self._mm = mmap.mmap(self._fd, 0)
+
+        magic, self.slots, self.slot_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or self.slots == 0:
+            raise ValueError(f'Invalid cache file: {path}')
+
+        # statistics of this process
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _locked(self):
+        # lockf is held per process, so that threads use the thread lock
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, h):
+        start = h % self.slots
+        for i in range(min(self.probe, self.slots)):
+            yield _HEADER_SIZE + (start + i) % self.slots * self.slot_size
+
+    def get(self, key: bytes):
+        """Return the cached value or None."""
+        h = _hash(key)
+        mm = self._mm
+        now = time.time()
+
+        for off in self._offsets(h):
+            for _ in range(3):
+                seq, sh, expires, _used, klen, vlen = \
+                    _SLOT.unpack_from(mm, off)
+                if seq & 1:
+                    # being written
+                    continue
+                if sh != h:
+                    break
+
+                start = off + _SLOT.size
+                end = start + klen + vlen
+                if end > off + self.slot_size:
+                    continue
+                data = mm[start:end]
+                if _SEQ.unpack_from(mm, off)[0] != seq:
+                    continue
+
+                if data[:klen] != key:
+                    break
+                if expires and expires < now:
+                    self.misses += 1
+                    return None
+
+                # approximate LRU, races are harmless
+                _USED.pack_into(mm, off + _USED_OFFSET, now)
+                self.hits += 1
+                return data[klen:]
+
+        self.misses += 1
+        return None
+
+    def set(self, key: bytes, value: bytes, ttl=None) -> bool:
+        """Store the value.
+
+        Returns:
+            False if the entry is larger than a slot
+        """
+        klen, vlen = len(key), len(value)
+        if _SLOT.size + klen + vlen > self.slot_size:
+            return False
+
+        h = _hash(key)
+        ttl = ttl if ttl is not None else self.ttl
+        now = time.time()
+        expires = now + ttl if ttl else 0.0
+        mm = self._mm
+
+        with self._locked():
+            target = None
+            oldest = None
+            for off in self._offsets(h):
+                seq, sh, exp, used, k, _ = _SLOT.unpack_from(mm, off)
+                if sh == h and mm[off + _SLOT.size:
+                                  off + _SLOT.size + k] == key:
+                    target = off
+                    break
+                if sh == 0 or (exp and exp < now):
+                    if target is None:
+                        target = off
+                elif oldest is None or used < oldest[1]:
+                    oldest = (off, used)
+
+            if target is None:
+                target = oldest[0]
+                self.evictions += 1
+
+            seq = _SEQ.unpack_from(mm, target)[0]
+            # odd sequence number while writing
+            _SEQ.pack_into(mm, target, seq + 1)
+            start = target + _SLOT.size
+            mm[start:start + klen] = key
+            mm[start + klen:start + klen + vlen] = value
+            _SLOT.pack_into(mm, target, seq + 1, h, expires, now, klen, vlen)
+            _SEQ.pack_into(mm, target, seq + 2)
+        return True
+
+    def delete(self, key: bytes) -> None:
+        h = _hash(key)
+        mm = self._mm
+        with self._locked():
+            for off in self._offsets(h):
+                seq, sh, _, _, k, _ = _SLOT.unpack_from(mm, off)
+                if sh == h and mm[off + _SLOT.size:
+                                  off + _SLOT.size + k] == key:
+                    _SEQ.pack_into(mm, off, seq + 1)
+                    _SLOT.pack_into(mm, off, seq + 1, 0, 0.0, 0.0, 0, 0)
+                    _SEQ.pack_into(mm, off, seq + 2)
+
+    def clear(self) -> None:
+        mm = self._mm
+        with self._locked():
+            for i in range(self.slots):
+                off = _HEADER_SIZE + i * self.slot_size
+                seq = _SEQ.unpack_from(mm, off)[0]
+                _SEQ.pack_into(mm, off, seq + 1)
+                _SLOT.pack_into(mm, off, seq + 1, 0, 0.0, 0.0, 0, 0)
+                _SEQ.pack_into(mm, off, seq + 2)
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        mm = self._mm
+        return sum(
+            1 for i in range(self.slots)
+            if _SLOT.unpack_from(mm, _HEADER_SIZE + i * self.slot_size)[1])
+
+    def info(self) -> dict:
+        """Return cache statistics.
+
+        `hits`, `misses` and `evictions` are counted in this process.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self),
+            'slots': self.slots,
+            'slot_size': self.slot_size,
+        }
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+        if self._temporary == os.getpid():
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.tasks
+=========================
+
+Background execution of long-running view methods.
+"""
+
+import logging
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, current_app, jsonify
+from werkzeug.exceptions import HTTPException
+
+from .exceptions import QueueFullException
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Task(object):
+    def __init__(self, task_id):
+        self.id = task_id
+        self.status = PENDING
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # (body, status, headers) of the response
+        self.response = None
+        self.error = None
+
+
+class TaskRunner(object):
+    """Run functions on a bounded thread pool and keep the results.
+
+    Args:
+        workers: int (default: 4)
+            number of threads
+        max_queue: int (default: 100)
+            max number of tasks waiting for a thread
+        ttl: float (default: 300)
+            seconds to keep finished tasks
+
+    Example:
+        >>> runner = TaskRunner(workers=2)
+        >>> task = runner.submit(lambda: (b'{}', 200, []))
+        >>> runner.get(task.id) is task
+        True
+    """
+
+    def __init__(self, workers=4, max_queue=100, ttl=300):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+
+        self._executor = None
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.time_total = 0.0
+        self.time_max = 0.0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='api-task')
+        return self._executor
+
+    def _expired(self, task, now):
+        return task.finished is not None and task.finished + self.ttl <= now
+
+    def _purge(self, now):
+        # scan at most once per second
+        if now < self._next_purge:
+            return
+        self._next_purge = now + 1
+        for task_id in [task_id for task_id, task in self._tasks.items()
+                        if self._expired(task, now)]:
+            del self._tasks[task_id]
+
+    def submit(self, func) -> Task:
+        """Submit the function which returns (body, status, headers).
+
+        Raises:
+            QueueFullException: if `max_queue` tasks are waiting
+        """
+        with self._lock:
+            self._purge(time.time())
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullException('Task queue is full')
+
+            task = Task(secrets.token_urlsafe(16))
+            self._tasks[task.id] = task
+            self.queued += 1
+            self.submitted += 1
+
+        self.executor.submit(self._run, task, func)
+        return task
+
+    def _run(self, task, func):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        task.started = time.time()
+        task.status = RUNNING
+
+        start = time.perf_counter()
+        try:
+            task.response = func()
+            task.status = DONE
+        except HTTPException as e:
+            # e.g. abort(404) is the response of the task
+            resp = e.get_response()
+            task.response = (resp.get_data(), resp.status_code,
+                             resp.headers.to_wsgi_list())
+            task.status = DONE
+        except Exception as e:
+            logger.exception('Task %s failed', task.id)
+            task.error = e
+            task.status = FAILED
+        finally:
+            elapsed = time.perf_counter() - start
+            task.finished = time.time()
+            with self._lock:
+                self.running -= 1
+                if task.status == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self.time_total += elapsed
+                self.time_max = max(self.time_max, elapsed)
+
+    def get(self, task_id):
+        """Return the task or None if it is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            task = self._tasks.get(task_id)
+        if task is None or self._expired(task, now):
+            return None
+        return task
+
+    def info(self) -> dict:
+        """Return statistics of the tasks."""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'time_avg': self.time_total / finished if finished else 0.0,
+                'time_max': self.time_max,
+                'stored': len(self._tasks),
+            }
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def make_status_view(runner):
+    """Return view function to poll the task.
+
+    It returns 202 while the task is pending or running,
+    the response of the view method when it is done,
+    and 500 if it failed. The error is logged by the runner
+    and not exposed to the client.
+    """
+    def task_status(task_id):
+        task = runner.get(task_id)
+        if task is None:
+            abort(404)
+
+        if task.status in (PENDING, RUNNING):
+            resp = jsonify(task_id=task.id, status=task.status)
+            resp.status_code = 202
+            resp.headers['Retry-After'] = '1'
+            return resp
+
+        if task.status == FAILED:
+            resp = jsonify(task_id=task.id, status=task.status,
+                           message='Task failed.')
+            resp.status_code = 500
+            return resp
+
+        body, status, headers = task.response
+        return current_app.response_class(body, status=status,
+                                          headers=headers)
+    return task_status
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.timing
+==========================
+
+Timing of request phases.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import g
+
+PHASES = ('handler', 'marshal', 'encode', 'total')
+
+
+def timed(func, phase):
+    """Wrapper to add time taken by the function to the phase
+    of the current request.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            timings = g.setdefault('_api_timings', {})
+            timings[phase] = timings.get(phase, 0.0) + elapsed
+    return wrapper
+
+
+def pop_timings() -> dict:
+    """Return and clear the timings of the current request."""
+    return g.pop('_api_timings', None) or {}
+
+
+def server_timing(timings) -> str:
+    """Format timings in seconds as `Server-Timing` header value."""
+    return ', '.join(f'{phase};dur={timings[phase] * 1000:.3f}'
+                     for phase in PHASES if phase in timings)
+
+
+class SlowRequests(object):
+    """Keep the slowest requests.
+
+    Args:
+        size: int
+            number of requests to keep
+
+    Example:
+        >>> slow = SlowRequests(10)
+        >>> slow.record(0.5, {'path': '/items'})
+        >>> slow.entries()
+        [{'path': '/items', 'time': 500.0}]
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._heap = []
+        # tie breaker not to compare entries
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def threshold(self) -> float:
+        """Return the time to be kept, 0 until it is filled."""
+        heap = self._heap
+        return heap[0][0] if len(heap) >= self.size else 0.0
+
+    def record(self, elapsed, entry) -> None:
+        """Record the request if it is one of the slowest.
+
+        Args:
+            elapsed: float
+                seconds taken by the request
+            entry: dict or callable
+                details of the request, or function to build them
+                which is called only if the request is kept
+        """
+        if elapsed <= self.threshold():
+            return
+
+        if callable(entry):
+            entry = entry()
+        item = (elapsed, next(self._counter), entry)
+
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif elapsed > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def entries(self) -> list:
+        """Return the requests from the slowest one,
+        with `time` in milliseconds.
+        """
+        with self._lock:
+            items = sorted(self._heap, reverse=True)
+        return [dict(entry, time=elapsed * 1000)
+                for elapsed, _, entry in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
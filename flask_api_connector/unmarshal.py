@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2020, Rio Matsuoka
+# All rights reserved.
+"""
+flask_api_connector.unmarshal
+=============================
+
+Parse and validate input data with the same fields used in marshal.
+"""
+
+import json
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from .exceptions import InvalidFieldDataException, ValidationException
+from .marshal import FieldsCache, make
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+JSON_DECODERS = {'json': json.loads}
+
+if orjson is not None:
+    JSON_DECODERS['orjson'] = orjson.loads
+
+
+def get_json_decoder(decoder):
+    """Return a function to decode JSON.
+
+    Args:
+        decoder: str or callable
+            name of registered decoder such as 'json' and 'orjson'
+            or a function to take bytes and return decoded object
+    """
+    if callable(decoder):
+        return decoder
+    try:
+        return JSON_DECODERS[decoder]
+    except KeyError:
+        raise ValueError(f'JSON decoder is not available: {decoder}')
+
+
+_MISSING = object()
+
+_plans = FieldsCache(maxsize=256)
+
+# fail_fast of the current unmarshal, inherited by nested fields
+_fail_fast = ContextVar('fail_fast', default=False)
+
+
+def failing_fast() -> bool:
+    """Return True if the current unmarshal stops at the first error."""
+    return _fail_fast.get()
+
+
+def _build_plan(fields) -> tuple:
+    plan = []
+    for name, field in fields.items():
+        if isinstance(field, dict):
+            plan.append((name, None, False, None, field))
+        else:
+            field = make(field)
+            plan.append((name, field, getattr(field, 'required', False),
+                         field.default, None))
+    return tuple(plan)
+
+
+def _compile(fields) -> tuple:
+    """Build parsing plan of the fields.
+
+    The plan is a tuple of (name, field, required, default, nested fields)
+    and built once per fields.
+    """
+    return _plans.get_or_set(fields, lambda: _build_plan(fields))
+
+
+def prepare(fields) -> None:
+    """Build the plans of the fields and nested fields
+    before the first unmarshal.
+    """
+    for _, field, _, _, nested in _compile(fields):
+        if nested is None:
+            target = getattr(field, 'container', None) or field
+            nested = getattr(target, 'nested', None)
+        if isinstance(nested, dict):
+            prepare(nested)
+
+
+def _unmarshal_item(data, fields, fail_fast, prefix, errors):
+    if not isinstance(data, dict):
+        errors[prefix.rstrip('.') or '_'] = 'Must be an object.'
+        if fail_fast:
+            raise ValidationException(errors)
+        return None
+
+    out = OrderedDict()
+    for name, field, required, default, nested in _compile(fields):
+        value = data.get(name, _MISSING)
+
+        if nested is not None:
+            out[name] = _unmarshal_item(
+                {} if value is _MISSING else value,
+                nested, fail_fast, f'{prefix}{name}.', errors)
+            continue
+
+        if value is _MISSING or value is None:
+            if required:
+                errors[prefix + name] = 'Missing required field.'
+                if fail_fast:
+                    raise ValidationException(errors)
+            elif value is None and getattr(field, 'allow_null', False):
+                out[name] = None
+            else:
+                out[name] = default
+            continue
+
+        try:
+            out[name] = field.parse(value)
+        except InvalidFieldDataException as e:
+            errors[prefix + name] = str(e)
+        except ValidationException as e:
+            for key, message in e.errors.items():
+                errors[f'{prefix}{name}.{key}'] = message
+
+        if errors and fail_fast:
+            raise ValidationException(errors)
+
+    return out
+
+
+def unmarshal(data, fields, fail_fast=False):
+    """Parse input data into typed values by fields.
+
+    This is symmetric to `marshal`, and `parse` method of each field
+    is used to convert the value.
+
+    Args:
+        data: dict or list of dict
+            input data such as decoded JSON
+        fields: dict
+            key-value pair of field name and field
+        fail_fast: bool (default: False)
+            if True, stop at the first error,
+            otherwise collect all errors in the data
+
+    Raises:
+        ValidationException: if the data is invalid,
+            `errors` has the messages keyed by dot-separated field name.
+
+    Example:
+        >>> from flask_api_connector import fields
+        >>> from flask_api_connector.unmarshal import unmarshal
+        >>>
+        >>> unmarshal({'a': '1.5'}, {'a': fields.Fixed(2)})
+        OrderedDict([('a', Decimal('1.50'))])
+    """
+    errors = OrderedDict()
+
+    token = _fail_fast.set(fail_fast)
+    try:
+        if isinstance(data, list):
+            out = []
+            for i, item in enumerate(data):
+                out.append(_unmarshal_item(item, fields, fail_fast,
+                                           f'{i}.', errors))
+        else:
+            out = _unmarshal_item(data, fields, fail_fast, '', errors)
+    finally:
+        _fail_fast.reset(token)
+
+    if errors:
+        raise ValidationException(errors)
+    return out
@@ -11,37 +11,1016 @@ View class to connect flask app
 """
 
 import inspect
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict
 from functools import partialmethod, wraps
+from hashlib import blake2b
 
-from flask import request, session, g, jsonify
+from flask import (
+    Response, abort, copy_current_request_context, current_app, g,
+    has_request_context, jsonify, request, session, stream_with_context,
+    url_for
+)
 from flask.views import View, http_method_funcs
 
+from . import profiler
+from .compression import CODECS, Compressor, select_encoding
+from .concurrency import ConcurrencyLimiter, SingleFlight
+from .encoder import marshal_to_json
+from .exceptions import (
+    InvalidCursorException, MarshallException, QueueFullException,
+    ValidationException
+)
+from .marshal import (
+    FieldsCache, batch_loading, is_collection, marshal, marshal_normalized,
+    normalizing, profile_fields, project
+)
+from .memory import MemoryTracker, deep_sizeof
+from .pagination import Page
+from .serializers import JSON_MIMETYPE, get_serializer
+from .tasks import TaskRunner
+from .timing import SlowRequests, pop_timings, server_timing, timed
+from .unmarshal import get_json_decoder, unmarshal
 
-def _make_jsonify(view_func):
-    """Wrapper to convert dict to response object."""
+
+def _get_projection(param):
+    """Parse field names from query parameter, e.g. `?fields=id,owner.name`.
+    """
+    values = request.args.getlist(param)
+    if not values:
+        return None
+    return [name.strip()
+            for value in values
+            for name in value.split(',') if name.strip()]
+
+
+def _negotiate(content_types):
+    """Choose serializer by `Accept` header, None for JSON.
+
+    Abort with 406 if none of the content types is acceptable.
+    """
+    accept = request.accept_mimetypes
+    # the first one is used if no `Accept` header is provided
+    if accept:
+        mimetype = accept.best_match(content_types)
+    else:
+        mimetype = content_types[0] if content_types else None
+    if mimetype is None:
+        abort(406)
+    if mimetype == JSON_MIMETYPE:
+        return None
+    return get_serializer(mimetype)
+
+
+def _serialize(out, serializer):
+    if serializer is None:
+        resp = jsonify(out)
+    else:
+        resp = Response(serializer.dumps(out), mimetype=serializer.mimetype)
+    resp.vary.add('Accept')
+    return resp
+
+
+def _is_head() -> bool:
+    # view methods can be called without request, e.g. in tests
+    return has_request_context() and request.method == 'HEAD'
+
+
+def _head_response(serializer=None, negotiated=False):
+    """Return response with headers of GET response for HEAD request
+    without marshalling and encoding the body.
+
+    The body is not computed, so that `Content-Length` is omitted.
+    """
+    mimetype = JSON_MIMETYPE if serializer is None else serializer.mimetype
+    # empty iterator not to set Content-Length: 0
+    resp = current_app.response_class(iter(()), mimetype=mimetype)
+    if negotiated:
+        resp.vary.add('Accept')
+    return resp
+
+
+def _request_profile() -> dict:
+    return g.setdefault('_api_profile', {})
+
+
+# profiled fields built once per fields, stats are kept per request
+_profiled = FieldsCache(maxsize=256)
+
+
+def _profiled_marshal(data, fields, key=None, only=None, native=False):
+    """Marshal with `profile_fields` to record time of each field
+    into `g._api_profile`.
+    """
+    if only is not None:
+        fields = project(fields, only)
+    profiled = _profiled.get_or_set(
+        fields, lambda: profile_fields(fields, _request_profile))
+    # loaders are found in the original fields
+    with batch_loading(data, fields):
+        return marshal(data, profiled, key=key, native=native)
+
+
+def _profiled_normalized(data, fields, key=None, only=None, native=False):
+    """`marshal_normalized` with `profile_fields`."""
+    with normalizing() as entities:
+        out = _profiled_marshal(data, fields, only=only, native=native)
+    return OrderedDict([(key or 'data', out), ('included', entities)])
+
+
+def _make_jsonify(view_func, fields=None, key=None, projection_param=None,
+                  content_types=None, fused_json=False, timing=False,
+                  profile=False, memory=None, normalize=False):
+    """Wrapper to convert dict to response object.
+
+    If fields is given, the returned value is marshalled before converted.
+    If fused_json is True as well, JSON is written directly by
+    `marshal_to_json`.
+    If content_types is given, the response format is negotiated
+    by `Accept` header.
+    Response object returned from the view is passed through,
+    e.g. streaming response.
+    If timing is True, time of handler, marshal and encode phases
+    is recorded for the request, and time of each field as well
+    if profile is True.
+    If memory is given, the record count is passed to the tracker,
+    and JSON is streamed if it is estimated to exceed the soft limit.
+    If normalize is True, the result is marshalled by `marshal_normalized`.
+    HEAD request dispatched to `get` skips marshalling and encoding.
+    """
+    def encode(out, serializer=None):
+        if content_types is None:
+            return jsonify(out)
+        return _serialize(out, serializer)
+
+    handler = view_func
+    if timing:
+        handler = timed(view_func, 'handler')
+        encode = timed(encode, 'encode')
+
+    if fields is None and content_types is None:
+        if timing:
+            @wraps(view_func)
+            def timed_wrapper(*args, **kwargs):
+                out = handler(*args, **kwargs)
+                if isinstance(out, Response):
+                    return out
+                if _is_head():
+                    return _head_response()
+                return encode(out)
+            return timed_wrapper
+
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            out = view_func(*args, **kwargs)
+            if isinstance(out, Response):
+                return out
+            if _is_head():
+                return _head_response()
+            return jsonify(out)
+        return wrapper
+
+    marshal_ = marshal
+    to_json = marshal_to_json
+    if profile or normalize:
+        # fields are replaced by profiled ones instead of fused writers,
+        # and fused writers do not normalize
+        fused_json = False
+    if profile:
+        marshal_ = _profiled_normalized if normalize else _profiled_marshal
+    elif normalize:
+        marshal_ = marshal_normalized
+    if timing:
+        marshal_ = timed(marshal_, 'marshal')
+        to_json = timed(marshal_to_json, 'marshal')
+
+    if content_types is not None:
+        # only available content types are used
+        content_types = [t for t in content_types
+                         if t == JSON_MIMETYPE or get_serializer(t)]
+
+    @wraps(view_func)
+    def marshal_wrapper(*args, **kwargs):
+        serializer = (_negotiate(content_types)
+                      if content_types is not None else None)
+
+        only = (_get_projection(projection_param)
+                if fields is not None and projection_param else None)
+
+        # validate projection before running the handler
+        if only is not None:
+            try:
+                project(fields, only)
+            except MarshallException as e:
+                abort(400, description=str(e))
+
+        out = handler(*args, **kwargs)
+        if isinstance(out, Response):
+            return out
+
+        if _is_head():
+            return _head_response(serializer, content_types is not None)
+
+        if memory is not None:
+            records = len(out) if is_collection(out) else 1
+            g._api_records = records
+            # only JSON of a list is streamed
+            listed = fields is not None and isinstance(out, list)
+            if listed and serializer is None and memory.should_stream(records):
+                g._api_streamed = True
+                return _stream_json(
+                    out, project(fields, only) if only else fields, key,
+                    normalize=normalize)
+
+        if fields is not None:
+            native = serializer is not None and serializer.native
+
+            if isinstance(out, Page):
+                try:
+                    if normalize:
+                        with normalizing() as entities:
+                            out = out.marshal(fields, only=only,
+                                              native=native, data_key=key)
+                        out['included'] = entities
+                    else:
+                        out = out.marshal(fields, only=only, native=native,
+                                          data_key=key)
+                except InvalidCursorException as e:
+                    abort(400, description=str(e))
+                return encode(out, serializer)
+
+            if fused_json and serializer is None:
+                resp = Response(
+                    to_json(
+                        out, project(fields, only) if only else fields,
+                        key=key),
+                    mimetype=JSON_MIMETYPE)
+                if content_types is not None:
+                    resp.vary.add('Accept')
+                return resp
+
+            out = marshal_(out, fields, key=key, only=only, native=native)
+            if memory is not None and g.get('_api_memory_sampled'):
+                g._api_output = deep_sizeof(out)
+
+        return encode(out, serializer)
+    return marshal_wrapper
+
+
+def _stream_json(data, fields, key=None, normalize=False, chunk_size=100):
+    """Return response to write marshalled items by chunk.
+
+    The output is the same as `marshal` to JSON, or `marshal_normalized`
+    if normalize is True.
+    """
+    dumps = current_app.json.dumps
+    if normalize:
+        key = key or 'data'
+    entities = OrderedDict() if normalize else None
+
+    def marshal_chunk(chunk):
+        with batch_loading(chunk, fields):
+            return ','.join(dumps(marshal(item, fields, native=False))
+                            for item in chunk)
+
+    def generate():
+        yield '{%s: [' % dumps(key) if key else '['
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            # the context is not kept across yields
+            if normalize:
+                with normalizing(entities):
+                    items = marshal_chunk(chunk)
+            else:
+                items = marshal_chunk(chunk)
+            yield ',' + items if start else items
+        if normalize:
+            yield '], "included": %s}' % dumps(entities)
+        else:
+            yield ']}' if key else ']'
+
+    return Response(stream_with_context(generate()),
+                    mimetype=JSON_MIMETYPE)
+
+
+def _make_body_parser(view_func, fields=None, decoder=None):
+    """Wrapper to pass parsed request body as `body` argument.
+
+    If fields is given, the body is validated and converted by unmarshal,
+    and returns 400 with the error messages when it is invalid.
+    """
+    loads = get_json_decoder(decoder) if decoder is not None else None
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        serializer = (get_serializer(request.mimetype)
+                      if request.mimetype != JSON_MIMETYPE else None)
+
+        if serializer is not None and serializer.loads is not None:
+            try:
+                data = serializer.loads(request.get_data())
+            except Exception:
+                abort(400, description='Failed to decode request body.')
+        elif loads is None:
+            data = request.get_json()
+        else:
+            try:
+                data = loads(request.get_data())
+            except ValueError:
+                abort(400, description='Failed to decode JSON object.')
+
+        if fields is not None:
+            try:
+                data = unmarshal(data, fields)
+            except ValidationException as e:
+                return jsonify(message=str(e), errors=e.errors), 400
+
+        return view_func(*args, body=data, **kwargs)
+    return wrapper
+
+
+def _make_sync(view_func):
+    """Wrapper to run async method by `app.ensure_sync`."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        return current_app.ensure_sync(view_func)(*args, **kwargs)
+    return wrapper
+
+
+# headers identifying the user, always in the keys of shared responses
+IDENTITY_HEADERS = ('Authorization', 'Cookie')
+
+
+def _shared_headers(resp):
+    """Return headers of the response to share with other requests,
+    without cookies of the original request.
+    """
+    return [(k, v) for k, v in resp.headers.to_wsgi_list()
+            if k.lower() != 'set-cookie']
+
+
+def _coalesce_key(query, headers, method=None):
+    """Build key of the request to coalesce.
+
+    Args:
+        query: list of str
+            names of query parameters, all parameters are used if None
+        headers: list of str
+            names of headers
+        method: str (default: None)
+            method used instead of the request method
+    """
+    if query is None:
+        args = tuple(sorted(request.args.items(multi=True)))
+    else:
+        args = tuple((q, tuple(request.args.getlist(q))) for q in query)
+
+    return (
+        method or request.method,
+        request.url_rule.rule if request.url_rule else request.path,
+        tuple(sorted((request.view_args or {}).items())),
+        args,
+        tuple(request.headers.get(h) for h in headers),
+    )
+
+
+def _coalesce(single_flight, key, func):
+    """Run the view function once for concurrent identical requests.
+
+    The leader request returns its own response, and the others
+    get copies built from the encoded body and headers
+    except `Set-Cookie`.
+    """
+    leader = []
+
+    def run():
+        resp = current_app.make_response(func())
+        leader.append(resp)
+        if resp.is_streamed:
+            return None
+        return (resp.get_data(), resp.status_code, _shared_headers(resp))
+
+    shared = single_flight.do(key, run)
+    if leader:
+        return leader[0]
+
+    if shared is None:
+        # streaming response cannot be shared
+        return func()
+
+    body, status, headers = shared
+    return current_app.response_class(body, status=status, headers=headers)
+
+
+def _make_head(view_func):
+    """Wrapper to build empty response from headers returned by `head`,
+    e.g. `{'ETag': etag, 'Content-Length': size}`.
+    """
     @wraps(view_func)
     def wrapper(*args, **kwargs):
         out = view_func(*args, **kwargs)
-        return jsonify(out)
+        if isinstance(out, dict):
+            return current_app.response_class(None, headers=out)
+        return out
+    return wrapper
+
+
+def _make_injector(view_func, providers):
+    """Wrapper to pass resources of the providers as arguments.
+
+    Args:
+        providers: dict
+            parameter name to Provider, resolved on registration
+    """
+    providers = tuple(providers.items())
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        for name, provider in providers:
+            kwargs[name] = provider.get()
+        return view_func(*args, **kwargs)
     return wrapper
 
 
+_RESPONSE_HEADER = struct.Struct('<HI')
+
+# endpoint of the task status registered by `ApiConnector`
+TASK_ENDPOINT = '_task_status'
+
+
+def _encode_response(resp):
+    """Encode status, headers and body of the response into bytes."""
+    headers = json.dumps(resp.headers.to_wsgi_list()).encode()
+    head = _RESPONSE_HEADER.pack(resp.status_code, len(headers))
+    return b''.join((head, headers, resp.get_data()))
+
+
+def _decode_response(data, head=False):
+    """Decode the response, without body for HEAD request.
+
+    `Content-Length` of the body is kept in the headers.
+    """
+    status, size = _RESPONSE_HEADER.unpack_from(data)
+    start = _RESPONSE_HEADER.size
+    headers = [tuple(h) for h in json.loads(data[start:start + size])]
+    if head:
+        return current_app.response_class(None, status=status,
+                                          headers=headers)
+    return current_app.response_class(data[start + size:], status=status,
+                                      headers=headers)
+
+
+def _cacheable(resp) -> bool:
+    """Return True if the response can be shared with other requests."""
+    if resp.status_code != 200 or resp.is_streamed:
+        return False
+    if 'Set-Cookie' in resp.headers:
+        return False
+    cache_control = resp.cache_control
+    return not (cache_control.private or cache_control.no_store)
+
+
+def _response_cache_key(name, key) -> bytes:
+    """Return digest of the request key not to store the credentials
+    of `Authorization` and `Cookie` in the cache.
+    """
+    return blake2b(repr((name, key)).encode(), digest_size=32).digest()
+
+
+def _cached(cache, key, ttl, func, head=False):
+    """Return the cached response or call the function to store it.
+
+    Only 200 responses which are not streamed are stored,
+    and responses with `Set-Cookie` or `Cache-Control: private`
+    or `no-store` are not.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return _decode_response(data, head=head)
+
+    resp = current_app.make_response(func())
+    if _cacheable(resp):
+        cache.set(key, _encode_response(resp), ttl=ttl)
+    return resp
+
+
+def _slow_entry(resp, timings):
+    """Build details of the slow request."""
+    entry = {
+        'method': request.method,
+        'path': request.path,
+        'query': request.query_string.decode('latin-1'),
+        'view_args': request.view_args,
+        'status': resp.status_code,
+        'timestamp': time.time(),
+        'timings': {phase: value * 1000 for phase, value in timings.items()},
+    }
+    profile = g.pop('_api_profile', None)
+    if profile is not None:
+        entry['profile'] = {name: {'calls': calls, 'time': value * 1000}
+                            for name, (calls, value) in profile.items()}
+    return entry
+
+
+def _make_memory_tracker(view_func, memory):
+    """Wrapper to record memory usage of the request to the tracker."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        sampled = memory.begin()
+        peak = None
+        if sampled:
+            g._api_memory_sampled = True
+        try:
+            resp = current_app.make_response(view_func(*args, **kwargs))
+        finally:
+            if sampled:
+                peak = memory.end()
+
+        memory.record(records=g.pop('_api_records', None),
+                      size=(None if resp.is_streamed
+                            else resp.calculate_content_length()),
+                      peak=peak,
+                      output=g.pop('_api_output', None),
+                      streamed=g.pop('_api_streamed', False))
+        return resp
+    return wrapper
+
+
+def background(view_func):
+    """Mark the view method to run on the task runner.
+
+    The request returns 202 with the URL to poll the result.
+
+    Example:
+        >>> class Reports:
+        ...     @background
+        ...     def post(self, body):
+        ...         return generate_report(body)
+    """
+    view_func.background = True
+    return view_func
+
+
+def background_methods(cls) -> set:
+    """Return names of the methods run in background, in upper case."""
+    methods = {meth.upper()
+               for meth in view_options(cls)['background_methods']}
+    for meth in http_method_funcs:
+        if getattr(getattr(cls, meth, None), 'background', False):
+            methods.add(meth.upper())
+    return methods
+
+
+def _submit(runner, func, retry_after):
+    """Submit the request to the runner and return 202."""
+    # read the body while the request is alive
+    request.get_data()
+
+    @copy_current_request_context
+    def task():
+        resp = current_app.make_response(func())
+        return (resp.get_data(), resp.status_code,
+                resp.headers.to_wsgi_list())
+
+    try:
+        task = runner.submit(task)
+    except QueueFullException:
+        abort(503, retry_after=retry_after)
+
+    if TASK_ENDPOINT in current_app.view_functions:
+        url = url_for(TASK_ENDPOINT, task_id=task.id)
+    else:
+        url = None
+
+    resp = jsonify(task_id=task.id, status=task.status, status_url=url)
+    resp.status_code = 202
+    if url is not None:
+        resp.headers['Location'] = url
+    return resp
+
+
+def constant(view_func):
+    """Mark the view method to return the same response on every call.
+
+    The response is encoded on the first call and served
+    with the precompressed variants after that.
+
+    Example:
+        >>> class Version:
+        ...     @constant
+        ...     def get(self):
+        ...         return {'version': __version__}
+    """
+    view_func.constant = True
+    return view_func
+
+
+class _ConstantResponse(object):
+    """Encoded responses of a constant view method.
+
+    The responses are kept by query string and `Accept` header
+    if the format is negotiated, and the least recently used one
+    is evicted over `maxsize` variants.
+    """
+
+    maxsize = 64
+
+    def __init__(self, compressor=None, negotiate=False):
+        self.compressor = compressor
+        self.negotiate = negotiate
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _encode(self, resp):
+        body = resp.get_data()
+        compressor = self.compressor
+        if compressor is None:
+            return {None: (body, resp.headers.to_wsgi_list())}
+
+        resp.vary.add('Accept-Encoding')
+        headers = resp.headers.to_wsgi_list()
+        variants = {None: (body, headers)}
+        if len(body) >= compressor.min_size:
+            for name in compressor.encodings or CODECS:
+                if name in CODECS:
+                    variants[name] = (
+                        CODECS[name].compress(body,
+                                              compressor.get_level(name)),
+                        headers + [('Content-Encoding', name)])
+        return variants
+
+    def __call__(self, func):
+        key = (request.query_string,
+               request.headers.get('Accept') if self.negotiate else None)
+        with self._lock:
+            variants = self._responses.get(key)
+            if variants is not None:
+                self._responses.move_to_end(key)
+
+        if variants is None:
+            resp = current_app.make_response(func())
+            if resp.status_code != 200 or resp.is_streamed:
+                if self.compressor is not None:
+                    resp = self.compressor(resp, request.accept_encodings)
+                return resp
+
+            variants = self._encode(resp)
+            with self._lock:
+                self._responses[key] = variants
+                while len(self._responses) > self.maxsize:
+                    self._responses.popitem(last=False)
+
+        name = (select_encoding(request.accept_encodings, list(variants))
+                if len(variants) > 1 else None)
+        body, headers = variants[name]
+        return current_app.response_class(body, headers=headers)
+
+
+# options of `BaseView` and the defaults
+DEFAULT_OPTIONS = {
+    'marshal_fields': None,
+    'marshal_key': None,
+    'fused_json': False,
+    'projection_param': 'fields',
+    'body_fields': None,
+    'json_decoder': None,
+    'content_types': None,
+    'compress': False,
+    'compress_level': None,
+    'compress_min_size': 500,
+    'compress_encodings': None,
+    'compress_cache_size': 0,
+    'coalesce': False,
+    'coalesce_query': None,
+    'coalesce_headers': (),
+    'concurrency_limit': None,
+    'concurrency_queue': 0,
+    'concurrency_timeout': None,
+    'concurrency_adaptive': False,
+    'retry_after': 1,
+    'response_cache': None,
+    'response_cache_ttl': None,
+    'server_timing': False,
+    'slow_requests': 0,
+    'profile_fields': False,
+    'background_methods': (),
+    'task_runner': None,
+    'normalize': False,
+    'memory_tracking': False,
+    'memory_sample_rate': 0.01,
+    'memory_soft_limit': None,
+    'memory_limit_action': 'log',
+    'constant': False,
+    'providers': None,
+}
+
+# options which take a function,
+# functions of the other names in the view class are methods
+_CALLABLE_OPTIONS = {'json_decoder'}
+
+
+def view_options(view_cls) -> dict:
+    """Return the options of the view class.
+
+    Attributes of the class take precedence over the options given by
+    `Paths`, which take precedence over the defaults. Methods named
+    like options are not taken as options.
+    """
+    options = dict(DEFAULT_OPTIONS)
+    options.update(getattr(view_cls, '_api_options', {}))
+    for name in DEFAULT_OPTIONS:
+        if not hasattr(view_cls, name):
+            continue
+        value = getattr(view_cls, name)
+        if inspect.isroutine(value) and name not in _CALLABLE_OPTIONS:
+            continue
+        options[name] = value
+    return options
+
+
 class BaseView(View):
-    """Base view class to inject views to app."""
+    """Base view class to inject views to app.
+
+    HEAD is handled by `head` method if defined, which can return a dict
+    of headers such as `ETag`. Otherwise it is served by `get`, or from
+    `response_cache` without calling it.
+    OPTIONS is answered with `Allow` header unless `options` is defined.
+
+    Following options can be set as attributes of the view class
+    or in the options of `Paths` entry, see `view_options`.
+    The resolved options are available as `view.options`.
+
+    Options:
+        marshal_fields: dict (default: None)
+            if set, returned values from the methods are marshalled
+            with the fields
+        marshal_key: str (default: None)
+            key used as envelope of marshalled data
+        fused_json: bool (default: False)
+            if True, marshal_fields are written directly into JSON bytes
+            by `marshal_to_json` without intermediate dicts.
+            The output is compact and keeps the order of the fields.
+        projection_param: str (default: 'fields')
+            name of query parameter to select the subset of
+            marshal_fields, e.g. `?fields=id,owner.name`,
+            disabled if set to None
+        body_fields: dict (default: None)
+            if set, request body passed to `body` argument
+            is validated and converted by unmarshal with the fields
+        json_decoder: str or callable (default: None)
+            JSON decoder to parse request body, such as 'orjson',
+            if None, `request.get_json()` is used so that
+            the app JSON provider is used as jsonify does
+        content_types: list of str (default: None)
+            if set, response format is negotiated by `Accept` header
+            from the content types, such as 'application/json',
+            'application/msgpack' and 'application/cbor'.
+            Unavailable types are ignored, and 406 is returned
+            if no acceptable type is found.
+            Request body in registered binary types, such as MessagePack,
+            is also decoded for `body` argument.
+        compress: bool (default: False)
+            compress responses by negotiated encoding
+            (gzip, and zstd/br if available)
+        compress_level: int or dict (default: None)
+            compression level, or dict of encoding name and level
+        compress_min_size: int (default: 500)
+            responses smaller than this size are not compressed
+        compress_encodings: list of str (default: None)
+            encodings to use in preferred order
+        compress_cache_size: int (default: 0)
+            max number of compressed bodies to keep,
+            so that the same response is compressed only once
+        coalesce: bool (default: False)
+            if True, concurrent identical GET requests wait for the first
+            one in flight and share its response
+        coalesce_query: list of str (default: None)
+            query parameters to identify the request,
+            all parameters are used if None
+        coalesce_headers: list of str (default: ())
+            headers to identify the request, such as 'Accept-Language'.
+            `Authorization` and `Cookie` are always added so that
+            requests of different users are not coalesced,
+            and `Accept` and `Accept-Encoding` are added when the response
+            depends on them by `content_types` and `compress`.
+        concurrency_limit: int (default: None)
+            max number of requests handled concurrently, unlimited if None
+        concurrency_queue: int (default: 0)
+            max number of requests waiting for the limit
+        concurrency_timeout: float (default: None)
+            seconds to wait in the queue
+        concurrency_adaptive: bool (default: False)
+            if True, the limit is adjusted by the observed latency
+            up to 10 times of `concurrency_limit`
+        retry_after: int (default: 1)
+            seconds of `Retry-After` header returned with 503
+            when the request is shed
+        response_cache: object (default: None)
+            cache of encoded GET responses which has `get(key)` and
+            `set(key, value, ttl=None)` with bytes,
+            e.g. `shared_cache.SharedCache` shared by worker processes.
+            The key is built like `coalesce` with all query parameters,
+            `Authorization`, `Cookie` and `coalesce_headers`.
+            Responses with `Set-Cookie` or `Cache-Control: private`
+            or `no-store` are not stored.
+        response_cache_ttl: float (default: None)
+            time to live of the cached responses,
+            the default of the cache is used if None
+        server_timing: bool (default: False)
+            if True, `Server-Timing` header is added with time of
+            handler, marshal, encode and total
+        slow_requests: int (default: 0)
+            number of the slowest requests kept with their timings
+            in `view.slow_requests`
+        profile_fields: bool (default: False)
+            if True, time of each field in `marshal_fields` is kept
+            with the slow requests
+        background_methods: list of str (default: ())
+            names of methods run on `task_runner`, e.g. ['post'],
+            which return 202 with the URL to poll the result.
+            Methods can be marked by `background` decorator as well.
+        task_runner: TaskRunner (default: None)
+            runner of the background methods, set by `ApiConnector`
+        normalize: bool (default: False)
+            if True, `Nested` fields with `entity` in `marshal_fields`
+            are output once in `included` and referred by the id.
+            See `marshal.marshal_normalized`.
+        memory_tracking: bool (default: False)
+            if True, record count, response size and peak allocation
+            of sampled requests are aggregated in `view.memory`
+        memory_sample_rate: float (default: 0.01)
+            fraction of requests traced by tracemalloc
+        memory_soft_limit: int (default: None)
+            size of response body in bytes to log a warning
+        memory_limit_action: str (default: 'log')
+            'stream' to stream JSON of the lists estimated to exceed
+            the soft limit. See `memory.MemoryTracker`.
+        constant: bool (default: False)
+            if True, `get` returns the same response on every call,
+            which is encoded once and reused. See `constant`.
+        providers: Providers (default: None)
+            resources injected to the parameters with the registered names,
+            set by `ApiConnector`
+    """
 
     # default methods list
     methods = None
 
-    # disable option handling
+    # OPTIONS is handled by as_view
     provide_automatic_options = None
 
+    # options given by `Paths`, see `view_options`
+    _api_options = {}
+
     @classmethod
     def as_view(cls, name, *cls_args, **cls_kwargs):
+        options = view_options(cls)
+
+        if options['compress']:
+            compressor = Compressor(level=options['compress_level'],
+                                    min_size=options['compress_min_size'],
+                                    encodings=options['compress_encodings'],
+                                    cache_size=options['compress_cache_size'])
+        else:
+            compressor = None
+
+        # headers which the response depends on
+        vary_headers = []
+        if options['content_types'] is not None:
+            vary_headers.append('Accept')
+        if compressor is not None:
+            vary_headers.append('Accept-Encoding')
 
-        def view(*args, **kwargs):
+        if options['coalesce']:
+            single_flight = SingleFlight()
+            coalesce_headers = [*IDENTITY_HEADERS,
+                                *options['coalesce_headers'], *vary_headers]
+        else:
+            single_flight = None
+
+        response_cache = options['response_cache']
+        cache_headers = [*IDENTITY_HEADERS, *options['coalesce_headers'],
+                         *vary_headers]
+
+        if options['concurrency_limit'] is not None:
+            limiter = ConcurrencyLimiter(
+                options['concurrency_limit'],
+                queue_size=options['concurrency_queue'],
+                timeout=options['concurrency_timeout'],
+                adaptive=options['concurrency_adaptive'])
+        else:
+            limiter = None
+
+        if options['constant'] or getattr(getattr(cls, 'get', None),
+                                          'constant', False):
+            constant_response = _ConstantResponse(
+                compressor, negotiate=options['content_types'] is not None)
+        else:
+            constant_response = None
+
+        def call(*args, **kwargs):
             cls = view.view_cls(*cls_args, **cls_kwargs)
             return cls.dispatch_request(*args, **kwargs)
 
+        def dispatch(*args, **kwargs):
+            rv = call(*args, **kwargs)
+
+            if compressor is not None:
+                rv = compressor(current_app.make_response(rv),
+                                request.accept_encodings)
+            return rv
+
+        def handle(*args, **kwargs):
+            if limiter is None:
+                return dispatch(*args, **kwargs)
+
+            if not limiter.acquire():
+                abort(503, retry_after=options['retry_after'])
+            start = time.monotonic()
+            try:
+                return dispatch(*args, **kwargs)
+            finally:
+                limiter.release(time.monotonic() - start)
+
+        def run(*args, **kwargs):
+            if single_flight is not None \
+                    and request.method in ('GET', 'HEAD'):
+                key = _coalesce_key(options['coalesce_query'],
+                                    coalesce_headers)
+                return _coalesce(single_flight, key,
+                                 lambda: handle(*args, **kwargs))
+            return handle(*args, **kwargs)
+
+        in_background = background_methods(cls)
+        if in_background:
+            task_runner = options['task_runner'] or TaskRunner()
+        else:
+            task_runner = None
+
+        # the frame of this function is the root of profiled stacks
+        def serve(*args, **kwargs):
+            previous = profiler.enter(name)
+            try:
+                method = request.method
+                if method == 'OPTIONS' and allow is not None:
+                    return current_app.response_class(
+                        None, headers={'Allow': allow})
+
+                if task_runner is not None and method in in_background:
+                    return _submit(task_runner,
+                                   lambda: run(*args, **kwargs),
+                                   options['retry_after'])
+
+                if constant_response is not None and (
+                        method == 'GET' or method == 'HEAD' and not has_head):
+                    return constant_response(lambda: call(*args, **kwargs))
+
+                # HEAD without `head` method is served from cached GET
+                if response_cache is not None and (
+                        method == 'GET' or method == 'HEAD' and not has_head):
+                    key = _response_cache_key(
+                        name, _coalesce_key(None, cache_headers, 'GET'))
+                    return _cached(response_cache, key,
+                                   options['response_cache_ttl'],
+                                   lambda: run(*args, **kwargs),
+                                   head=method == 'HEAD')
+                return run(*args, **kwargs)
+            finally:
+                profiler.leave(previous)
+
+        slow_requests = options['slow_requests']
+        timing = options['server_timing'] or bool(slow_requests)
+        profile = options['profile_fields'] and bool(slow_requests)
+        slow = SlowRequests(slow_requests) if slow_requests else None
+
+        if timing:
+            def view(*args, **kwargs):
+                start = time.perf_counter()
+                resp = current_app.make_response(serve(*args, **kwargs))
+                elapsed = time.perf_counter() - start
+
+                timings = pop_timings()
+                timings['total'] = elapsed
+                if options['server_timing']:
+                    resp.headers['Server-Timing'] = server_timing(timings)
+                if slow is not None:
+                    slow.record(elapsed, lambda: _slow_entry(resp, timings))
+                return resp
+        else:
+            view = serve
+
+        if options['memory_tracking']:
+            memory = MemoryTracker(
+                name, sample_rate=options['memory_sample_rate'],
+                soft_limit=options['memory_soft_limit'],
+                action=options['memory_limit_action'])
+            view = _make_memory_tracker(view, memory)
+        else:
+            memory = None
+
         methods = set()
 
         for meth in http_method_funcs:
@@ -49,10 +1028,33 @@ class BaseView(View):
             if method:
                 methods.add(meth.upper())
 
-                if meth != 'head':
-                    method = _make_jsonify(method)
+                if inspect.iscoroutinefunction(method):
+                    method = _make_sync(method)
+
+                if meth == 'head':
+                    method = _make_head(method)
+                else:
+                    method = _make_jsonify(
+                        method,
+                        fields=options['marshal_fields'],
+                        key=options['marshal_key'],
+                        projection_param=options['projection_param'],
+                        content_types=options['content_types'],
+                        fused_json=options['fused_json'],
+                        timing=timing,
+                        profile=profile,
+                        memory=memory,
+                        normalize=options['normalize'])
 
                 sig = inspect.signature(method)
+                if 'body' in sig.parameters:
+                    method = _make_body_parser(
+                        method, fields=options['body_fields'],
+                        decoder=options['json_decoder'])
+                if options['providers'] is not None:
+                    providers = options['providers'].resolve(sig.parameters)
+                    if providers:
+                        method = _make_injector(method, providers)
                 if 'request' in sig.parameters:
                     method = partialmethod(method, request=request)
                 if 'session' in sig.parameters:
@@ -62,10 +1064,30 @@ class BaseView(View):
 
                 setattr(cls, meth, method)
 
+        has_head = 'HEAD' in methods
+
+        # OPTIONS is answered by the view from the precomputed methods
+        # unless the class implements it
+        if 'OPTIONS' in methods:
+            allow = None
+        else:
+            allowed = set(methods) | {'OPTIONS'}
+            if 'GET' in allowed:
+                allowed.add('HEAD')
+            allow = ', '.join(sorted(allowed))
+            methods.add('OPTIONS')
+
         view.__name__ = name
         view.__module__ = cls.__module__
         view.methods = methods
+        view.provide_automatic_options = False
         view.view_cls = cls
+        view.options = options
+        view.single_flight = single_flight
+        view.limiter = limiter
+        view.slow_requests = slow
+        view.memory = memory
+        view.task_runner = task_runner
 
         return view
 
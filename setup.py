@@ -40,14 +40,13 @@ setup(
     zip_safe=False,
     platform='any',
     install_requires=[
-        'Flask',
+        'Flask>=2.2',
         'pytz',
     ],
     test_suite='tests',
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
@@ -56,5 +55,5 @@ setup(
         'Framework :: Flask',
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
-    python_requires='>=3.6'
+    python_requires='>=3.7'
 )
@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import gc
 from unittest.mock import MagicMock
 
-from flask_api_connector.core import ApiConnector
+from flask_api_connector import fields
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector.encoder import _plans as encoder_plans
+from flask_api_connector.marshal import _loader_plans
+from flask_api_connector.unmarshal import _plans as unmarshal_plans
 
 
 def test_set_paths_to_app(app, paths):
@@ -42,3 +47,58 @@ def test_set_root_url(app, paths):
 
     for path, call_args in zip(paths, app.add_url_rule.call_args_list):
         assert call_args[0][0] == f'/test{path.rule}'
+
+
+def test_warmup(app):
+    item_fields = {'id': fields.Integer,
+                   'owner': fields.Nested({'name': fields.String})}
+    body_fields = {'owner': {'name': fields.String}}
+
+    class Items:
+        def post(self, body):
+            return {'id': 1, 'owner': body['owner']}
+
+    paths = Paths([('/items', Items, {
+        'marshal_fields': item_fields, 'fused_json': True,
+        'body_fields': body_fields,
+    })])
+    ApiConnector(paths).init_app(app, eager=True)
+
+    assert (id(item_fields), None) in encoder_plans._data
+    assert (id(item_fields), None) in _loader_plans._data
+    assert (id(body_fields), None) in unmarshal_plans._data
+    assert (id(body_fields['owner']), None) in unmarshal_plans._data
+    assert app.url_map._remap is False
+
+    resp = app.test_client().post('/api/items',
+                                  json={'owner': {'name': 'a'}})
+    assert resp.get_json() == {'id': 1, 'owner': {'name': 'a'}}
+
+
+def test_warmup_freeze(app, paths):
+    ApiConnector(paths).warmup(app, freeze=True)
+    try:
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+
+def test_options_of_class_attributes(app, client):
+    class Items:
+        marshal_fields = {'id': fields.Integer}
+
+        def get(self):
+            return {'id': 1, 'pad': 'x', 'secret': 'x'}
+
+    class Names:
+        def get(self):
+            return self.normalize('A')
+
+        # method named like an option
+        def normalize(self, name):
+            return {'n': name.lower()}
+
+    ApiConnector(Paths([('/items', Items), ('/names', Names)])).init_app(app)
+
+    assert client.get('/api/items').get_json() == {'id': 1}
+    assert client.get('/api/names').get_json() == {'n': 'a'}
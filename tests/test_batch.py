@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import threading
+
+from flask import Response, json
+
+from flask_api_connector.core import ApiConnector, Paths
+
+
+class Users:
+    def get(self, id):
+        return {'id': id}
+
+
+class Items:
+    def post(self, body):
+        return {'name': body['name']}
+
+
+class Whoami:
+    def get(self, request):
+        return {'user': request.headers.get('Authorization'),
+                'thread': threading.current_thread().name}
+
+
+class Big:
+    def get(self):
+        return {'data': 'x' * 1000}
+
+
+class Binary:
+    def get(self):
+        return Response(b'\xff\x00', mimetype='application/octet-stream')
+
+
+class Broken:
+    def get(self):
+        raise ValueError('broken')
+
+
+def _init(app, **kwargs):
+    paths = Paths([
+        ('/users/<int:id>', Users),
+        ('/items', Items),
+        ('/whoami', Whoami),
+        ('/big', Big, {'compress': True}),
+        ('/binary', Binary),
+        ('/broken', Broken),
+    ])
+    ApiConnector(paths, batch=True, **kwargs).init_app(app)
+
+
+def test_batch_requests(app, client):
+    _init(app)
+
+    resp = client.post('/api/_batch', json=[
+        {'path': '/api/users/1'},
+        {'method': 'POST', 'path': '/api/items', 'body': {'name': 'x'}},
+        {'path': '/api/unknown'},
+    ])
+    assert resp.status_code == 200
+
+    responses = json.loads(resp.data)['responses']
+    assert [r['status'] for r in responses] == [200, 200, 404]
+    assert responses[0]['body'] == {'id': 1}
+    assert responses[1]['body'] == {'name': 'x'}
+    assert all(r['time'] >= 0 for r in responses)
+
+
+def test_batch_pass_headers_and_run_on_pool(app, client):
+    _init(app)
+
+    resp = client.post('/api/_batch', json=[{'path': '/api/whoami'}] * 2,
+                       headers={'Authorization': 'token'})
+    responses = json.loads(resp.data)['responses']
+    for r in responses:
+        assert r['body']['user'] == 'token'
+        assert r['body']['thread'].startswith('api-batch')
+
+
+def test_batch_non_json_bodies(app, client):
+    _init(app)
+
+    resp = client.post('/api/_batch', json=[
+        {'path': '/api/big'},
+        {'path': '/api/binary'},
+        {'path': '/api/broken'},
+        {'path': '/api/users/1'},
+    ], headers={'Accept-Encoding': 'gzip'})
+    assert resp.status_code == 200
+
+    responses = json.loads(resp.data)['responses']
+    # not compressed in the batch
+    assert 'Content-Encoding' not in responses[0]['headers']
+    assert responses[0]['body'] == {'data': 'x' * 1000}
+    assert responses[1]['encoding'] == 'base64'
+    assert base64.b64decode(responses[1]['body']) == b'\xff\x00'
+    # only the failed sub-request is 500 even in testing mode
+    assert responses[2]['status'] == 500
+    assert responses[3]['body'] == {'id': 1}
+
+
+def test_batch_invalid_requests(app, client):
+    _init(app, batch_max_size=2)
+
+    assert client.post('/api/_batch', json={}).status_code == 400
+    assert client.post('/api/_batch', json=[{}]).status_code == 400
+    assert client.post('/api/_batch',
+                       json=[{'path': '/other'}]).status_code == 400
+    assert client.post('/api/_batch',
+                       json=[{'path': '/api/_batch'}]).status_code == 400
+    assert client.post('/api/_batch',
+                       json=[{'path': '/api/users/1'}] * 3).status_code == 413
+    assert client.get('/api/_batch').status_code == 405
+
+
+def test_batch_disabled_by_default(app, client):
+    ApiConnector(Paths([('/users/<int:id>', Users)])).init_app(app)
+    assert client.post('/api/_batch', json=[]).status_code == 404
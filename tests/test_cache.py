@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from unittest.mock import patch
+
+from flask_api_connector.cache import MarshalCache
+from flask_api_connector.fields import Integer, List, Nested, String
+from flask_api_connector.marshal import marshal
+
+
+def _authors(n):
+    return [{'id': i, 'name': f'name{i}'} for i in range(n)]
+
+
+def test_reuse_marshalled_result():
+    cache = MarshalCache(key=lambda obj: obj['id'])
+    fields = {'id': Integer, 'name': String}
+
+    authors = _authors(2)
+    first = marshal(authors[0], fields, cache=cache)
+    assert first == {'id': 0, 'name': 'name0'}
+
+    # shared object is returned for the same identity
+    assert marshal({'id': 0, 'name': 'other'}, fields, cache=cache) is first
+    assert marshal(authors[1], fields, cache=cache) == \
+        {'id': 1, 'name': 'name1'}
+
+    assert cache.hits == 1
+    assert cache.misses == 2
+    assert cache.hit_rate == 1 / 3
+
+
+def test_not_cache_if_key_is_none():
+    cache = MarshalCache(key=lambda obj: obj.get('version'))
+    fields = {'id': Integer}
+
+    marshal({'id': 1}, fields, cache=cache)
+    marshal({'id': 1}, fields, cache=cache)
+    assert len(cache) == 0
+    assert cache.hits == 0
+
+
+def test_nested_and_list_with_cache():
+    cache = MarshalCache(key=lambda obj: obj['id'])
+    author = Nested({'id': Integer, 'name': String}, cache=cache)
+    fields = {
+        'title': String,
+        'author': author,
+        'reviewers': List(author),
+    }
+
+    authors = _authors(3)
+    data = [
+        {'title': str(i), 'author': authors[i % 3],
+         'reviewers': [authors[0], authors[1]]}
+        for i in range(10)
+    ]
+
+    out = marshal(data, fields)
+    assert out[4] == OrderedDict([
+        ('title', '4'),
+        ('author', {'id': 1, 'name': 'name1'}),
+        ('reviewers', [{'id': 0, 'name': 'name0'},
+                       {'id': 1, 'name': 'name1'}]),
+    ])
+
+    # only 3 distinct authors are marshalled
+    assert cache.misses == 3
+    assert cache.hits == 27
+
+
+def test_lru_eviction():
+    cache = MarshalCache(key=lambda obj: obj['id'], maxsize=2)
+    fields = {'id': Integer}
+
+    for author in _authors(3):
+        marshal(author, fields, cache=cache)
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+    # the oldest item has been evicted
+    marshal({'id': 0}, fields, cache=cache)
+    assert cache.misses == 4
+
+
+def test_expire_by_ttl():
+    cache = MarshalCache(key=lambda obj: obj['id'], ttl=10)
+    fields = {'name': String}
+
+    with patch('flask_api_connector.cache.time.monotonic') as monotonic:
+        monotonic.return_value = 100
+        marshal({'id': 0, 'name': 'old'}, fields, cache=cache)
+
+        monotonic.return_value = 105
+        assert marshal({'id': 0, 'name': 'new'}, fields,
+                       cache=cache) == {'name': 'old'}
+
+        monotonic.return_value = 111
+        assert marshal({'id': 0, 'name': 'new'}, fields,
+                       cache=cache) == {'name': 'new'}
+
+    assert cache.info()['hits'] == 1
+    assert cache.info()['misses'] == 2
+
+
+def test_separate_entries_by_schema():
+    cache = MarshalCache(key=lambda obj: obj['id'])
+    data = {'id': 0, 'name': 'name'}
+
+    id_fields = {'id': Integer}
+    name_fields = {'name': String}
+
+    assert marshal(data, id_fields, cache=cache) == {'id': 0}
+    assert marshal(data, name_fields, cache=cache) == {'name': 'name'}
+
+
+def test_not_reuse_result_of_collected_fields():
+    cache = MarshalCache(key=lambda obj: obj['id'])
+    data = {'id': 0, 'name': 'name'}
+    fields = {'name': String}
+
+    # entry of collected fields whose id is reused by the fields
+    cache._data[(id(fields), None, 0)] = ({'id': 0}, None, {'id': Integer})
+    assert marshal(data, fields, cache=cache) == {'name': 'name'}
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+
+import pytest
+from flask import Response, json
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from flask_api_connector.compression import CODECS, Compressor, select_encoding
+from flask_api_connector.core import Paths
+
+
+def _accept(value):
+    return parse_accept_header(value, Accept)
+
+
+def test_select_encoding():
+    assert select_encoding(_accept('gzip'), ['gzip']) == 'gzip'
+    assert select_encoding(_accept('deflate'), ['gzip']) is None
+    assert select_encoding(_accept('gzip;q=0, *'), ['gzip']) is None
+    assert select_encoding(_accept(''), ['gzip']) is None
+    # unavailable codecs are skipped
+    assert select_encoding(_accept('unknown, gzip'),
+                           ['unknown', 'gzip']) == 'gzip'
+
+
+@pytest.mark.parametrize('name', list(CODECS))
+def test_compress_roundtrip(name):
+    data = b'{"a": 1}' * 100
+    codec = CODECS[name]
+    compressed = codec.compress(data, codec.default_level)
+    assert len(compressed) < len(data)
+
+    obj = codec.compressobj(codec.default_level)
+    streamed = obj.compress(data[:50]) + obj.compress(data[50:]) + obj.flush()
+
+    if name == 'gzip':
+        decompress = gzip.decompress
+    elif name == 'zstd':
+        import zstandard
+        def decompress(b):
+            return zstandard.ZstdDecompressor().decompressobj().decompress(b)
+    else:
+        import brotli
+        decompress = brotli.decompress
+
+    assert decompress(compressed) == data
+    assert decompress(streamed) == data
+
+
+def test_compressor_threshold(app):
+    compressor = Compressor(min_size=100, encodings=['gzip'])
+
+    with app.test_request_context():
+        resp = compressor(Response(b'a' * 99), _accept('gzip'))
+        assert 'Content-Encoding' not in resp.headers
+        assert resp.headers['Vary'] == 'Accept-Encoding'
+
+        resp = compressor(Response(b'a' * 100), _accept('gzip'))
+        assert resp.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(resp.get_data()) == b'a' * 100
+
+
+def test_compressor_cache(app):
+    compressor = Compressor(min_size=0, encodings=['gzip'], cache_size=1)
+
+    with app.test_request_context():
+        first = compressor(Response(b'a' * 100), _accept('gzip')).get_data()
+        second = compressor(Response(b'a' * 100), _accept('gzip')).get_data()
+
+    # compressed bytes are reused
+    assert first is second
+    # body is not kept in the cache
+    assert all(b'a' * 100 not in key for key in compressor._cache)
+
+
+def test_compressor_cache_by_etag(app):
+    compressor = Compressor(min_size=0, encodings=['gzip'], cache_size=2)
+
+    def compress(data, etag):
+        resp = Response(data)
+        resp.set_etag(etag)
+        return compressor(resp, _accept('gzip')).get_data()
+
+    with app.test_request_context():
+        first = compress(b'a' * 100, 'v1')
+        assert compress(b'a' * 100, 'v1') is first
+        assert compress(b'b' * 100, 'v2') is not first
+
+    assert ('gzip', 'v1') in compressor._cache
+
+
+def test_compressed_view(app, client):
+    class Index:
+        def get(self):
+            return {'data': 'a' * 1000}
+
+    class Small:
+        def get(self):
+            return {'data': 'a'}
+
+    paths = Paths([
+        ('/', Index, {'compress': True, 'compress_level': 9,
+                      'compress_encodings': ['gzip']}),
+        ('/small', Small, {'compress': True}),
+    ])
+    for path in paths:
+        app.add_url_rule(path.rule, view_func=path.view_cls.as_view(path.name))
+
+    resp = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(resp.data)) == {'data': 'a' * 1000}
+
+    resp = client.get('/')
+    assert 'Content-Encoding' not in resp.headers
+    assert json.loads(resp.data) == {'data': 'a' * 1000}
+
+    resp = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in resp.headers
+
+
+def test_compress_streaming_response(app, client):
+    class Index:
+        def get(self):
+            def generate():
+                for i in range(100):
+                    yield f'line {i}\n'
+            return Response(generate(), mimetype='text/plain')
+
+    paths = Paths([
+        ('/', Index, {'compress': True, 'compress_encodings': ['gzip']}),
+    ])
+    for path in paths:
+        app.add_url_rule(path.rule, view_func=path.view_cls.as_view(path.name))
+
+    resp = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in resp.headers
+    expected = ''.join(f'line {i}\n' for i in range(100)).encode()
+    assert gzip.decompress(resp.data) == expected
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import json, jsonify
+
+from flask_api_connector.concurrency import ConcurrencyLimiter, SingleFlight
+from flask_api_connector.views import BaseView
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timeout')
+        time.sleep(0.001)
+
+
+def _load(app, paths, wait, release):
+    """Send requests concurrently and release the handler
+    after the others are waiting."""
+    with ThreadPoolExecutor(len(paths)) as executor:
+        futures = [executor.submit(app.test_client().get, path)
+                   for path in paths]
+        wait()
+        release.set()
+        return [f.result() for f in futures]
+
+
+def test_single_flight_share_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(flight.do, 'key', func) for _ in range(8)]
+        _wait_for(lambda: flight.waiting == 7)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.executed == 1
+    assert flight.shared == 7
+
+    # the key is released after the call
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.executed == 2
+
+
+def test_single_flight_share_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def func():
+        release.wait(5)
+        raise ValueError('x')
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(flight.do, 'key', func) for _ in range(4)]
+        _wait_for(lambda: flight.waiting == 3)
+        release.set()
+        for f in futures:
+            with pytest.raises(ValueError):
+                f.result()
+
+
+def test_coalesce_identical_requests(app):
+    release = threading.Event()
+    calls = []
+
+    class Index:
+        def get(self, id):
+            calls.append(id)
+            release.wait(5)
+            return {'id': id}
+
+    class TargetView(BaseView, Index):
+        coalesce = True
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/<int:id>', view_func=view)
+
+    resps = _load(app, ['/1'] * 10,
+                  lambda: _wait_for(lambda: view.single_flight.waiting == 9),
+                  release)
+
+    assert calls == [1]
+    assert {r.status_code for r in resps} == {200}
+    assert all(json.loads(r.data) == {'id': 1} for r in resps)
+    assert view.single_flight.shared == 9
+
+
+def test_coalesce_by_view_args_and_query(app):
+    release = threading.Event()
+    calls = []
+
+    class Index:
+        def get(self, id):
+            calls.append(id)
+            release.wait(5)
+            return {'id': id}
+
+    class TargetView(BaseView, Index):
+        coalesce = True
+        coalesce_query = ['page']
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/<int:id>', view_func=view)
+
+    paths = ['/1?page=1', '/1?page=1&ignored=x', '/1?page=2', '/2?page=1']
+    resps = _load(app, paths,
+                  lambda: _wait_for(lambda: len(calls) == 3
+                                    and view.single_flight.waiting == 1),
+                  release)
+
+    assert sorted(calls) == [1, 1, 2]
+    assert [json.loads(r.data)['id'] for r in resps] == [1, 1, 1, 2]
+
+
+def test_coalesce_by_user(app):
+    release = threading.Event()
+    calls = []
+
+    class Me:
+        def get(self, request):
+            user = request.headers.get('Authorization')
+            calls.append(user)
+            release.wait(5)
+            resp = jsonify(user=user)
+            resp.set_cookie('seen', user)
+            return resp
+
+    class TargetView(BaseView, Me):
+        coalesce = True
+
+    view = TargetView.as_view('me')
+    app.add_url_rule('/me', view_func=view)
+
+    def get(user):
+        return app.test_client().get('/me',
+                                     headers={'Authorization': user})
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(get, user)
+                   for user in ('alice', 'bob', 'alice', 'alice')]
+        _wait_for(lambda: len(calls) == 2
+                  and view.single_flight.waiting == 2)
+        release.set()
+        resps = [f.result() for f in futures]
+
+    assert sorted(calls) == ['alice', 'bob']
+    assert [json.loads(r.data)['user'] for r in resps] == \
+        ['alice', 'bob', 'alice', 'alice']
+    # cookies of the leader are not shared
+    assert sum('Set-Cookie' in r.headers for r in resps) == 2
+
+
+def test_coalesce_async_view(app):
+    pytest.importorskip('asgiref')
+
+    release = threading.Event()
+    calls = []
+
+    class Index:
+        async def get(self):
+            calls.append(1)
+            await asyncio.get_running_loop().run_in_executor(
+                None, release.wait, 5)
+            return {'ok': True}
+
+    class TargetView(BaseView, Index):
+        coalesce = True
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/', view_func=view)
+
+    resps = _load(app, ['/'] * 5,
+                  lambda: _wait_for(lambda: view.single_flight.waiting == 4),
+                  release)
+
+    assert calls == [1]
+    assert all(json.loads(r.data) == {'ok': True} for r in resps)
+
+
+def test_coalesce_skip_other_methods(app, client):
+    calls = []
+
+    class Index:
+        def post(self):
+            calls.append(1)
+            return {}
+
+    class TargetView(BaseView, Index):
+        coalesce = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    client.post('/')
+    client.post('/')
+    assert len(calls) == 2
+
+
+def test_limiter_admit_queue_and_shed():
+    limiter = ConcurrencyLimiter(1, queue_size=1, timeout=5)
+    assert limiter.acquire()
+
+    with ThreadPoolExecutor(1) as executor:
+        queued = executor.submit(limiter.acquire)
+        _wait_for(lambda: limiter.waiting == 1)
+
+        # the queue is full
+        assert not limiter.acquire()
+
+        limiter.release()
+        assert queued.result()
+
+    limiter.release()
+    assert limiter.info() == {
+        'limit': 1, 'active': 0, 'waiting': 0,
+        'admitted': 2, 'queued': 1, 'shed': 1,
+    }
+
+
+def test_limiter_timeout():
+    limiter = ConcurrencyLimiter(1, queue_size=1, timeout=0.01)
+    assert limiter.acquire()
+    assert not limiter.acquire()
+    assert limiter.shed == 1
+    assert limiter.waiting == 0
+
+
+def test_limiter_adaptive():
+    limiter = ConcurrencyLimiter(4, adaptive=True, max_limit=8)
+
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(0.01)
+    assert limiter.limit == 8
+
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(1.0)
+    assert limiter.limit == 1
+
+    with pytest.raises(ValueError):
+        ConcurrencyLimiter(0)
+
+
+def test_shed_requests_over_limit(app):
+    release = threading.Event()
+
+    class Index:
+        def get(self):
+            release.wait(5)
+            return {'ok': True}
+
+    class TargetView(BaseView, Index):
+        concurrency_limit = 1
+        retry_after = 3
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/', view_func=view)
+
+    with ThreadPoolExecutor(1) as executor:
+        first = executor.submit(app.test_client().get, '/')
+        _wait_for(lambda: view.limiter.active == 1)
+
+        resp = app.test_client().get('/')
+        assert resp.status_code == 503
+        assert resp.headers['Retry-After'] == '3'
+
+        release.set()
+        assert first.result().status_code == 200
+
+    assert view.limiter.admitted == 1
+    assert view.limiter.shed == 1
+    assert view.limiter.active == 0
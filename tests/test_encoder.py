@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import json
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import json as flask_json
+
+from flask_api_connector import fields
+from flask_api_connector.encoder import (
+    _plans, compile_fields, marshal_to_json
+)
+from flask_api_connector.exceptions import InvalidFieldDataException
+from flask_api_connector.marshal import marshal
+from flask_api_connector.views import BaseView
+
+
+def _expected(data, mfields, key=None):
+    return json.dumps(marshal(data, mfields, key=key),
+                      separators=(',', ':')).encode()
+
+
+item_fields = OrderedDict([
+    ('id', fields.Integer),
+    ('name', fields.String),
+    ('rate', fields.Float),
+    ('active', fields.Boolean),
+    ('price', fields.Fixed(2)),
+    ('tags', fields.List(fields.String)),
+    ('created', fields.DateTime),
+    ('owner', fields.Nested({'name': fields.String}, allow_null=True)),
+    ('author', fields.Nested({'id': fields.Integer},
+                             default={'id': -1})),
+    ('meta', {'code': fields.Raw}),
+    ('ünicode', fields.Raw),
+])
+
+
+class Item(object):
+    def __init__(self, i):
+        self.id = str(i)
+        self.name = f'名前{i} "quoted"'
+        self.rate = float('nan') if i == 2 else i / 3
+        self.active = i % 2
+        self.price = Decimal(i) / 8
+        self.tags = ['a', 'b']
+        self.created = None
+        self.owner = {'name': 'foo'} if i else None
+        self.author = None
+        self.code = i
+
+
+@pytest.mark.parametrize('data', [
+    Item(0),
+    [Item(i) for i in range(5)],
+    (Item(1), Item(2)),
+    [],
+    {'id': None, 'rate': float('inf'), 'active': None},
+])
+def test_equivalent_to_marshal_and_dumps(data):
+    assert marshal_to_json(data, item_fields) == \
+        _expected(data, item_fields)
+    assert marshal_to_json(data, item_fields, key='data') == \
+        _expected(data, item_fields, key='data')
+
+
+def test_nested_list():
+    mfields = {'items': fields.Nested({'a': fields.Integer})}
+    data = {'items': [{'a': 1}, {'a': 2}]}
+    assert marshal_to_json(data, mfields) == _expected(data, mfields)
+
+
+def test_namedtuple_as_record():
+    Row = namedtuple('Row', ['id', 'owner'])
+    mfields = {'id': fields.Integer,
+               'owner': fields.Nested({'id': fields.Integer})}
+    Owner = namedtuple('Owner', ['id'])
+
+    for data in (Row(1, Owner(2)), [Row(1, Owner(2))]):
+        assert marshal_to_json(data, mfields) == _expected(data, mfields)
+
+
+def test_raw_values_encoded_by_app(app):
+    mfields = {'a': fields.Raw, 'b': fields.Raw, 'c': fields.Raw}
+    data = {'a': datetime(2020, 1, 1), 'b': Decimal('1.5'),
+            'c': uuid.UUID(int=1)}
+
+    with app.app_context():
+        assert json.loads(marshal_to_json(data, mfields)) == \
+            json.loads(flask_json.dumps(marshal(data, mfields)))
+
+
+def test_plans_are_bounded():
+    for _ in range(_plans.maxsize + 10):
+        compile_fields({'id': fields.Integer})
+    assert len(_plans._data) <= _plans.maxsize
+
+
+def test_empty_fields():
+    assert marshal_to_json({'a': 1}, {}) == b'{}'
+
+
+def test_invalid_value():
+    with pytest.raises(InvalidFieldDataException):
+        marshal_to_json({'id': 'x'}, {'id': fields.Integer})
+
+
+def test_compiled_once():
+    mfields = {'id': fields.Integer}
+    assert compile_fields(mfields) is compile_fields(mfields)
+
+
+def test_fused_json_view(app, client):
+    class Index:
+        def get(self):
+            return [{'id': i, 'name': f'name{i}'} for i in range(3)]
+
+    class TargetView(BaseView, Index):
+        marshal_fields = OrderedDict([('id', fields.Integer),
+                                      ('name', fields.String)])
+        marshal_key = 'data'
+        fused_json = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.get('/')
+    assert resp.mimetype == 'application/json'
+    assert resp.data == \
+        b'{"data":[{"id":0,"name":"name0"},{"id":1,"name":"name1"},' \
+        b'{"id":2,"name":"name2"}]}'
+
+    resp = client.get('/?fields=name')
+    assert flask_json.loads(resp.data) == \
+        {'data': [{'name': f'name{i}'} for i in range(3)]}
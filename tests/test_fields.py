@@ -8,10 +8,13 @@ import unittest
 from unittest.mock import Mock, patch
 
 from collections import OrderedDict
-from datetime import datetime, timedelta, tzinfo
-from decimal import Decimal
+from calendar import timegm
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from decimal import ROUND_HALF_EVEN, Decimal
+from email.utils import formatdate
 from functools import partial
 
+import pytest
 import pytz
 from flask import Flask, Blueprint
 
@@ -99,6 +102,71 @@ def test_datetime_formatters():
         check_field(expected, fields.DateTime(), date_obj)
 
 
+def test_datetime_rfc822():
+    dates = [
+        datetime(2011, 1, 1),
+        datetime(2011, 1, 1, 23, 59, 59, 1000),
+        datetime(2011, 1, 1, 23, 59, 59, tzinfo=pytz.utc),
+        datetime(2011, 1, 1, 0, 59, 59, tzinfo=timezone(timedelta(hours=2))),
+        datetime(1960, 2, 29, 12, 0, 0),
+    ]
+
+    field = fields.DateTime(dt_format='rfc822')
+    for date_obj in dates:
+        expected = formatdate(timegm(date_obj.utctimetuple()))
+        check_field(expected, field, date_obj)
+
+    check_field('Sat, 01 Jan 2011 00:00:00 -0000', field, date(2011, 1, 1))
+
+
+def test_datetime_epoch_ms():
+    field = fields.DateTime(dt_format='epoch_ms')
+    values = [
+        (datetime(1970, 1, 1), 0),
+        (datetime(2011, 1, 1, 0, 0, 1, 2500), 1293840001002),
+        (datetime(2011, 1, 1, 1, 0, 1, tzinfo=timezone(timedelta(hours=1))),
+         1293840001000),
+        (datetime(1969, 12, 31, 23, 59, 59, 999999), -1),
+        (date(2011, 1, 1), 1293840000000),
+        (1293840001, 1293840001000),
+        (1293840001.5, 1293840001500),
+        ('2011-01-01T00:00:01Z', 1293840001000),
+    ]
+    for value, expected in values:
+        check_field(expected, field, value)
+
+
+def test_datetime_from_other_types():
+    field = fields.DateTime()
+    check_field('2011-01-01', field, date(2011, 1, 1))
+    check_field('2011-01-01T00:00:00+00:00', field, 1293840000)
+    check_field('2011-01-01T10:00:00+00:00', field, '2011-01-01T10:00:00Z')
+    check_field('2011-01-01T10:00:00', field, '2011-01-01T10:00:00')
+
+
+def test_datetime_cache_distinguishes_timezone():
+    field = fields.DateTime(cache_size=8)
+    utc = datetime(2011, 1, 1, 10, tzinfo=timezone.utc)
+    # same point of time in the different timezone
+    other = utc.astimezone(timezone(timedelta(hours=9)))
+
+    assert field.format(utc) == '2011-01-01T10:00:00+00:00'
+    assert field.format(other) == '2011-01-01T19:00:00+09:00'
+    assert field.format(utc) == '2011-01-01T10:00:00+00:00'
+    assert field.cache_info().hits == 1
+
+    assert fields.DateTime(cache_size=0).cache_info() is None
+
+
+def test_datetime_format_many():
+    values = [datetime(2011, 1, 1), None, datetime(2011, 1, 1), 0]
+    for cache_size in (0, 4):
+        field = fields.DateTime(dt_format='epoch_ms', cache_size=cache_size,
+                                default=-1)
+        assert field.format_many(values) == [1293840000000, -1,
+                                             1293840000000, 0]
+
+
 class FieldsTestCase(unittest.TestCase):
 
     def test_decimal_trash(self):
@@ -110,9 +178,13 @@ class FieldsTestCase(unittest.TestCase):
         self.assertEqual(field.output("foo", obj), "3")
 
     def test_date_field_invalid(self):
-        obj = {"bar": 3}
         field = fields.DateTime()
-        self.assertRaises(InvalidFieldDataException, lambda: field.output("bar", obj))
+        for value in (object(), [3], "not a date"):
+            obj = {"bar": value}
+            self.assertRaises(InvalidFieldDataException, lambda: field.output("bar", obj))
+
+        with self.assertRaises(InvalidFieldDataException):
+            fields.DateTime(dt_format='unknown')
 
     def test_basic_field(self):
         obj = Mock()
@@ -298,5 +370,109 @@ class FieldsTestCase(unittest.TestCase):
         self.assertEqual([1, 2, 'a'], field.output('list', obj))
 
 
+def _reference_fixed(value, decimals):
+    precision = Decimal('0.' + '0' * (decimals - 1) + '1')
+    dvalue = Decimal(value)
+    if not dvalue.is_normal() and dvalue != Decimal():
+        raise InvalidFieldDataException('Invalid Fixed precision number.')
+    return str(dvalue.quantize(precision, rounding=ROUND_HALF_EVEN))
+
+
+def _reference_result(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+def test_fixed_fast_path_is_equivalent_to_decimal():
+    hypothesis = pytest.importorskip('hypothesis')
+    st = hypothesis.strategies
+
+    values = st.one_of(
+        st.integers(),
+        st.integers(min_value=-10**30, max_value=10**30),
+        st.floats(allow_nan=True, allow_infinity=True),
+        st.floats(min_value=-1e6, max_value=1e6),
+        st.decimals(allow_nan=False),
+    )
+
+    @hypothesis.given(value=values, decimals=st.integers(0, 10))
+    @hypothesis.settings(max_examples=500, deadline=None)
+    def check(value, decimals):
+        field = fields.Fixed(decimals)
+        expected = _reference_result(_reference_fixed, value, decimals)
+        assert _reference_result(field.format, value) == expected
+        if not isinstance(expected, type):
+            assert field.format_many([value]) == [expected]
+
+    check()
+
+
+def test_fixed_fast_path_ties_and_zero():
+    field = fields.Fixed(2)
+    for value in (0.125, 0.375, -0.125, 2.675, -0.0, 0, -1, True):
+        assert field.format(value) == _reference_fixed(value, 2)
+
+    # small values are in scientific notation with high precision
+    field = fields.Fixed(8)
+    assert field.format(0) == '0E-8'
+    assert field.format(1e-9) == _reference_fixed(1e-9, 8)
+
+
+def test_arbitrary_fast_path_is_equivalent_to_decimal():
+    hypothesis = pytest.importorskip('hypothesis')
+    st = hypothesis.strategies
+
+    values = st.one_of(
+        st.integers(),
+        st.booleans(),
+        st.floats(allow_nan=False, allow_infinity=False),
+        st.decimals(),
+    )
+
+    @hypothesis.given(value=values)
+    @hypothesis.settings(max_examples=300, deadline=None)
+    def check(value):
+        field = fields.Arbitrary()
+        assert field.format(value) == str(Decimal(value))
+        assert field.format_many([value, None]) == [str(Decimal(value)), None]
+
+    check()
+
+
+def test_format_many_uses_default_for_none():
+    field = fields.Integer(default=-1)
+    assert field.format_many([1, None, '3']) == [1, -1, 3]
+
+    field = fields.Fixed(2, default='0.00')
+    assert field.format_many([1, None, Decimal('1.005'), '2']) == \
+        ['1.00', '0.00', '1.00', '2.00']
+
+
+
+def test_list_formats_items_at_once():
+    cases = [
+        (fields.Fixed(2, default='0.00'),
+         [1, 2.5, None, Decimal('1.005'), '3']),
+        (fields.Arbitrary, [1, 0.1, None, Decimal('2.5')]),
+        (fields.DateTime(dt_format='iso8601'), [datetime(2020, 1, 1), None]),
+        (fields.Integer(default=-1), [1, None, '3']),
+        (fields.String, ['a', None]),
+        (fields.Raw, [1, None, {'a': 1}]),
+    ]
+    for container, values in cases:
+        field = fields.List(container)
+        expected = field._format(values, field.container.output)
+        assert field.format(values) == expected
+        assert field.format(tuple(values)) == expected
+
+    field = fields.List(fields.Fixed(2))
+    with patch.object(fields.Fixed, 'format_many',
+                      wraps=field.container.format_many) as format_many:
+        assert field.output('prices', {'prices': [1, 2]}) == ['1.00', '2.00']
+    format_many.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -6,7 +6,13 @@
 
 from collections import OrderedDict
 
-from flask_api_connector.marshal import marshal
+import pytest
+
+from flask_api_connector.exceptions import MarshallException
+from flask_api_connector.marshal import (
+    FieldsCache, _loader_plans, _row_plans, _type_plans, marshal, prepare,
+    project
+)
 from flask_api_connector.fields import List, Nested, String, Raw
 
 
@@ -176,3 +182,465 @@ def test_marshal_nested():
         output = flask_restful.marshal(marshal_fields, fields)
         expected = OrderedDict([('foo', 'foo-val'), ('bar', OrderedDict([('a', 1), ('b', 2)]))])
         assert output == expected
+
+
+def test_marshal_only_selected_fields():
+    fields = OrderedDict([('foo', Raw), ('bar', Raw), ('baz', Raw)])
+    data = {'foo': 1, 'bar': 2, 'baz': 3}
+
+    output = marshal(data, fields, only=['baz', 'foo'])
+    # the order of the fields is kept
+    assert list(output.items()) == [('foo', 1), ('baz', 3)]
+
+
+def test_marshal_only_does_not_access_unrequested_attributes():
+    class Lazy(object):
+        id = 1
+
+        @property
+        def owner(self):
+            raise AssertionError('should not be loaded')
+
+    fields = OrderedDict([
+        ('id', Raw),
+        ('owner', Nested({'name': String})),
+    ])
+
+    assert marshal([Lazy()], fields, only=['id']) == [{'id': 1}]
+
+
+def test_marshal_only_nested_fields():
+    fields = OrderedDict([
+        ('id', Raw),
+        ('owner', Nested(OrderedDict([('name', String), ('age', Raw)]),
+                         allow_null=True)),
+        ('items', List(Nested({'name': String, 'price': Raw}))),
+        ('meta', {'a': Raw, 'b': Raw}),
+    ])
+    data = {
+        'id': 1,
+        'owner': {'name': 'foo', 'age': 10},
+        'items': [{'name': 'x', 'price': 1}],
+        'a': 1,
+        'b': 2,
+    }
+
+    output = marshal(data, fields,
+                     only=['owner.name', 'items.price', 'meta.b'])
+    assert output == {
+        'owner': {'name': 'foo'},
+        'items': [{'price': 1}],
+        'meta': {'b': 2},
+    }
+
+    # field options are kept in projected fields
+    output = marshal({'owner': None}, fields, only=['owner.age'])
+    assert output == {'owner': None}
+
+    # the original fields are not modified
+    assert list(fields['owner'].nested) == ['name', 'age']
+
+
+def test_projection_is_cached():
+    fields = OrderedDict([('foo', Raw), ('bar', Raw)])
+
+    assert project(fields, ['foo']) is project(fields, ['foo'])
+    assert project(fields, ['foo', 'bar']) is project(fields, ['bar', 'foo'])
+
+
+def test_invalid_projection():
+    fields = OrderedDict([('foo', Raw), ('bar', Nested({'a': Raw}))])
+
+    with pytest.raises(MarshallException):
+        marshal({}, fields, only=['unknown'])
+
+    with pytest.raises(MarshallException):
+        marshal({}, fields, only=['bar.unknown'])
+
+    with pytest.raises(MarshallException):
+        marshal({}, fields, only=['foo.a'])
+
+
+class CountingLoader(object):
+    """In-memory stand-in of a backend which counts the calls."""
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def __call__(self, keys):
+        self.calls.append(list(keys))
+        return {k: self.records[k] for k in keys if k in self.records}
+
+
+def test_batch_load_nested():
+    companies = CountingLoader({i: {'name': f'company{i}'} for i in range(2)})
+    authors = CountingLoader({
+        i: {'name': f'author{i}', 'company_id': i % 2} for i in range(5)
+    })
+    tags = CountingLoader({i: {'label': f'tag{i}'} for i in range(3)})
+
+    fields = OrderedDict([
+        ('title', String),
+        ('author', Nested(OrderedDict([
+            ('name', String),
+            ('company', Nested({'name': String}, loader=companies,
+                               loader_key='company_id')),
+        ]), loader=authors, loader_key='author_id')),
+        ('tags', List(Nested({'label': String}), loader=tags,
+                      loader_key='tag_ids')),
+    ])
+
+    posts = [
+        {'title': f'post{i}', 'author_id': i % 5, 'tag_ids': [i % 3, 0]}
+        for i in range(500)
+    ]
+
+    output = marshal(posts, fields)
+
+    assert output[7] == OrderedDict([
+        ('title', 'post7'),
+        ('author', OrderedDict([
+            ('name', 'author2'),
+            ('company', OrderedDict([('name', 'company0')])),
+        ])),
+        ('tags', [OrderedDict([('label', 'tag1')]),
+                  OrderedDict([('label', 'tag0')])]),
+    ])
+
+    # loaders are called once per nesting level with unique keys
+    assert authors.calls == [[0, 1, 2, 3, 4]]
+    assert companies.calls == [[0, 1]]
+    assert tags.calls == [[0, 1, 2]]
+
+
+def test_batch_load_through_nested_without_loader():
+    authors = CountingLoader({i: {'name': f'author{i}'} for i in range(3)})
+    fields = {
+        'post': Nested({
+            'author': Nested({'name': String}, loader=authors),
+        }),
+    }
+    data = [{'post': {'author': i % 3}} for i in range(10)]
+
+    output = marshal(data, fields)
+    assert output[4] == {'post': {'author': {'name': 'author1'}}}
+    assert len(authors.calls) == 1
+
+
+def test_batch_load_missing_and_null_keys():
+    authors = CountingLoader({1: {'name': 'author1'}})
+    fields = {
+        'author': Nested({'name': String}, loader=authors, allow_null=True),
+    }
+
+    output = marshal([{'author': 1}, {'author': 2}, {'author': None}], fields)
+    assert output == [{'author': {'name': 'author1'}},
+                      {'author': None}, {'author': None}]
+    assert authors.calls == [[1, 2]]
+
+
+def test_load_without_batch_context():
+    authors = CountingLoader({1: {'name': 'author1'}})
+    field = Nested({'name': String}, loader=authors)
+
+    assert field.output('author', {'author': 1}) == {'name': 'author1'}
+    assert authors.calls == [[1]]
+
+
+def test_fields_cache_lru():
+    cache = FieldsCache(maxsize=2)
+    first, second, third = {'a': Raw}, {'b': Raw}, {'c': Raw}
+
+    cache.get_or_set(first, lambda: 1)
+    cache.get_or_set(second, lambda: 2)
+    # first is used recently, so second is evicted
+    assert cache.get_or_set(first, lambda: None) == 1
+    cache.get_or_set(third, lambda: 3)
+
+    assert cache.get_or_set(first, lambda: None) == 1
+    assert cache.get_or_set(second, lambda: None) is None
+
+
+def test_fields_cache_hit_without_lock():
+    class NoLock(object):
+        def __enter__(self):
+            raise AssertionError('locked on hit')
+
+    cache = FieldsCache(maxsize=2)
+    fields = {'a': Raw}
+    cache.get_or_set(fields, lambda: 1)
+    cache._lock = NoLock()
+    assert cache.get_or_set(fields, lambda: None) == 1
+
+
+def test_loader_plan_once_per_marshal(monkeypatch):
+    import sys
+    module = sys.modules['flask_api_connector.marshal']
+    calls = []
+    loader_plan = module._loader_plan
+
+    def counted(fields):
+        calls.append(fields)
+        return loader_plan(fields)
+
+    fields = OrderedDict([('a', Raw), ('b', {'c': Raw})])
+    module.prepare(fields)
+    monkeypatch.setattr(module, '_loader_plan', counted)
+    out = marshal([{'a': i, 'c': i} for i in range(10)], fields)
+    assert out[9] == {'a': 9, 'b': {'c': 9}}
+    assert calls == [fields]
+
+
+def test_loader_plans_are_bounded():
+    for i in range(_loader_plans.maxsize + 10):
+        assert marshal({'a': i}, {'a': Raw()}) == {'a': i}
+    assert len(_loader_plans._data) <= _loader_plans.maxsize
+
+
+def test_marshal_namedtuple_as_record():
+    from collections import namedtuple
+
+    Row = namedtuple('Row', ['foo', 'bar'])
+    fields = OrderedDict([('foo', Raw), ('bar', String)])
+
+    assert marshal(Row(1, 2), fields) == {'foo': 1, 'bar': '2'}
+    assert marshal([Row(1, 2)], fields) == [{'foo': 1, 'bar': '2'}]
+
+
+def test_marshal_rows_with_description():
+    import sqlite3
+    from flask_api_connector.fields import Fixed, Integer
+    from flask_api_connector.marshal import marshal_rows
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE items (id, name, price, tags, extra)')
+    conn.executemany('INSERT INTO items VALUES (?, ?, ?, ?, ?)', [
+        (1, 'a', 1.005, 'x', 'ignored'),
+        (2, None, None, None, 'ignored'),
+    ])
+    cursor = conn.execute('SELECT extra, price, name, id, tags FROM items')
+
+    fields = OrderedDict([
+        ('id', Integer),
+        ('name', String(default='none')),
+        ('price', Fixed(2)),
+        ('tags', Raw),
+        ('meta', {'id': Raw}),
+    ])
+
+    output = marshal_rows(cursor.fetchall(), fields,
+                          columns=cursor.description, key='data')
+    expected = [
+        OrderedDict([('id', 1), ('name', 'a'), ('price', '1.00'),
+                     ('tags', 'x'), ('meta', {'id': 1})]),
+        OrderedDict([('id', 2), ('name', 'none'), ('price', None),
+                     ('tags', None), ('meta', {'id': 2})]),
+    ]
+    assert output == {'data': expected}
+
+
+def test_marshal_rows_namedtuple_and_errors():
+    from collections import namedtuple
+    from flask_api_connector.marshal import bind_rows, marshal_rows
+
+    Row = namedtuple('Row', ['id', 'name'])
+    fields = OrderedDict([('name', String), ('id', Raw)])
+
+    assert marshal_rows([Row(1, 'a')], fields) == [{'name': 'a', 'id': 1}]
+    assert marshal_rows([], fields) == []
+    assert bind_rows(fields, Row) is bind_rows(fields, ['id', 'name'])
+
+    with pytest.raises(MarshallException):
+        bind_rows({'unknown': Raw}, Row)
+
+    with pytest.raises(MarshallException):
+        marshal_rows([(1, 'a')], fields)
+
+
+def test_marshal_dataclass_attrs_and_slots():
+    import dataclasses
+    from flask_api_connector.fields import Integer
+
+    @dataclasses.dataclass
+    class Owner:
+        name: str
+
+    @dataclasses.dataclass
+    class Item:
+        id: int
+        owner: Owner
+        tags: list
+
+        @property
+        def label(self):
+            return f'item{self.id}'
+
+    class Slotted(object):
+        __slots__ = ('id', 'owner', 'tags')
+
+        def __init__(self, id, owner, tags):
+            self.id = id
+            self.owner = owner
+            self.tags = tags
+
+    fields = OrderedDict([
+        ('id', Integer),
+        ('owner.name', String),
+        ('owner', Nested({'name': String})),
+        ('tags', List(String)),
+    ])
+    expected = OrderedDict([
+        ('id', 1),
+        ('owner.name', 'foo'),
+        ('owner', OrderedDict([('name', 'foo')])),
+        ('tags', ['a']),
+    ])
+
+    for cls in (Item, Slotted):
+        assert marshal([cls(1, Owner('foo'), ['a'])], fields) == [expected]
+
+    # property is a valid attribute
+    assert marshal(Item(1, None, []), {'label': String}) == {'label': 'item1'}
+
+    attr = pytest.importorskip('attr')
+
+    @attr.s(slots=True)
+    class AttrsItem(object):
+        id = attr.ib()
+        owner = attr.ib()
+        tags = attr.ib()
+
+    assert marshal(AttrsItem(1, Owner('foo'), ['a']), fields) == expected
+
+
+def test_marshal_slots_fallback_to_get_value():
+    class Slotted(object):
+        __slots__ = ('id', 'owner')
+
+    obj = Slotted()
+    obj.id = 1
+    # unset slot and nested dict are handled as same as get_value
+    fields = OrderedDict([('id', Raw), ('name', Raw), ('owner.name', Raw)])
+    assert marshal(obj, fields) == {'id': 1, 'name': None,
+                                    'owner.name': None}
+
+    fields = OrderedDict([('id', Raw), ('owner.name', Raw)])
+    assert marshal(obj, fields) == {'id': 1, 'owner.name': None}
+
+    obj.owner = {'name': 'foo'}
+    assert marshal(obj, fields) == {'id': 1, 'owner.name': 'foo'}
+
+
+def test_marshal_slots_raise_errors_of_fields():
+    class Slotted(object):
+        __slots__ = ('id', 'owner')
+
+    calls = []
+
+    class Broken(Raw):
+        def format(self, value):
+            calls.append(value)
+            raise AttributeError('bug in field')
+
+    obj = Slotted()
+    obj.id = 1
+    with pytest.raises(AttributeError):
+        marshal(obj, {'id': Broken})
+    # not run again by the fallback
+    assert calls == [1]
+
+    # nested group falls back with its own fields
+    fields = OrderedDict([('id', Raw), ('meta', {'owner': Raw})])
+    assert marshal(obj, fields) == {'id': 1, 'meta': {'owner': None}}
+
+
+def test_bind_type():
+    import dataclasses
+    from flask_api_connector.marshal import bind_type
+
+    @dataclasses.dataclass
+    class Item:
+        id: int
+
+    fields = {'id': Raw}
+    assert bind_type(fields, Item)(Item(1)) == {'id': 1}
+    assert bind_type(fields, Item) is bind_type(fields, Item)
+
+    with pytest.raises(MarshallException):
+        bind_type({'unknown': Raw}, Item)
+
+    with pytest.raises(MarshallException):
+        bind_type(fields, dict)
+
+
+def test_marshal_normalized():
+    from flask_api_connector.cache import MarshalCache
+    from flask_api_connector.marshal import marshal_normalized
+
+    calls = []
+
+    class Author:
+        def __init__(self, id):
+            self.id = id
+
+        @property
+        def name(self):
+            calls.append(self.id)
+            return f'author{self.id}'
+
+    authors = {i: Author(i) for i in range(2)}
+    posts = [{'id': i, 'author': authors[i % 2], 'reviewers': [authors[1]]}
+             for i in range(4)]
+    posts.append({'id': 4, 'author': None, 'reviewers': []})
+
+    author_fields = {'id': Raw, 'name': String}
+    cache = MarshalCache(key=lambda obj: obj.id)
+    fields = OrderedDict([
+        ('id', Raw),
+        ('author', Nested(author_fields, entity='author', allow_null=True,
+                          cache=cache)),
+        ('reviewers', List(Nested(author_fields, entity='author'))),
+    ])
+
+    out = marshal_normalized(posts, fields)
+    assert list(out) == ['data', 'included']
+    assert out['data'][:2] == [
+        {'id': 0, 'author': 0, 'reviewers': [1]},
+        {'id': 1, 'author': 1, 'reviewers': [1]},
+    ]
+    assert out['data'][4] == {'id': 4, 'author': None, 'reviewers': []}
+    assert out['included'] == {'author': {
+        '0': {'id': 0, 'name': 'author0'},
+        '1': {'id': 1, 'name': 'author1'},
+    }}
+    # each entity is marshalled once
+    assert sorted(calls) == [0, 1]
+
+    # out of the context, nested objects are output as usual
+    assert marshal(posts[0], fields)['author'] == {'id': 0,
+                                                    'name': 'author0'}
+
+    out = marshal_normalized(posts[0], fields, key='post', only=['author'])
+    assert out == {'post': {'author': 0},
+                   'included': {'author': {'0': {'id': 0,
+                                                'name': 'author0'}}}}
+
+
+def test_prepare_plans_of_types_columns_and_projections():
+    import dataclasses
+
+    @dataclasses.dataclass
+    class User:
+        id: int
+        name: str
+
+    fields = OrderedDict([('id', Raw), ('name', String)])
+    prepare(fields, types=[User], columns=[['id', 'name']],
+            projections=[['name']])
+
+    for native in (False, True):
+        assert (id(fields), ('auto', User, native)) in _type_plans._data
+        assert (id(fields), (('id', 'name'), native)) in _row_plans._data
+    assert (id(project(fields, ['name'])), None) in _loader_plans._data
+    assert marshal(User(1, 'foo'), fields) == {'id': 1, 'name': 'foo'}
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import tracemalloc
+
+import pytest
+from flask import json
+
+from flask_api_connector import fields, memory
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector.memory import MemoryTracker, deep_sizeof
+from flask_api_connector.views import BaseView
+
+
+item_fields = {'id': fields.Integer, 'name': fields.String}
+
+
+def _view(app, count, **options):
+    class Items:
+        def get(self):
+            return [{'id': i, 'name': 'x' * 100}
+                    for i in range(count[0])]
+
+    TargetView = type('TargetView', (BaseView, Items), dict(
+        marshal_fields=item_fields, marshal_key='data',
+        memory_tracking=True, **options))
+    view = TargetView.as_view('items')
+    app.add_url_rule('/items', view_func=view)
+    return view
+
+
+def test_deep_sizeof():
+    assert deep_sizeof({'a': [1, 2]}) > deep_sizeof({'a': []})
+
+
+def test_record_memory_usage(app, client):
+    count = [10]
+    view = _view(app, count, memory_sample_rate=1.0)
+
+    resp = client.get('/items')
+    assert len(json.loads(resp.data)['data']) == 10
+
+    count[0] = 1000
+    client.get('/items')
+
+    info = view.memory.info()
+    assert info['requests'] == 2
+    assert info['sampled'] == 2
+    assert info['records_max'] == 1000
+    assert info['bytes_max'] > 100 * 1000
+    assert info['peak_max'] > 100 * 1000
+    assert info['output_max'] > 100 * 1000
+    assert info['streamed'] == 0
+
+
+def test_no_sampling(app, client):
+    view = _view(app, [10], memory_sample_rate=0)
+    client.get('/items')
+    info = view.memory.info()
+    assert info['requests'] == 1
+    assert info['sampled'] == 0
+    assert info['bytes_max'] > 0
+
+
+def test_log_over_soft_limit(app, client, caplog):
+    view = _view(app, [100], memory_soft_limit=1000)
+    with caplog.at_level(logging.WARNING, 'flask_api_connector.memory'):
+        client.get('/items')
+    assert view.memory.over_limit == 1
+    assert 'exceeds soft limit' in caplog.text
+
+
+def test_stream_over_soft_limit(app, client):
+    count = [5]
+    view = _view(app, count, memory_soft_limit=5000,
+                 memory_limit_action='stream')
+
+    # small response to learn the size of a record
+    client.get('/items')
+    assert view.memory.streamed == 0
+    assert view.memory.bytes_per_record > 100
+
+    count[0] = 250
+    resp = client.get('/items?fields=id')
+    data = json.loads(resp.data)
+    assert data == {'data': [{'id': i} for i in range(250)]}
+    assert view.memory.streamed == 1
+
+
+def test_invalid_action():
+    with pytest.raises(ValueError):
+        MemoryTracker('index', action='unknown')
+
+
+def test_memory_debug_route(app, client):
+    class Items:
+        def get(self):
+            return [{'id': 1}]
+
+    paths = Paths([('/items', Items, {'memory_tracking': True})])
+    ApiConnector(paths, debug_routes=True).init_app(app)
+    client.get('/api/items')
+
+    data = json.loads(client.get('/api/_debug/memory').data)
+    assert data['items']['requests'] == 1
+
+
+def test_stream_normalized(app, client):
+    author = {'id': 1, 'name': 'foo'}
+    count = [5]
+
+    class Items:
+        def get(self):
+            return [{'id': i, 'author': author} for i in range(count[0])]
+
+    TargetView = type('TargetView', (BaseView, Items), dict(
+        marshal_fields={
+            'id': fields.Integer,
+            'author': fields.Nested({'id': fields.Integer,
+                                     'name': fields.String},
+                                    entity='author'),
+        },
+        normalize=True, memory_tracking=True, memory_soft_limit=2000,
+        memory_limit_action='stream'))
+    view = TargetView.as_view('items')
+    app.add_url_rule('/items', view_func=view)
+
+    client.get('/items')
+    count[0] = 250
+    data = json.loads(client.get('/items').data)
+    assert view.memory.streamed == 1
+    assert data == {
+        'data': [{'id': i, 'author': 1} for i in range(250)],
+        'included': {'author': {'1': {'id': 1, 'name': 'foo'}}},
+    }
+
+
+def test_trace_by_trackers_of_routes(monkeypatch):
+    first = MemoryTracker('first', sample_rate=1.0)
+    second = MemoryTracker('second', sample_rate=1.0)
+
+    assert first.begin()
+    assert second.begin()
+    data = [b'x' * 1000 for _ in range(100)]
+    # tracing is not stopped while the other is traced
+    assert first.end() > 0
+    assert tracemalloc.is_tracing()
+    assert second.end() > 0
+    assert not tracemalloc.is_tracing()
+
+    # without reset_peak, the traced memory at the end is recorded
+    monkeypatch.setattr(memory, '_reset_peak', None)
+    tracemalloc.start()
+    try:
+        assert first.begin()
+        data.append(b'x' * 100000)
+        assert first.end() >= 100000
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+from flask import json
+
+from flask_api_connector import fields
+from flask_api_connector.exceptions import (
+    InvalidCursorException, MarshallException
+)
+from flask_api_connector.pagination import (
+    Page, decode_cursor, encode_cursor, paginate
+)
+from flask_api_connector.views import BaseView
+
+ROWS = 1000000
+
+user_fields = {'id': fields.Integer, 'name': fields.String}
+
+
+@pytest.fixture(scope='module')
+def db():
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO users VALUES (?, ?)',
+                     ((i, f'user{i}') for i in range(1, ROWS + 1)))
+    yield conn
+    conn.close()
+
+
+def fetch_users(db):
+    def query(after, limit):
+        return db.execute('SELECT id, name FROM users WHERE id > ? '
+                          'ORDER BY id LIMIT ?', (after or 0, limit))
+    return query
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(10, secret='s')
+    assert decode_cursor(cursor, secret='s') == 10
+
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(cursor, secret='other')
+    with pytest.raises(InvalidCursorException):
+        decode_cursor('broken', secret='s')
+
+    payload, signature = cursor.split('.')
+    forged = encode_cursor(20, secret='s').split('.')[0] + '.' + signature
+    with pytest.raises(InvalidCursorException):
+        decode_cursor(forged, secret='s')
+
+
+def test_cursor_of_tagged_values():
+    values = [
+        datetime(2020, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc),
+        date(2020, 1, 2),
+        Decimal('1.10'),
+        UUID('12345678123456781234567812345678'),
+        (datetime(2020, 1, 2), 10),
+        {'$unknown': 1},
+    ]
+    for value in values:
+        decoded = decode_cursor(encode_cursor(value, secret='s'),
+                                secret='s')
+        assert decoded == value
+        assert type(decoded) is type(value)
+
+
+def test_paginate_by_timestamp(app):
+    start = datetime(2020, 1, 1)
+    rows = [{'id': i, 'name': f'user{i}',
+             'created': start + timedelta(minutes=i)} for i in range(5)]
+    row_fields = dict(user_fields, created=fields.DateTime)
+
+    ids = []
+    cursor = None
+    with app.test_request_context():
+        while True:
+            page = Page(rows, key='created', limit=2,
+                        cursor=cursor).marshal(row_fields)
+            ids += [r['id'] for r in page['data']]
+            cursor = page['next']
+            if cursor is None:
+                break
+    assert ids == [0, 1, 2, 3, 4]
+
+
+def test_paginate_iterable(app):
+    rows = [{'id': i, 'name': f'user{i}', 'secret': 'x'} for i in range(5)]
+
+    with app.test_request_context():
+        page = Page(rows, limit=2).marshal(user_fields)
+        assert [r['id'] for r in page['data']] == [0, 1]
+        assert 'secret' not in page['data'][0]
+
+        page = Page(rows, limit=2, cursor=page['next']).marshal(user_fields)
+        assert [r['id'] for r in page['data']] == [2, 3]
+
+        page = Page(rows, limit=2, cursor=page['next']).marshal(user_fields)
+        assert [r['id'] for r in page['data']] == [4]
+        assert page['next'] is None
+
+        with pytest.raises(MarshallException):
+            Page(rows, key='unknown').marshal(user_fields)
+
+
+def test_paginate_rows(app, db):
+    with app.test_request_context():
+        page = Page(fetch_users(db), limit=3,
+                    columns=['id', 'name']).marshal(user_fields)
+    assert page == {
+        'data': [{'id': 1, 'name': 'user1'}, {'id': 2, 'name': 'user2'},
+                 {'id': 3, 'name': 'user3'}],
+        'next': page['next'],
+    }
+    assert list(page) == ['data', 'next']
+
+
+def test_constant_time_deep_pages(app, db):
+    query = fetch_users(db)
+
+    def fetch(cursor):
+        page = Page(query, limit=50, cursor=cursor, columns=['id', 'name'])
+        start = time.perf_counter()
+        rows, next_cursor = page.fetch()
+        return time.perf_counter() - start, rows
+
+    with app.test_request_context():
+        first = min(fetch(None)[0] for _ in range(5))
+        deep_cursor = encode_cursor(ROWS - 100)
+        deep = min(fetch(deep_cursor)[0] for _ in range(5))
+        rows = fetch(deep_cursor)[1]
+
+    assert rows[0][0] == ROWS - 99
+    # index seek does not depend on the position,
+    # while OFFSET would scan a million rows
+    assert deep < max(first * 10, 0.005)
+
+
+def test_paginate_in_view(app, client, db):
+    class Users:
+        def get(self):
+            return paginate(fetch_users(db), columns=['id', 'name'],
+                            limit=2, max_limit=3)
+
+    class TargetView(BaseView, Users):
+        marshal_fields = user_fields
+
+    app.add_url_rule('/users', view_func=TargetView.as_view('users'))
+
+    data = json.loads(client.get('/users').data)
+    assert [u['id'] for u in data['data']] == [1, 2]
+
+    data = json.loads(client.get(
+        f'/users?cursor={data["next"]}&limit=10&fields=name').data)
+    assert data['data'] == [{'name': 'user3'}, {'name': 'user4'},
+                            {'name': 'user5'}]
+
+    assert client.get('/users?cursor=broken').status_code == 400
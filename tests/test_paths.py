@@ -2,7 +2,10 @@
 
 from unittest.mock import patch
 
+import pytest
+
 from flask_api_connector.core import Paths
+from flask_api_connector.views import view_options
 
 
 def test_execute_process_for_all_paths():
@@ -110,3 +113,61 @@ def test_nested_paths():
         assert hasattr(path.view_cls, 'get')
 
     assert not targets
+
+
+def test_set_options_to_view_class():
+    class Test1(object):
+        def get(self):
+            pass
+
+    mfields = {'id': object()}
+
+    paths = list(Paths([
+        ('/test1', Test1, 'first', {'marshal_fields': mfields}),
+        ('/test2', Test1, {'marshal_key': 'data'}),
+    ]))
+
+    assert paths[0].name == 'first'
+    options = view_options(paths[0].view_cls)
+    assert options['marshal_fields'] is mfields
+    assert options['marshal_key'] is None
+
+    assert paths[1].name == 'test1'
+    options = view_options(paths[1].view_cls)
+    assert options['marshal_fields'] is None
+    assert options['marshal_key'] == 'data'
+
+    # original class is not modified
+    assert not hasattr(Test1, 'marshal_fields')
+    assert not hasattr(paths[0].view_cls, 'marshal_fields')
+
+
+def test_options_of_view_class():
+    class Test1(object):
+        marshal_key = 'items'
+        compress = True
+
+        def get(self):
+            pass
+
+        # methods named like options are not options
+        def normalize(self):
+            pass
+
+    options = view_options(list(Paths([
+        ('/test1', Test1, {'marshal_key': 'data', 'compress_level': 1}),
+    ]))[0].view_cls)
+
+    assert options['marshal_key'] == 'items'
+    assert options['compress'] is True
+    assert options['compress_level'] == 1
+    assert options['normalize'] is False
+
+
+def test_reject_unknown_option():
+    class Test1(object):
+        def get(self):
+            pass
+
+    with pytest.raises(ValueError):
+        list(Paths([('/test1', Test1, {'compres': True})]))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector import profiler as profiler_module
+from flask_api_connector.profiler import SamplingProfiler
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class Slow:
+    def get(self):
+        busy(0.3)
+        return {}
+
+
+def _init(app, **kwargs):
+    connector = ApiConnector(Paths([('/slow', Slow, 'slow')]),
+                             debug_routes=True, **kwargs)
+    connector.init_app(app)
+    return connector
+
+
+def test_sample_stacks_of_views(app):
+    connector = _init(app)
+    profiler = SamplingProfiler(hz=200)
+
+    # only threads in the views are sampled
+    idle = threading.Thread(target=busy, args=(0.3,))
+    idle.start()
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(app.test_client().get, '/api/slow')
+        time.sleep(0.05)
+        stacks = profiler.run(0.1)
+        assert future.result().status_code == 200
+    idle.join()
+
+    assert stacks
+    assert all(stack[0] == 'slow' for stack in stacks)
+    assert any(stack[-1].startswith('busy (test_profiler.py')
+               for stack in stacks)
+
+    text = profiler.collapse(stacks)
+    line = text.splitlines()[0]
+    assert line.startswith('slow;')
+    assert int(line.rsplit(' ', 1)[1]) > 0
+    assert not connector.profiler.running
+
+
+def test_profile_route(app, client):
+    _init(app)
+    assert client.get('/api/_debug/profile/result').status_code == 404
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(app.test_client().get, '/api/slow')
+        time.sleep(0.05)
+        # the profiler does not block the request
+        resp = client.get('/api/_debug/profile?seconds=0.1')
+        assert resp.status_code == 202
+        url = resp.headers['Location']
+        assert resp.get_json()['result_url'] == url
+        assert client.get(url).status_code == 202
+        future.result()
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        resp = client.get(url)
+        if resp.status_code != 202:
+            break
+        time.sleep(0.01)
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
+    assert resp.data.startswith(b'slow;')
+
+    assert client.get('/api/_debug/profile?seconds=0').status_code == 400
+    assert client.get('/api/_debug/profile?hz=10000').status_code == 400
+
+
+def test_profile_once_at_a_time(app, client):
+    connector = _init(app)
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(connector.profiler.run, 0.2)
+        time.sleep(0.05)
+        resp = client.get('/api/_debug/profile?seconds=0.1')
+        future.result()
+    assert resp.status_code == 409
+
+
+def test_untag_thread_after_request(app):
+    _init(app)
+    with app.test_request_context():
+        assert app.view_functions['slow']().status_code == 200
+    # the tag of the thread is removed after the request
+    assert threading.get_ident() not in profiler_module._endpoints
+
+
+def test_debug_auth(app, client):
+    _init(app, debug_auth=lambda: False)
+    assert client.get('/api/_debug/profile').status_code == 403
+    assert client.get('/api/_debug/slow').status_code == 403
+
+
+def test_debug_routes_need_auth_in_production(app, client):
+    app.testing = False
+    _init(app)
+    assert client.get('/api/_debug/slow').status_code == 403
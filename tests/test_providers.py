@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import pytest
+from flask import json
+
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector.providers import Providers
+
+
+class Pool:
+    """Stand-in connection pool."""
+
+    def __init__(self):
+        self.ids = count()
+        self.released = []
+
+    def acquire(self):
+        return f'conn{next(self.ids)}'
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+class Index:
+    def get(self, db, http, config):
+        return {'db': db, 'http': http is not None, 'config': config}
+
+
+def test_inject_providers(app, client):
+    pool = Pool()
+    connector = ApiConnector(Paths([('/items', Index)]))
+    connector.providers.register('db', pool.acquire, scope='request',
+                                 close=pool.release)
+    connector.providers.register('http', lambda: object(), scope='thread')
+
+    @connector.provider('config')
+    def config():
+        return {'debug': False}
+
+    connector.init_app(app)
+
+    resp = client.get('/api/items')
+    data = json.loads(resp.data)
+    assert data['db'] == 'conn0'
+    assert data['config'] == {'debug': False}
+    assert pool.released == ['conn0']
+
+    resp = client.get('/api/items')
+    assert json.loads(resp.data)['db'] == 'conn1'
+    assert pool.released == ['conn0', 'conn1']
+
+    info = connector.providers.info()
+    assert info['db'] == {'scope': 'request', 'created': 2,
+                          'reused': 0, 'closed': 2}
+    assert info['config']['created'] == 1
+    assert info['config']['reused'] == 1
+
+
+def test_request_scope_is_shared_in_request(app):
+    providers = Providers()
+    provider = providers.register('db', object, scope='request')
+
+    with app.test_request_context():
+        assert provider.get() is provider.get()
+        providers.teardown()
+        assert provider.closed == 1
+
+    assert provider.created == 1
+
+
+def test_thread_scope():
+    providers = Providers()
+    closed = []
+    provider = providers.register('http', object, scope='thread',
+                                  close=closed.append)
+    barrier = threading.Barrier(4)
+
+    def get():
+        value = provider.get()
+        assert provider.get() is value
+        # keep threads alive until all of them get the resource
+        barrier.wait(5)
+        return value
+
+    with ThreadPoolExecutor(4) as executor:
+        values = list(executor.map(lambda _: get(), range(4)))
+
+    assert len({id(v) for v in values}) == 4
+    assert provider.created == 4
+
+    providers.shutdown()
+    assert len(closed) == 4
+
+
+def test_thread_scope_close_after_thread_exit():
+    providers = Providers()
+    closed = []
+    provider = providers.register('http', object, scope='thread',
+                                  close=closed.append)
+
+    # thread per request
+    for _ in range(5):
+        thread = threading.Thread(target=provider.get)
+        thread.start()
+        thread.join()
+
+    # resources of exited threads are closed by the next creation
+    provider.get()
+    assert len(closed) == 5
+    assert len(provider._threads) == 1
+
+    providers.shutdown()
+    assert len(closed) == 6
+
+
+def test_process_scope_after_fork():
+    providers = Providers()
+    provider = providers.register('pool', Pool)
+    parent = provider.get()
+    assert provider.get() is parent
+
+    providers.after_fork()
+    assert provider.get() is not parent
+    assert provider.created == 2
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_process_scope_in_child_process():
+    providers = Providers()
+    provider = providers.register('pool', Pool)
+    parent = provider.get()
+
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        os.close(r)
+        ok = provider.get() is not parent and provider.created == 2
+        os.write(w, b'1' if ok else b'0')
+        os._exit(0)
+
+    os.close(w)
+    os.waitpid(pid, 0)
+    assert os.read(r, 1) == b'1'
+    os.close(r)
+
+
+def test_invalid_provider():
+    providers = Providers()
+    with pytest.raises(ValueError):
+        providers.register('request', object)
+    with pytest.raises(ValueError):
+        providers.register('db', object, scope='unknown')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import json
+
+from flask_api_connector import fields
+from flask_api_connector.marshal import marshal
+from flask_api_connector.serializers import (
+    SERIALIZERS, Serializer, get_serializer, register_serializer
+)
+from flask_api_connector.views import BaseView
+
+msgpack = pytest.importorskip('msgpack')
+cbor2 = pytest.importorskip('cbor2')
+
+
+item_fields = {
+    'id': fields.Integer,
+    'price': fields.Fixed(2),
+    'amount': fields.Arbitrary,
+    'created': fields.DateTime,
+    'tags': fields.List(fields.String),
+    'owner': fields.Nested({'updated': fields.DateTime}),
+}
+
+item = {
+    'id': 1,
+    'price': 1.005,
+    'amount': '1.23',
+    'created': datetime(2020, 1, 1),
+    'tags': ['a'],
+    'owner': {'updated': datetime(2020, 1, 2)},
+}
+
+
+def test_marshal_native_values():
+    out = marshal(item, item_fields, native=True)
+    assert out['price'] == Decimal('1.00')
+    assert out['amount'] == Decimal('1.23')
+    assert out['created'] == datetime(2020, 1, 1)
+    assert out['owner']['updated'] == datetime(2020, 1, 2)
+
+    # default output is not affected
+    assert marshal(item, item_fields)['price'] == '1.00'
+
+
+def test_register_serializer():
+    serializer = Serializer('application/x-test', lambda obj: b'test')
+    register_serializer(serializer)
+    try:
+        assert get_serializer('application/x-test') is serializer
+    finally:
+        SERIALIZERS.pop('application/x-test')
+
+
+def _add_view(app):
+    class Index:
+        def get(self):
+            return item
+
+        def post(self, body):
+            return {'id': body['id']}
+
+    class TargetView(BaseView, Index):
+        marshal_fields = item_fields
+        content_types = ['application/json', 'application/msgpack',
+                         'application/cbor', 'application/x-missing']
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+
+def test_negotiate_content_type(app, client):
+    _add_view(app)
+
+    resp = client.get('/')
+    assert resp.mimetype == 'application/json'
+    assert json.loads(resp.data)['price'] == '1.00'
+    assert 'Accept' in resp.headers['Vary']
+
+    resp = client.get('/', headers={'Accept': 'application/msgpack'})
+    assert resp.mimetype == 'application/msgpack'
+    data = msgpack.unpackb(resp.data, timestamp=3)
+    assert data['price'] == '1.00'
+    assert data['created'] == datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    resp = client.get('/', headers={'Accept': 'application/cbor'})
+    assert resp.mimetype == 'application/cbor'
+    data = cbor2.loads(resp.data)
+    assert data['price'] == Decimal('1.00')
+    assert data['amount'] == Decimal('1.23')
+    assert data['created'] == datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def test_return_406_if_not_acceptable(app, client):
+    _add_view(app)
+
+    resp = client.get('/', headers={'Accept': 'application/x-missing'})
+    assert resp.status_code == 406
+
+    resp = client.get('/', headers={'Accept': 'text/html'})
+    assert resp.status_code == 406
+
+
+def test_decode_binary_body(app, client):
+    _add_view(app)
+
+    resp = client.post('/', data=msgpack.packb({'id': 3}),
+                       content_type='application/msgpack')
+    assert json.loads(resp.data)['id'] == 3
+
+
+def test_round_trip_native_values(app, client):
+    echo_fields = {'when': fields.DateTime, 'price': fields.Fixed(2)}
+
+    class Index:
+        def get(self):
+            return {'when': datetime(2020, 1, 1, tzinfo=timezone.utc),
+                    'price': Decimal('1.50')}
+
+        def post(self, body):
+            return body
+
+    class TargetView(BaseView, Index):
+        marshal_fields = echo_fields
+        body_fields = echo_fields
+        content_types = ['application/json', 'application/msgpack',
+                         'application/cbor']
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    for mimetype in ('application/msgpack', 'application/cbor'):
+        output = client.get('/', headers={'Accept': mimetype}).data
+        resp = client.post('/', data=output, content_type=mimetype)
+        assert resp.status_code == 200
+        assert json.loads(resp.data) == {
+            'when': '2020-01-01T00:00:00+00:00', 'price': '1.50'}
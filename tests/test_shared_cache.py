@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Response, json, jsonify
+
+from flask_api_connector.shared_cache import SharedCache
+from flask_api_connector.views import BaseView
+
+
+@pytest.fixture
+def cache():
+    cache = SharedCache(size=64 + 256 * 64, slot_size=256)
+    yield cache
+    cache.close()
+
+
+def test_get_and_set(cache):
+    assert cache.get(b'a') is None
+    assert cache.set(b'a', b'1')
+    assert cache.get(b'a') == b'1'
+
+    # overwrite
+    cache.set(b'a', b'22')
+    assert cache.get(b'a') == b'22'
+    assert len(cache) == 1
+
+    cache.delete(b'a')
+    assert cache.get(b'a') is None
+
+    info = cache.info()
+    assert info['hits'] == 2
+    assert info['misses'] == 2
+    assert info['slots'] == 64
+
+
+def test_too_large_value(cache):
+    assert not cache.set(b'a', b'x' * 256)
+    assert cache.get(b'a') is None
+
+
+def test_ttl(cache):
+    cache.set(b'a', b'1', ttl=0.01)
+    cache.set(b'b', b'1')
+    time.sleep(0.02)
+    assert cache.get(b'a') is None
+    assert cache.get(b'b') == b'1'
+
+
+def test_evict_least_recently_used():
+    cache = SharedCache(size=64 + 4 * 128, slot_size=128, probe=4)
+    try:
+        for i in range(4):
+            cache.set(b'%d' % i, b'v')
+            time.sleep(0.001)
+        cache.get(b'0')
+        cache.set(b'4', b'v')
+
+        assert cache.evictions == 1
+        assert cache.get(b'0') == b'v'
+        assert cache.get(b'1') is None
+        assert cache.get(b'4') == b'v'
+
+        cache.clear()
+        assert len(cache) == 0
+    finally:
+        cache.close()
+
+
+def test_open_same_file(tmp_path):
+    path = str(tmp_path / 'cache')
+    first = SharedCache(path, size=64 + 16 * 256, slot_size=256)
+    # the layout of the existing file is used
+    second = SharedCache(path, size=1024 * 1024, slot_size=1024)
+    try:
+        first.set(b'a', b'1')
+        assert second.get(b'a') == b'1'
+        assert second.slots == 16
+    finally:
+        first.close()
+        second.close()
+    assert os.path.exists(path)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+def test_share_with_child_process(cache):
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        cache.set(b'child', b'1')
+        os._exit(0 if cache.get(b'parent') is None else 1)
+    os.waitpid(pid, 0)
+    assert cache.get(b'child') == b'1'
+    assert os.path.exists(cache.path)
+
+
+def test_concurrent_read_and_write(cache):
+    stop = threading.Event()
+    torn = []
+
+    def write(i):
+        n = 0
+        while not stop.is_set():
+            cache.set(b'key', bytes([i]) * (n % 100 + 1))
+            n += 1
+
+    def read():
+        for _ in range(2000):
+            value = cache.get(b'key')
+            if value and len(set(value)) != 1:
+                torn.append(value)
+
+    with ThreadPoolExecutor(4) as executor:
+        writers = [executor.submit(write, i) for i in range(2)]
+        readers = [executor.submit(read) for _ in range(2)]
+        for f in readers:
+            f.result()
+        stop.set()
+        for f in writers:
+            f.result()
+
+    assert not torn
+
+
+def test_cache_view_response(app, client, cache):
+    calls = []
+
+    class Index:
+        def get(self, id):
+            calls.append(id)
+            return {'id': id}
+
+    class TargetView(BaseView, Index):
+        response_cache = cache
+
+    app.add_url_rule('/<int:id>', view_func=TargetView.as_view('index'))
+
+    for _ in range(3):
+        resp = client.get('/1?a=1')
+        assert resp.status_code == 200
+        assert resp.mimetype == 'application/json'
+        assert json.loads(resp.data) == {'id': 1}
+
+    client.get('/1?a=2')
+    client.get('/2?a=1')
+    assert calls == [1, 1, 2]
+
+
+def test_do_not_cache_errors(app, client, cache):
+    calls = []
+
+    class Index:
+        def get(self):
+            calls.append(1)
+            return Response('error', status=500)
+
+    class TargetView(BaseView, Index):
+        response_cache = cache
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    client.get('/')
+    client.get('/')
+    assert len(calls) == 2
+
+
+def test_cache_per_user(app, client, cache):
+    class Me:
+        def get(self, request):
+            return {'user': request.headers.get('Authorization')}
+
+    class TargetView(BaseView, Me):
+        response_cache = cache
+
+    app.add_url_rule('/me', view_func=TargetView.as_view('me'))
+
+    for user in ('alice', 'bob', 'alice', 'bob'):
+        resp = client.get('/me', headers={'Authorization': user})
+        assert json.loads(resp.data) == {'user': user}
+
+
+def test_do_not_store_credentials_in_keys(app, client, cache):
+    class Index:
+        def get(self):
+            return {}
+
+    class TargetView(BaseView, Index):
+        response_cache = cache
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    for _ in range(2):
+        client.get('/', headers={'Authorization': 'Bearer SECRET'})
+    assert b'SECRET' not in cache._mm[:]
+
+
+def test_do_not_cache_private_responses(app, client, cache):
+    calls = []
+
+    class Index:
+        def get(self, kind):
+            calls.append(kind)
+            resp = jsonify(kind=kind)
+            if kind == 'cookie':
+                resp.set_cookie('session', 'secret')
+            elif kind == 'private':
+                resp.cache_control.private = True
+            else:
+                resp.cache_control.no_store = True
+            return resp
+
+    class TargetView(BaseView, Index):
+        response_cache = cache
+
+    app.add_url_rule('/<kind>', view_func=TargetView.as_view('index'))
+    for kind in ('cookie', 'private', 'no-store') * 2:
+        client.get(f'/{kind}')
+    assert len(calls) == 6
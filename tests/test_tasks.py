@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import pytest
+from flask import abort, json
+
+from flask_api_connector import fields
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector.exceptions import QueueFullException
+from flask_api_connector.tasks import DONE, TaskRunner
+from flask_api_connector.views import background
+
+
+def _wait(client, url, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = client.get(url)
+        if resp.status_code != 202:
+            return resp
+        time.sleep(0.01)
+    raise AssertionError('task did not finish')
+
+
+def test_task_runner():
+    runner = TaskRunner(workers=1)
+    task = runner.submit(lambda: (b'{}', 200, []))
+    runner.shutdown()
+
+    assert runner.get(task.id).status == DONE
+    assert runner.get(task.id).response == (b'{}', 200, [])
+    assert runner.get('unknown') is None
+    info = runner.info()
+    assert info['completed'] == 1
+    assert info['queued'] == 0
+
+
+def test_task_runner_queue_full():
+    runner = TaskRunner(workers=1, max_queue=1)
+    event = threading.Event()
+    runner.submit(event.wait)
+    # wait until the first task takes the thread
+    while runner.running == 0:
+        time.sleep(0.001)
+    runner.submit(event.wait)
+
+    with pytest.raises(QueueFullException):
+        runner.submit(event.wait)
+    event.set()
+    runner.shutdown()
+    assert runner.info()['rejected'] == 1
+
+
+def test_task_runner_ttl():
+    runner = TaskRunner(workers=1, ttl=0)
+    task = runner.submit(lambda: (b'{}', 200, []))
+    runner.shutdown()
+    assert runner.get(task.id) is None
+
+
+def test_background_method(app, client):
+    event = threading.Event()
+
+    class Reports:
+        @background
+        def post(self, body):
+            event.wait(5)
+            return {'name': body['name'], 'secret': 'x'}
+
+    paths = Paths([('/reports', Reports, {
+        'marshal_fields': {'name': fields.String},
+        'body_fields': {'name': fields.String},
+    })])
+    ApiConnector(paths).init_app(app)
+
+    resp = client.post('/api/reports', json={'name': 'report'})
+    assert resp.status_code == 202
+    data = json.loads(resp.data)
+    assert data['status'] in ('pending', 'running')
+    assert resp.headers['Location'] == data['status_url']
+    assert client.get(data['status_url']).status_code == 202
+
+    event.set()
+    resp = _wait(client, data['status_url'])
+    assert resp.status_code == 200
+    assert json.loads(resp.data) == {'name': 'report'}
+
+
+def test_background_methods_option(app, client):
+    class Reports:
+        def get(self):
+            return {'name': 'report'}
+
+        def post(self):
+            raise ValueError('secret')
+
+    runner = TaskRunner(workers=1)
+    paths = Paths([('/reports', Reports, {'background_methods': ['post']})])
+    ApiConnector(paths, task_runner=runner,
+                 debug_routes=True).init_app(app)
+
+    # not in background
+    assert client.get('/api/reports').status_code == 200
+
+    data = json.loads(client.post('/api/reports').data)
+    resp = _wait(client, data['status_url'])
+    assert resp.status_code == 500
+    # the error is not exposed
+    assert json.loads(resp.data)['message'] == 'Task failed.'
+    assert b'secret' not in resp.data
+
+    assert client.get('/api/_tasks/unknown').status_code == 404
+    info = json.loads(client.get('/api/_debug/tasks').data)
+    assert info['failed'] == 1
+
+
+def test_background_http_exception(app, client):
+    class Reports:
+        @background
+        def post(self):
+            abort(409, description='Report exists.')
+
+    ApiConnector(Paths([('/reports', Reports)]),
+                 debug_routes=True).init_app(app)
+
+    data = json.loads(client.post('/api/reports').data)
+    resp = _wait(client, data['status_url'])
+    assert resp.status_code == 409
+    assert b'Report exists.' in resp.data
+    info = json.loads(client.get('/api/_debug/tasks').data)
+    assert info['failed'] == 0
+
+
+def test_background_queue_full(app, client):
+    event = threading.Event()
+
+    class Reports:
+        @background
+        def post(self):
+            event.wait(5)
+            return {}
+
+    runner = TaskRunner(workers=1, max_queue=0)
+    paths = Paths([('/reports', Reports)])
+    ApiConnector(paths, task_runner=runner).init_app(app)
+
+    resp = client.post('/api/reports')
+    assert resp.status_code == 503
+    assert resp.headers['Retry-After'] == '1'
+    event.set()
+
+
+def test_no_task_route(app):
+    class Reports:
+        def post(self):
+            return {}
+
+    ApiConnector(Paths([('/reports', Reports)])).init_app(app)
+    assert '_task_status' not in app.view_functions
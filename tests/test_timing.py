@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from flask import json
+
+from flask_api_connector import fields
+from flask_api_connector.core import ApiConnector, Paths
+from flask_api_connector.timing import SlowRequests, server_timing
+from flask_api_connector.views import BaseView, _profiled
+
+
+def test_server_timing_format():
+    value = server_timing({'total': 0.002, 'handler': 0.001})
+    assert value == 'handler;dur=1.000, total;dur=2.000'
+
+
+def test_keep_slowest_requests():
+    slow = SlowRequests(2)
+    built = []
+
+    def entry(i):
+        def build():
+            built.append(i)
+            return {'i': i}
+        return build
+
+    for i, elapsed in enumerate([0.1, 0.3, 0.2, 0.05]):
+        slow.record(elapsed, entry(i))
+
+    assert [e['i'] for e in slow.entries()] == [1, 2]
+    assert slow.entries()[0]['time'] == 300
+    # faster one than the kept ones is not built
+    assert 3 not in built
+
+    slow.clear()
+    assert slow.entries() == []
+
+
+def test_server_timing_header(app, client):
+    class Index:
+        def get(self):
+            return {'id': 1}
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {'id': fields.Integer}
+        server_timing = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.get('/')
+    assert json.loads(resp.data) == {'id': 1}
+
+    phases = [v.split(';')[0]
+              for v in resp.headers['Server-Timing'].split(', ')]
+    assert phases == ['handler', 'marshal', 'encode', 'total']
+
+
+def test_no_timing_by_default(app, client):
+    class Index:
+        def get(self):
+            return {'id': 1}
+
+    class TargetView(BaseView, Index):
+        pass
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/', view_func=view)
+    assert 'Server-Timing' not in client.get('/').headers
+    assert view.slow_requests is None
+
+
+def test_slow_requests_with_profile(app, client):
+    class Item:
+        id = 1
+
+        @property
+        def name(self):
+            time.sleep(0.01)
+            return 'slow'
+
+    class Items:
+        def get(self, id):
+            return Item()
+
+    paths = Paths([
+        ('/items/<int:id>', Items, {
+            'marshal_fields': {'id': fields.Integer, 'name': fields.String},
+            'slow_requests': 2,
+            'profile_fields': True,
+        }),
+    ])
+    ApiConnector(paths, debug_routes=True).init_app(app)
+
+    size = len(_profiled._data)
+    for i in range(3):
+        client.get(f'/api/items/{i}?fields=id,name')
+    # profiled fields are reused by requests
+    assert len(_profiled._data) == size + 1
+
+    data = json.loads(client.get('/api/_debug/slow').data)
+    entries = data['items']
+    assert len(entries) == 2
+    entry = entries[0]
+    assert entry['path'].startswith('/api/items/')
+    assert entry['query'] == 'fields=id,name'
+    assert entry['status'] == 200
+    assert set(entry['timings']) == {'handler', 'marshal', 'encode', 'total'}
+    assert entry['profile']['name']['calls'] == 1
+    assert entry['profile']['name']['time'] >= 10
+    assert entry['profile']['name']['time'] > entry['profile']['id']['time']
+
+
+def test_profile_normalized(app, client):
+    author = {'id': 1, 'name': 'foo'}
+
+    class Items:
+        def get(self):
+            return [{'id': i, 'author': author} for i in range(2)]
+
+    paths = Paths([
+        ('/items', Items, {
+            'marshal_fields': {
+                'id': fields.Integer,
+                'author': fields.Nested({'id': fields.Integer,
+                                         'name': fields.String},
+                                        entity='author'),
+            },
+            'slow_requests': 1,
+            'profile_fields': True,
+            'normalize': True,
+        }),
+    ])
+    ApiConnector(paths, debug_routes=True).init_app(app)
+
+    data = json.loads(client.get('/api/items').data)
+    assert data == {
+        'data': [{'id': 0, 'author': 1}, {'id': 1, 'author': 1}],
+        'included': {'author': {'1': {'id': 1, 'name': 'foo'}}},
+    }
+    entry = json.loads(client.get('/api/_debug/slow').data)['items'][0]
+    assert entry['profile']['author']['calls'] == 2
+
+
+def test_debug_routes_disabled_by_default(app, client):
+    class Items:
+        def get(self):
+            return []
+
+    ApiConnector(Paths([('/items', Items)])).init_app(app)
+    assert client.get('/api/_debug/slow').status_code == 404
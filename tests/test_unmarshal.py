@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import json
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from flask_api_connector import fields
+from flask_api_connector.exceptions import ValidationException
+from flask_api_connector.unmarshal import get_json_decoder, unmarshal
+
+
+def test_unmarshal_typed_values():
+    mfields = OrderedDict([
+        ('id', fields.Integer),
+        ('name', fields.String),
+        ('price', fields.Fixed(2)),
+        ('rate', fields.Float),
+        ('active', fields.Boolean),
+        ('created', fields.DateTime),
+        ('raw', fields.Raw),
+    ])
+    data = {
+        'id': 1,
+        'name': 'foo',
+        'price': '3.145',
+        'rate': 1,
+        'active': True,
+        'created': '2011-01-01T00:00:00Z',
+        'raw': [1, 2],
+        'unknown': 'ignored',
+    }
+
+    assert unmarshal(data, mfields) == OrderedDict([
+        ('id', 1),
+        ('name', 'foo'),
+        ('price', Decimal('3.14')),
+        ('rate', 1.0),
+        ('active', True),
+        ('created', datetime(2011, 1, 1, tzinfo=timezone.utc)),
+        ('raw', [1, 2]),
+    ])
+
+
+def test_unmarshal_nested_and_list():
+    mfields = {
+        'owner': fields.Nested({'name': fields.String}),
+        'tags': fields.List(fields.String),
+        'items': fields.List(fields.Nested({'qty': fields.Integer})),
+        'meta': {'a': fields.Integer},
+    }
+    data = {
+        'owner': {'name': 'foo'},
+        'tags': ['a', 'b'],
+        'items': [{'qty': 1}, {'qty': 2}],
+        'meta': {'a': 3},
+    }
+
+    assert unmarshal(data, mfields) == data
+
+
+def test_unmarshal_list_of_items():
+    assert unmarshal([{'a': 1}, {'a': 2}], {'a': fields.Integer}) == \
+        [{'a': 1}, {'a': 2}]
+
+
+def test_missing_and_null_values():
+    mfields = {
+        'a': fields.Integer(required=True),
+        'b': fields.String(default='x'),
+        'c': fields.Nested({'d': fields.Raw}, allow_null=True),
+    }
+
+    assert unmarshal({'a': 1, 'c': None}, mfields) == \
+        {'a': 1, 'b': 'x', 'c': None}
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal({'b': 'y'}, mfields)
+    assert e.value.errors == {'a': 'Missing required field.'}
+
+
+def test_collect_all_errors():
+    mfields = OrderedDict([
+        ('a', fields.Integer),
+        ('b', fields.String),
+        ('c', fields.List(fields.Nested({'d': fields.Boolean}))),
+        ('e', fields.DateTime),
+    ])
+    data = {'a': 'x', 'b': 1, 'c': [{'d': True}, {'d': 'no'}], 'e': 'bad'}
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal(data, mfields)
+
+    assert list(e.value.errors) == ['a', 'b', 'c.1.d', 'e']
+
+
+def test_fail_fast():
+    mfields = OrderedDict([('a', fields.Integer), ('b', fields.String)])
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal({'a': 'x', 'b': 1}, mfields, fail_fast=True)
+
+    assert list(e.value.errors) == ['a']
+
+
+def test_fail_fast_nested():
+    mfields = OrderedDict([
+        ('a', fields.Nested(OrderedDict([('b', fields.Integer),
+                                         ('c', fields.Integer)]))),
+        ('d', fields.List(fields.Integer)),
+    ])
+    data = {'a': {'b': 'x', 'c': 'y'}, 'd': ['x', 'y']}
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal(data, mfields, fail_fast=True)
+    assert list(e.value.errors) == ['a.b']
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal({'d': ['x', 'y']}, mfields, fail_fast=True)
+    assert list(e.value.errors) == ['d.0']
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal(data, mfields)
+    assert list(e.value.errors) == ['a.b', 'a.c', 'd.0', 'd.1']
+
+
+def test_invalid_top_level_data():
+    with pytest.raises(ValidationException):
+        unmarshal('string', {'a': fields.Integer})
+
+    with pytest.raises(ValidationException) as e:
+        unmarshal([{'a': 1}, 2], {'a': fields.Integer})
+    assert list(e.value.errors) == ['1']
+
+
+def test_parse_numbers():
+    assert fields.Integer().parse(2.0) == 2
+    assert fields.Arbitrary().parse(0.1) == Decimal('0.1')
+
+    invalid = [
+        (fields.Integer(), True),
+        (fields.Integer(), 1.5),
+        (fields.Float(), '1'),
+        (fields.Arbitrary(), 'nan'),
+        (fields.Fixed(), True),
+        (fields.Boolean(), 1),
+    ]
+    for field, value in invalid:
+        with pytest.raises(Exception):
+            field.parse(value)
+
+
+def test_parse_datetime_formats():
+    expected = datetime(2011, 1, 1, tzinfo=timezone.utc)
+
+    assert fields.DateTime(dt_format='epoch_ms').parse(1293840000000) == \
+        expected
+    assert fields.DateTime(dt_format='rfc822').parse(
+        'Sat, 01 Jan 2011 00:00:00 -0000').timestamp() == \
+        expected.timestamp()
+    assert fields.DateTime().parse(1293840000) == expected
+
+
+def test_json_decoder():
+    assert get_json_decoder('json') is json.loads
+
+    decoder = get_json_decoder(lambda b: 'decoded')
+    assert decoder(b'') == 'decoded'
+
+    with pytest.raises(ValueError):
+        get_json_decoder('unknown')
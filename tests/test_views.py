@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import gzip
 from unittest.mock import patch
 
 from flask import Response, g, json, request, session
 
-from flask_api_connector.views import BaseView
+from flask_api_connector import fields
+from flask_api_connector.views import BaseView, constant
 
 
 def test_basic_view_has_methods(app):
@@ -186,3 +188,330 @@ def test_handle_dynamic_path(app, client):
     resp = client.get('/test')
     data = json.loads(resp.data)
     assert data.get('name') == 'test'
+
+
+def test_marshal_returned_value(app, client):
+    class Index:
+        def get(self):
+            return [{'id': 1, 'name': 'foo', 'secret': 'x'}]
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {'id': fields.Integer, 'name': fields.String}
+        marshal_key = 'data'
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.get('/')
+    assert json.loads(resp.data) == {'data': [{'id': 1, 'name': 'foo'}]}
+
+
+def test_select_fields_by_query_parameter(app, client):
+    accessed = []
+
+    class Item:
+        id = 1
+
+        @property
+        def owner(self):
+            accessed.append('owner')
+            return {'name': 'foo'}
+
+    class Index:
+        def get(self):
+            return Item()
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {
+            'id': fields.Integer,
+            'owner': fields.Nested({'name': fields.String}),
+        }
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.get('/?fields=id')
+    assert json.loads(resp.data) == {'id': 1}
+    assert not accessed
+
+    resp = client.get('/?fields=id,owner.name')
+    assert json.loads(resp.data) == {'id': 1, 'owner': {'name': 'foo'}}
+    assert accessed
+
+    resp = client.get('/?fields=unknown')
+    assert resp.status_code == 400
+
+
+def test_disable_projection_param(app, client):
+    class Index:
+        def get(self):
+            return {'id': 1}
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {'id': fields.Integer}
+        projection_param = None
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.get('/?fields=unknown')
+    assert json.loads(resp.data) == {'id': 1}
+
+
+def test_pass_body_to_method(app, client):
+    class Index:
+        def post(self, body):
+            return body
+
+    class TargetView(BaseView, Index):
+        pass
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.post('/', json={'a': 1})
+    assert json.loads(resp.data) == {'a': 1}
+
+
+def test_validate_body_with_fields(app, client):
+    class Index:
+        def post(self, body):
+            return {'type': type(body['price']).__name__,
+                    'price': str(body['price'])}
+
+    class TargetView(BaseView, Index):
+        body_fields = {
+            'price': fields.Fixed(2, required=True),
+        }
+        json_decoder = 'json'
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.post('/', json={'price': '1.005'})
+    assert json.loads(resp.data) == {'type': 'Decimal', 'price': '1.00'}
+
+    resp = client.post('/', json={})
+    assert resp.status_code == 400
+    assert json.loads(resp.data)['errors'] == \
+        {'price': 'Missing required field.'}
+
+    resp = client.post('/', data='{invalid', content_type='application/json')
+    assert resp.status_code == 400
+
+
+def test_answer_options_without_view_instance(app, client):
+    class Index:
+        def __init__(self):
+            raise AssertionError('instantiated')
+
+        def get(self):
+            pass
+
+        def post(self):
+            pass
+
+    class TargetView(BaseView, Index):
+        pass
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.options('/')
+    assert resp.status_code == 200
+    assert resp.headers['Allow'] == 'GET, HEAD, OPTIONS, POST'
+    assert resp.data == b''
+
+
+def test_dispatch_options_method(app, client):
+    class Index:
+        def options(self):
+            return Response('', headers={'X-Method': 'OPTIONS'})
+
+    class TargetView(BaseView, Index):
+        pass
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.options('/')
+    assert resp.headers['X-Method'] == 'OPTIONS'
+
+
+def test_head_method_returns_headers(app, client):
+    class Index:
+        def get(self):
+            return {'a': 1}
+
+        def head(self):
+            return {'ETag': '"v1"', 'Content-Length': '8'}
+
+    class TargetView(BaseView, Index):
+        pass
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    resp = client.head('/')
+    assert resp.headers['ETag'] == '"v1"'
+    assert resp.headers['Content-Length'] == '8'
+    assert resp.data == b''
+
+
+def test_head_skips_marshal(app, client):
+    calls = []
+
+    class Counted(fields.Raw):
+        def format(self, value):
+            calls.append(value)
+            return value
+
+    class Index:
+        def get(self):
+            return [{'a': 1}, {'a': 2}]
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {'a': Counted}
+        content_types = ['application/json', 'application/msgpack']
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.head('/', headers={'Accept': 'application/msgpack'})
+    assert resp.status_code == 200
+    assert resp.data == b''
+    assert resp.mimetype == 'application/msgpack'
+    assert 'Accept' in resp.headers['Vary']
+    assert calls == []
+
+    client.get('/')
+    assert calls == [1, 2]
+
+
+def test_head_from_cached_get_response(app, client):
+    calls = []
+    cache = {}
+
+    class DictCache:
+        def get(self, key):
+            return cache.get(key)
+
+        def set(self, key, value, ttl=None):
+            cache[key] = value
+
+    class Index:
+        def get(self):
+            calls.append(request.method)
+            return {'a': 1}
+
+    class TargetView(BaseView, Index):
+        response_cache = DictCache()
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    body = client.get('/').data
+
+    resp = client.head('/')
+    assert resp.data == b''
+    assert resp.headers['Content-Length'] == str(len(body))
+    assert calls == ['GET']
+
+
+def test_constant_response(app, client):
+    calls = []
+
+    class Index:
+        @constant
+        def get(self):
+            calls.append(1)
+            return {'version': '1.0', 'padding': 'x' * 1000}
+
+    class TargetView(BaseView, Index):
+        compress = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+
+    resp = client.get('/')
+    expected = json.loads(resp.data)
+    assert expected['version'] == '1.0'
+
+    resp = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(resp.data)) == expected
+    assert 'Accept-Encoding' in resp.headers['Vary']
+
+    resp = client.head('/')
+    assert resp.data == b''
+    assert calls == [1]
+
+    # query string makes another variant
+    client.get('/?fields=version')
+    assert calls == [1, 1]
+
+
+def test_constant_response_evicts_least_recently_used(app, client):
+    calls = []
+
+    class Index:
+        @constant
+        def get(self):
+            calls.append(request.query_string)
+            return {'version': '1.0'}
+
+    class TargetView(BaseView, Index):
+        pass
+
+    view = TargetView.as_view('index')
+    app.add_url_rule('/', view_func=view)
+
+    client.get('/')
+    for i in range(100):
+        client.get(f'/?x={i}')
+    # new variants are still cached after the slots are filled
+    client.get('/?x=99')
+    assert len(calls) == 101
+
+
+def test_constant_option(app, client):
+    calls = []
+
+    class Index:
+        def get(self):
+            calls.append(1)
+            return {'a': 1}
+
+    class TargetView(BaseView, Index):
+        constant = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    for _ in range(3):
+        assert json.loads(client.get('/').data) == {'a': 1}
+    assert calls == [1]
+
+
+def test_do_not_keep_constant_error_response(app, client):
+    calls = []
+
+    class Index:
+        @constant
+        def get(self):
+            calls.append(1)
+            return Response('', status=503)
+
+    class TargetView(BaseView, Index):
+        pass
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    client.get('/')
+    client.get('/')
+    assert calls == [1, 1]
+
+
+def test_normalize_nested_entities(app, client):
+    author = {'id': 1, 'name': 'foo'}
+
+    class Index:
+        def get(self):
+            return [{'id': i, 'author': author} for i in range(3)]
+
+    class TargetView(BaseView, Index):
+        marshal_fields = {
+            'id': fields.Integer,
+            'author': fields.Nested({'id': fields.Integer,
+                                     'name': fields.String},
+                                    entity='author'),
+        }
+        fused_json = True
+        normalize = True
+
+    app.add_url_rule('/', view_func=TargetView.as_view('index'))
+    data = json.loads(client.get('/').data)
+    assert data == {
+        'data': [{'id': i, 'author': 1} for i in range(3)],
+        'included': {'author': {'1': {'id': 1, 'name': 'foo'}}},
+    }